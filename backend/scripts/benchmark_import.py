@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+Import benchmark with a synthetic CBZ corpus.
+
+Generates CBZ archives locally (page count, page size, image format, stored
+or deflated entries, chapter folders nested to any depth), runs the import
+paths on them and reports throughput as JSON for regression tracking:
+
+    python benchmark_import.py --pages 300 --scenarios extract,resume,index \\
+        --repeat 3 --json results.json
+
+Scenarios:
+    extract       extract_cbz() into a fresh output directory
+    resume        extract_cbz(resume=True) over an unchanged previous import
+    dedupe        extract_cbz(dedupe=True) into the content-addressed store
+    placeholders  extract_cbz(placeholders=True) (BlurHash per page)
+    variants      extract_cbz() plus resized page variants
+    index         index_cbz() (archive kept, pages served as byte ranges)
+    download      process_downloaded_chapters() of download_manga.py over
+                  the same pages laid out as downloaded chapter folders
+
+Every run happens in a fresh child process so peak RSS is per run. Stage
+timings of the CBZ scenarios come from the import's own metrics record (see
+import_metrics.py). For download they are measured by timing its helper
+functions (page store, page metadata, state write), and "page_copy" is the
+remainder of the run. The corpus is cached by its parameters, so repeated
+benchmarks use the same bytes.
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from datetime import datetime
+
+import PIL
+from PIL import Image, ImageDraw
+
+BENCHMARK_VERSION = 1
+SCENARIOS = ["extract", "resume", "dedupe", "placeholders", "variants", "index", "download"]
+CORPUS_FORMATS = {'jpeg': '.jpg', 'png': '.png', 'webp': '.webp'}
+BENCHMARK_VARIANT_WIDTHS = [480, 960]
+
+# Helper functions of download_manga.py timed as stages
+DOWNLOAD_STAGES = {
+    "store": "store_file",
+    "metadata": "annotate_pages",
+    "state": "save_state",
+}
+
+def synthetic_page(rng, width, height):
+    """
+    Draw a page that compresses like a scanned manga page.
+
+    A coarse random grey field scaled up gives smooth tones; panel borders
+    and text-like strokes add the sharp edges encoders find expensive.
+    """
+    coarse = Image.frombytes('L', (max(1, width // 16), max(1, height // 16)),
+                             rng.randbytes(max(1, width // 16) * max(1, height // 16)))
+    page = coarse.resize((width, height), Image.BILINEAR).convert('RGB')
+    draw = ImageDraw.Draw(page)
+    for _ in range(rng.randint(3, 6)):
+        x0, y0 = rng.randrange(width // 2), rng.randrange(height // 2)
+        x1, y1 = x0 + rng.randrange(width // 4, width // 2), y0 + rng.randrange(height // 4, height // 2)
+        draw.rectangle([x0, y0, x1, y1], outline=(0, 0, 0), width=max(2, width // 200))
+    for _ in range(rng.randint(20, 60)):
+        x, y = rng.randrange(width), rng.randrange(height)
+        draw.line([x, y, x + rng.randrange(10, width // 6), y], fill=(rng.randrange(64),) * 3,
+                  width=max(1, height // 300))
+    return page
+
+def corpus_members(pages, chapters, depth):
+    """
+    Build the member names of a synthetic archive.
+
+    Args:
+        pages (int): Number of pages
+        chapters (int): Number of chapter folders (0 for a flat archive)
+        depth (int): Folder depth of each chapter ("Vol 1/Part 1/Chapter 3/")
+
+    Returns:
+        list: Member names in page order
+    """
+    if not chapters:
+        return [f"{number:04d}" for number in range(1, pages + 1)]
+    members = []
+    per_chapter = -(-pages // chapters)
+    for index in range(pages):
+        chapter = index // per_chapter + 1
+        folders = [f"Level {level}" for level in range(1, depth)] + [f"Chapter {chapter:03d}"]
+        members.append(f"{'/'.join(folders)}/{index % per_chapter + 1:03d}")
+    return members
+
+def generate_cbz(path, pages=100, width=1200, height=1800, image_format='jpeg', compression='stored',
+                 chapters=0, depth=1, quality=85, seed=1):
+    """
+    Write a synthetic CBZ archive.
+
+    Args:
+        path (str): Archive to create
+        pages (int): Number of pages
+        width (int): Page width
+        height (int): Page height
+        image_format (str): 'jpeg', 'png' or 'webp'
+        compression (str): 'stored' or 'deflated' entries
+        chapters (int): Number of chapter folders (0 for a flat archive)
+        depth (int): Folder depth of the chapter folders
+        quality (int): Encoder quality
+        seed (int): Random seed, the same seed gives the same pages
+
+    Returns:
+        int: Total size of the page images in bytes
+    """
+    rng = random.Random(seed)
+    zip_compression = zipfile.ZIP_DEFLATED if compression == 'deflated' else zipfile.ZIP_STORED
+    extension = CORPUS_FORMATS[image_format]
+    total = 0
+    temp_path = f"{path}.part"
+    with zipfile.ZipFile(temp_path, 'w', compression=zip_compression) as archive:
+        for member in corpus_members(pages, chapters, depth):
+            page = synthetic_page(rng, width, height)
+            with archive.open(member + extension, 'w') as target:
+                page.save(target, image_format.upper(), quality=quality)
+            total += archive.getinfo(member + extension).file_size
+    os.replace(temp_path, path)
+    return total
+
+def corpus_archive(corpus_dir, config):
+    """
+    Return the cached archive for a corpus configuration, generating it if needed.
+
+    Returns:
+        tuple: (archive path, total page bytes)
+    """
+    key = hashlib.sha1(json.dumps(config, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+    path = os.path.join(corpus_dir, f"corpus-{key}.cbz")
+    if not os.path.exists(path):
+        os.makedirs(corpus_dir, exist_ok=True)
+        print(f"Generating corpus {path}", file=sys.stderr)
+        generate_cbz(path, **config)
+    with zipfile.ZipFile(path) as archive:
+        page_bytes = sum(info.file_size for info in archive.infolist())
+    return path, page_bytes
+
+def _timed(function, stage, stages):
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            stages[stage] = stages.get(stage, 0.0) + time.perf_counter() - start
+    return wrapper
+
+def _instrument(module, stage_functions, stages):
+    for stage, name in stage_functions.items():
+        setattr(module, name, _timed(getattr(module, name), stage, stages))
+
+def _peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux; pools report through RUSAGE_CHILDREN
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return round(peak / 1024, 1)
+
+def _download_layout(cbz_path, manga_folder):
+    """Unpack the corpus as downloaded chapter folders (temp/Chapter N/...)."""
+    temp_folder = os.path.join(manga_folder, "temp")
+    with zipfile.ZipFile(cbz_path) as archive:
+        for info in archive.infolist():
+            chapter = os.path.basename(os.path.dirname(info.filename)) or "Chapter 1"
+            target_dir = os.path.join(temp_folder, chapter)
+            os.makedirs(target_dir, exist_ok=True)
+            with archive.open(info) as source, \
+                    open(os.path.join(target_dir, os.path.basename(info.filename)), 'wb') as target:
+                shutil.copyfileobj(source, target)
+
+def run_case(case):
+    """
+    Run one scenario once, in this process, and measure it.
+
+    Args:
+        case (dict): {"scenario", "cbz_path", "output", "workers"}
+
+    Returns:
+        dict: {"seconds", "pages", "peak_rss_mb", "stages"}
+    """
+    import contextlib
+
+    scenario = case["scenario"]
+    output_dir = case["output"]
+    stages = {}
+
+    with contextlib.redirect_stdout(sys.stderr if case.get("verbose") else open(os.devnull, 'w')):
+        if scenario == "download":
+            sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+            import download_manga
+            download_manga.OUTPUT_DIR = output_dir
+            manga_folder = os.path.join(output_dir, "benchmark")
+            _download_layout(case["cbz_path"], manga_folder)
+            _instrument(download_manga, DOWNLOAD_STAGES, stages)
+            start = time.perf_counter()
+            chapters = download_manga.process_downloaded_chapters("benchmark", manga_folder)
+            seconds = time.perf_counter() - start
+            pages = sum(len(chapter["images"]) for chapter in chapters or [])
+            # Whatever the timed helpers do not cover is the per-page work
+            stages["page_copy"] = max(0.0, seconds - sum(stages.values()))
+        else:
+            import extract_cbz
+            options = {"transcode_workers": case.get("workers")}
+            if scenario == "resume":
+                # Untimed first import, then a resumed one over the same archive
+                extract_cbz.import_cbz(case["cbz_path"], "benchmark", output_dir, **options)
+                options["resume"] = True
+            elif scenario == "dedupe":
+                options["dedupe"] = True
+            elif scenario == "placeholders":
+                options["placeholders"] = True
+            elif scenario == "variants":
+                options["variant_widths"] = BENCHMARK_VARIANT_WIDTHS
+            elif scenario == "index":
+                options = {"index_only": True}
+            start = time.perf_counter()
+            result = extract_cbz.import_cbz(case["cbz_path"], "benchmark", output_dir, **options)
+            seconds = time.perf_counter() - start
+            pages = result["pages"] if result else 0
+            if result:
+                stages = {stage: values["seconds"] for stage, values in result["metrics"]["stages"].items()}
+
+    return {
+        "seconds": round(seconds, 4),
+        "pages": pages,
+        "peak_rss_mb": _peak_rss_mb(),
+        "stages": {stage: round(value, 4) for stage, value in sorted(stages.items())},
+    }
+
+def run_isolated(case):
+    """Run a case in a fresh interpreter so peak RSS and imports are per run."""
+    completed = subprocess.run([sys.executable, os.path.abspath(__file__), '--run-case', json.dumps(case)],
+                               stdout=subprocess.PIPE, check=True)
+    return json.loads(completed.stdout.decode('utf-8').strip().splitlines()[-1])
+
+def environment_info():
+    """Describe the machine and code version the numbers were measured on."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True).stdout.decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "pillow": PIL.__version__,
+        "commit": commit,
+    }
+
+def run_benchmark(config, scenarios, repeat=3, workers=None, corpus_dir=None, verbose=False):
+    """
+    Benchmark the import paths on a synthetic corpus.
+
+    Args:
+        config (dict): generate_cbz() keyword arguments describing the corpus
+        scenarios (list): Scenario names (see SCENARIOS)
+        repeat (int): Runs per scenario
+        workers (int): Pool size for page metadata and transcoding
+        corpus_dir (str): Where generated archives are cached
+        verbose (bool): Show the import logs on stderr
+
+    Returns:
+        dict: The benchmark report (runs plus per-scenario medians)
+    """
+    corpus_dir = corpus_dir or os.path.join(tempfile.gettempdir(), "manga-benchmark-corpus")
+    cbz_path, page_bytes = corpus_archive(corpus_dir, config)
+
+    runs = []
+    summary = {}
+    for scenario in scenarios:
+        scenario_runs = []
+        for iteration in range(repeat):
+            output_dir = tempfile.mkdtemp(prefix="manga-benchmark-")
+            try:
+                run = run_isolated({"scenario": scenario, "cbz_path": cbz_path, "output": output_dir,
+                                    "workers": workers, "verbose": verbose})
+            finally:
+                shutil.rmtree(output_dir, ignore_errors=True)
+            seconds = run["seconds"] or 1e-9
+            run.update({
+                "scenario": scenario,
+                "iteration": iteration,
+                "pages_per_sec": round(run["pages"] / seconds, 1),
+                "mb_per_sec": round(page_bytes / seconds / 1024 / 1024, 1),
+            })
+            print(f"{scenario} #{iteration + 1}: {run['seconds']:.3f}s, {run['pages_per_sec']} pages/s, "
+                  f"{run['mb_per_sec']} MB/s, peak RSS {run['peak_rss_mb']} MB", file=sys.stderr)
+            scenario_runs.append(run)
+        runs.extend(scenario_runs)
+
+        stage_names = sorted({stage for run in scenario_runs for stage in run["stages"]})
+        summary[scenario] = {
+            "seconds": round(statistics.median(run["seconds"] for run in scenario_runs), 4),
+            "pages_per_sec": round(statistics.median(run["pages_per_sec"] for run in scenario_runs), 1),
+            "mb_per_sec": round(statistics.median(run["mb_per_sec"] for run in scenario_runs), 1),
+            "peak_rss_mb": max(run["peak_rss_mb"] for run in scenario_runs),
+            "stages": {stage: round(statistics.median(run["stages"].get(stage, 0.0) for run in scenario_runs), 4)
+                       for stage in stage_names},
+        }
+
+    return {
+        "v": BENCHMARK_VERSION,
+        "createdAt": datetime.now().isoformat(),
+        "environment": environment_info(),
+        "corpus": dict(config, archive_bytes=os.path.getsize(cbz_path), page_bytes=page_bytes),
+        "repeat": repeat,
+        "summary": summary,
+        "runs": runs,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark CBZ/chapter imports on a synthetic corpus')
+    parser.add_argument('--pages', type=int, default=100, help='Pages per archive (default: 100)')
+    parser.add_argument('--width', type=int, default=1200, help='Page width (default: 1200)')
+    parser.add_argument('--height', type=int, default=1800, help='Page height (default: 1800)')
+    parser.add_argument('--format', default='jpeg', choices=sorted(CORPUS_FORMATS),
+                        help='Page image format (default: jpeg)')
+    parser.add_argument('--compression', default='stored', choices=['stored', 'deflated'],
+                        help='How archive entries are stored (default: stored)')
+    parser.add_argument('--chapters', type=int, default=0,
+                        help='Number of chapter folders, 0 for a flat archive (default: 0)')
+    parser.add_argument('--depth', type=int, default=1,
+                        help='Folder depth of the chapter folders (default: 1)')
+    parser.add_argument('--seed', type=int, default=1, help='Corpus random seed (default: 1)')
+    parser.add_argument('--scenarios', default='extract,resume,index',
+                        help=f'Comma-separated scenarios: {", ".join(SCENARIOS)} (default: extract,resume,index)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per scenario (default: 3)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Processes for page metadata and transcoding (default: CPU count)')
+    parser.add_argument('--corpus-dir', help='Where generated archives are cached (default: system temp)')
+    parser.add_argument('--json', metavar='FILE', help='Write the report to this file instead of stdout')
+    parser.add_argument('--verbose', action='store_true', help='Show the import logs on stderr')
+    parser.add_argument('--run-case', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        print(json.dumps(run_case(json.loads(args.run_case))))
+        return 0
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    config = {
+        "pages": args.pages,
+        "width": args.width,
+        "height": args.height,
+        "image_format": args.format,
+        "compression": args.compression,
+        "chapters": args.chapters,
+        "depth": args.depth,
+        "seed": args.seed,
+    }
+    report = run_benchmark(config, scenarios, args.repeat, args.workers, args.corpus_dir, args.verbose)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.json}", file=sys.stderr)
+    else:
+        print(json.dumps(report, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Catalog index of every manga in the output tree.
+
+Listing pages used to discover series by fetching each <id>/info.json (and
+chapters.json) separately. This module scans the manga output directory
+shared by download_manga.py and extract_cbz.py and writes one compact
+catalog.json:
+
+    {"v": 1, "updatedAt": "...",
+     "series": [{"_id": "naruto", "title": "Naruto", "genres": [...],
+                 "tags": [...], "chapters": 700, "thumbnail": "...",
+                 "updatedAt": "...", ...}, ...],
+     "genres": {"Hành động": [0, 3]},
+     "tags": {"Phiêu lưu": [0, 1, 3]}}
+
+"genres" and "tags" are inverted indexes: positions in "series", which is
+sorted by updatedAt (newest first). The legacy index.json directory list is
+kept up to date as well.
+
+Updates are incremental. The mtimes of every info.json and chapters.json are
+kept in .catalog_state.json, and only folders whose files changed are read
+again.
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+
+from import_state import atomic_write_json, file_lock
+
+CATALOG_FILENAME = "catalog.json"
+CATALOG_STATE_FILENAME = ".catalog_state.json"
+LEGACY_INDEX_FILENAME = "index.json"
+CATALOG_VERSION = 1
+
+# info.json fields copied into catalog entries (what listing/ranking pages show)
+CATALOG_FIELDS = ["title", "author", "genre", "genres", "tags", "status", "thumbnail",
+                  "views", "likes", "rating", "createdAt", "updatedAt", "version"]
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+def count_chapters(chapters_path):
+    """Count the chapters listed in a chapters.json file (any format)."""
+    with open(chapters_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get("chapters", [])
+    return len(data)
+
+def read_catalog_entry(manga_dir, manga_id):
+    """
+    Build the catalog entry of one manga folder.
+
+    Returns:
+        dict: The entry, or None if the folder has no readable info.json
+    """
+    try:
+        with open(os.path.join(manga_dir, "info.json"), 'r', encoding='utf-8') as f:
+            info = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"  - Skipping {manga_id}: {str(e)}")
+        return None
+
+    entry = {"_id": info.get("_id") or manga_id}
+    entry.update({field: info[field] for field in CATALOG_FIELDS if field in info})
+    entry.setdefault("title", manga_id)
+    entry.setdefault("genres", [entry["genre"]] if entry.get("genre") else [])
+    entry.setdefault("tags", [])
+
+    chapters_path = os.path.join(manga_dir, "chapters.json")
+    try:
+        entry["chapters"] = count_chapters(chapters_path)
+    except (OSError, ValueError):
+        entry["chapters"] = info.get("number_of_chapters") or info.get("chapters") or 0
+    if not isinstance(entry["chapters"], int):
+        entry["chapters"] = len(entry["chapters"])
+
+    if not entry.get("updatedAt"):
+        entry["updatedAt"] = datetime.fromtimestamp(os.path.getmtime(manga_dir)).isoformat()
+    return entry
+
+def _inverted_index(series, field):
+    index = {}
+    for position, entry in enumerate(series):
+        for value in dict.fromkeys(entry.get(field) or []):
+            index.setdefault(value, []).append(position)
+    return dict(sorted(index.items()))
+
+def update_catalog(output_base_dir, full=False):
+    """
+    Bring catalog.json up to date with the manga folders on disk.
+
+    Args:
+        output_base_dir (str): Manga output directory (frontend/public/data/manga)
+        full (bool): Ignore the saved mtimes and read every folder again
+
+    Returns:
+        dict: {"series": total, "read": folders read, "removed": folders gone}
+    """
+    # Serialize catalog updates from concurrent imports
+    with file_lock(os.path.join(output_base_dir, ".catalog.lock")):
+        state_path = os.path.join(output_base_dir, CATALOG_STATE_FILENAME)
+        previous = {}
+        if not full:
+            try:
+                with open(state_path, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+                if state.get("v") == CATALOG_VERSION:
+                    previous = state["series"]
+            except (OSError, ValueError):
+                pass
+
+        current = {}
+        read = 0
+        for name in sorted(os.listdir(output_base_dir)):
+            manga_dir = os.path.join(output_base_dir, name)
+            # Skip the page store and other internal folders
+            if name.startswith(('.', '_')) or not os.path.isdir(manga_dir):
+                continue
+            mtimes = [_mtime(os.path.join(manga_dir, "info.json")),
+                      _mtime(os.path.join(manga_dir, "chapters.json"))]
+            if mtimes[0] is None:
+                continue
+            cached = previous.get(name)
+            if cached and cached["mtimes"] == mtimes:
+                current[name] = cached
+                continue
+            entry = read_catalog_entry(manga_dir, name)
+            read += 1
+            if entry:
+                current[name] = {"mtimes": mtimes, "entry": entry}
+
+        series = sorted((item["entry"] for item in current.values()),
+                        key=lambda entry: str(entry.get("updatedAt", "")), reverse=True)
+        now = datetime.now().isoformat()
+        catalog = {
+            "v": CATALOG_VERSION,
+            "updatedAt": now,
+            "series": series,
+            "genres": _inverted_index(series, "genres"),
+            "tags": _inverted_index(series, "tags"),
+        }
+        atomic_write_json(os.path.join(output_base_dir, CATALOG_FILENAME), catalog,
+                          ensure_ascii=False, separators=(',', ':'))
+        atomic_write_json(os.path.join(output_base_dir, LEGACY_INDEX_FILENAME),
+                          {"directories": list(current), "lastUpdated": now},
+                          ensure_ascii=False, indent=2)
+        atomic_write_json(state_path, {"v": CATALOG_VERSION, "series": current},
+                          ensure_ascii=False, separators=(',', ':'))
+
+    return {"series": len(series), "read": read, "removed": len(set(previous) - set(current))}
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the manga catalog index (catalog.json)')
+    parser.add_argument('--output', default='../../frontend/public/data/manga',
+                        help='Manga output directory (default: ../../frontend/public/data/manga)')
+    parser.add_argument('--full', action='store_true',
+                        help='Rebuild from scratch instead of only reading changed folders')
+    args = parser.parse_args()
+
+    output_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), args.output))
+    stats = update_catalog(output_dir, full=args.full)
+    print(f"Catalog: {stats['series']} series ({stats['read']} read, {stats['removed']} removed)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Page index for serving CBZ pages straight from the archive.
+
+Instead of copying every page out of the ZIP, we record where each page's
+data starts inside the archive. Stored (uncompressed) pages can then be
+served as plain byte ranges of the .cbz file, and deflated pages only need
+their own compressed bytes to be inflated.
+
+The sidecar index (pages.idx.json) is compact JSON:
+
+    {"v": 1, "archive": "volume.cbz",
+     "fields": ["name", "offset", "method", "csize", "size", "crc"],
+     "pages": [["001.jpg", 39, 0, 51234, 51234, 305419896], ...]}
+
+where "offset" is the absolute offset of the member's data (past the local
+file header), "method" is the ZIP compression method (0 = stored,
+8 = deflated), "csize"/"size" are the compressed/uncompressed sizes.
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+import zipfile
+import zlib
+
+from import_state import atomic_write_json
+
+INDEX_FILENAME = "pages.idx.json"
+INDEX_VERSION = 1
+INDEX_FIELDS = ["name", "offset", "method", "csize", "size", "crc"]
+
+# Local file header: signature, version, flags, method, time, date, crc,
+# csize, size, name length, extra length
+LOCAL_HEADER = struct.Struct('<4s5H3L2H')
+LOCAL_HEADER_SIGNATURE = b'PK\x03\x04'
+
+def data_offset(archive_file, info):
+    """
+    Compute the absolute offset of a member's data.
+
+    The central directory's extra field can differ from the local one, so the
+    local header has to be read to know where the data really starts.
+
+    Args:
+        archive_file: Open binary file of the archive
+        info (zipfile.ZipInfo): Member to locate
+
+    Returns:
+        int: Offset of the first data byte
+    """
+    archive_file.seek(info.header_offset)
+    header = LOCAL_HEADER.unpack(archive_file.read(LOCAL_HEADER.size))
+    if header[0] != LOCAL_HEADER_SIGNATURE:
+        raise zipfile.BadZipFile(f"Bad local file header for {info.filename}")
+    name_length, extra_length = header[9], header[10]
+    return info.header_offset + LOCAL_HEADER.size + name_length + extra_length
+
+def build_page_index(cbz_path, page_names):
+    """
+    Build index entries for the given pages of an archive.
+
+    Args:
+        cbz_path (str): Path to the CBZ file
+        page_names (list): Member names, in page order
+
+    Returns:
+        list: One [name, offset, method, csize, size, crc] entry per page
+    """
+    entries = []
+    with zipfile.ZipFile(cbz_path, 'r') as zip_ref, open(cbz_path, 'rb') as archive_file:
+        for name in page_names:
+            info = zip_ref.getinfo(name)
+            if info.flag_bits & 0x1:
+                raise zipfile.BadZipFile(f"Encrypted member cannot be indexed: {name}")
+            if info.compress_type not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+                raise zipfile.BadZipFile(f"Unsupported compression for {name}: {info.compress_type}")
+            entries.append([
+                name,
+                data_offset(archive_file, info),
+                info.compress_type,
+                info.compress_size,
+                info.file_size,
+                info.CRC,
+            ])
+    return entries
+
+def write_page_index(index_path, archive_name, entries):
+    """Write the sidecar index next to the archive."""
+    index = {
+        "v": INDEX_VERSION,
+        "archive": archive_name,
+        "fields": INDEX_FIELDS,
+        "pages": entries,
+    }
+    # Atomic, so the page route never reads a half-written index during an import
+    atomic_write_json(index_path, index, ensure_ascii=False, separators=(',', ':'))
+
+def load_page_index(index_path):
+    """Load a sidecar index written by write_page_index()."""
+    with open(index_path, 'r', encoding='utf-8') as f:
+        index = json.load(f)
+    if index.get("v") != INDEX_VERSION:
+        raise ValueError(f"Unsupported page index version: {index.get('v')}")
+    return index
+
+def read_page(archive_map, entry):
+    """
+    Read one page using its index entry.
+
+    Args:
+        archive_map (mmap.mmap): Memory map of the whole archive
+        entry (list): Index entry from build_page_index()
+
+    Returns:
+        bytes: The page image data
+    """
+    _name, offset, method, csize, size, _crc = entry
+    if method == zipfile.ZIP_STORED:
+        return archive_map[offset:offset + size]
+    data = zlib.decompress(archive_map[offset:offset + csize], -15)
+    if len(data) != size:
+        raise zipfile.BadZipFile(f"Size mismatch for {entry[0]}")
+    return data
+
+def open_archive_map(cbz_path):
+    """Memory-map an archive for read_page()."""
+    with open(cbz_path, 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def main():
+    """Print one page of an indexed archive to stdout (debugging helper)."""
+    if len(sys.argv) != 3:
+        print("Usage: cbz_index.py <manga_dir> <page_number>", file=sys.stderr)
+        return 1
+
+    manga_dir, page_number = sys.argv[1], int(sys.argv[2])
+    index = load_page_index(os.path.join(manga_dir, INDEX_FILENAME))
+    archive_map = open_archive_map(os.path.join(manga_dir, index["archive"]))
+    try:
+        sys.stdout.buffer.write(read_page(archive_map, index["pages"][page_number - 1]))
+    finally:
+        archive_map.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
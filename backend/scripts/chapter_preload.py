@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Next-chapter preload manifests and range-indexed chapter bundles.
+
+When a reader opens chapter N, every page of N+1 used to be fetched cold
+when the reader turned to it, one request per image. Imports now write,
+next to the pages of each chapter:
+
+    chapters/<N>/preload.json   what to fetch while chapter N is being read
+    chapters/<N>/bundle.bin     (optional) every page of chapter N, concatenated
+    chapters/<N>/bundle.json    (optional) byte range of each page in bundle.bin
+
+preload.json lists the first PRELOAD_PAGES pages of the next chapter,
+smallest first so the most pages arrive early, with their sizes and a ready
+made HTTP Link header value (rel=preload) for servers that send preload
+hints or early hints:
+
+    {"v": 1, "chapter": 1, "next": 2, "bytes": 812345,
+     "pages": [{"page": 2, "src": "/data/manga/naruto/chapters/2/002.jpg", "bytes": 150234}, ...],
+     "link": "</data/manga/naruto/chapters/2/002.jpg>; rel=preload; as=image, ...",
+     "bundle": {"src": "/data/manga/naruto/chapters/2/bundle.bin", "range": [0, 812344],
+                "pages": [[0, 160012, "image/jpeg"], [160012, 150234, "image/jpeg"], ...]}}
+
+With bundles, "bundle.range" is one HTTP Range covering those first pages of
+the next chapter, so the reader prefetches them with a single request and
+slices the pages out by their [offset, length, type] (in page order, as in
+bundle.json). bundle.json indexes the whole chapter:
+
+    {"v": 1, "src": "/data/manga/naruto/chapters/2/bundle.bin", "size": 4812345,
+     "pages": [[0, 150234, "image/jpeg"], [150234, 170012, "image/jpeg"], ...],
+     "files": [[150234, 1718000000000000000], ...]}
+
+("files" holds the size and mtime of each source page, so an unchanged
+bundle is not rebuilt). All files are written to a temporary name and
+renamed into place, so files hard-linked from a previous release (see
+staged_release.py) are never modified.
+"""
+import argparse
+import json
+import mimetypes
+import os
+import shutil
+import sys
+
+from chapters_manifest import read_chapters_json
+from import_state import atomic_write_json, publish_mode
+
+PRELOAD_VERSION = 1
+PRELOAD_FILENAME = "preload.json"
+BUNDLE_FILENAME = "bundle.bin"
+BUNDLE_INDEX_FILENAME = "bundle.json"
+# Pages of the next chapter listed in each preload manifest
+PRELOAD_PAGES = 4
+FRONTEND_PREFIX = "/data/manga/"
+
+def page_file(url, manga_dir, manga_id, output_base_dir=None):
+    """
+    Map a page URL to its file.
+
+    Pages of the manga itself are looked up in manga_dir (which may be a
+    staging directory), other /data/manga/ paths (the page store) in
+    output_base_dir. Returns None for pages that are not files (index mode).
+    """
+    base = f"{FRONTEND_PREFIX}{manga_id}/"
+    if url.startswith(base):
+        return os.path.join(manga_dir, *url[len(base):].split("/"))
+    if url.startswith(FRONTEND_PREFIX) and output_base_dir:
+        return os.path.join(output_base_dir, *url[len(FRONTEND_PREFIX):].split("/"))
+    return None
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path) if path else None
+    except OSError:
+        return None
+
+def write_bundle(chapter_dir, chapter_url, page_paths):
+    """
+    Concatenate the pages of a chapter into bundle.bin and index them in bundle.json.
+
+    Skipped (and None returned) when a page is not a local file. An existing
+    bundle built from the same page files is kept.
+
+    Returns:
+        dict: The bundle index, or None
+    """
+    files = []
+    for path in page_paths:
+        try:
+            stat = os.stat(path) if path else None
+        except OSError:
+            stat = None
+        if stat is None:
+            return None
+        files.append([stat.st_size, stat.st_mtime_ns])
+
+    index_path = os.path.join(chapter_dir, BUNDLE_INDEX_FILENAME)
+    bundle_path = os.path.join(chapter_dir, BUNDLE_FILENAME)
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            existing = json.load(f)
+        if existing.get("v") == PRELOAD_VERSION and existing.get("files") == files and os.path.exists(bundle_path):
+            return existing
+    except (OSError, ValueError):
+        pass
+
+    pages = []
+    offset = 0
+    temp_path = f"{bundle_path}.part"
+    try:
+        with open(temp_path, 'wb') as bundle:
+            for path in page_paths:
+                with open(path, 'rb') as page:
+                    shutil.copyfileobj(page, bundle)
+                length = bundle.tell() - offset
+                pages.append([offset, length, mimetypes.guess_type(path)[0] or "application/octet-stream"])
+                offset += length
+            bundle.flush()
+            os.fsync(bundle.fileno())
+        publish_mode(temp_path)
+        os.replace(temp_path, bundle_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    index = {"v": PRELOAD_VERSION, "src": f"{chapter_url}/{BUNDLE_FILENAME}", "size": offset,
+             "pages": pages, "files": files}
+    atomic_write_json(index_path, index, separators=(',', ':'))
+    return index
+
+def _remove(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+def write_preload_manifests(manga_dir, manga_id, chapters, output_base_dir=None,
+                            preload_pages=PRELOAD_PAGES, bundles=False):
+    """
+    Write preload.json (and optionally the bundle) of every chapter of a manga.
+
+    Args:
+        manga_dir (str): Manga folder (or the staging directory of its release)
+        manga_id (str): Folder name of the manga
+        chapters (list): Full chapter entries, in reading order
+        output_base_dir (str): Manga output directory, for pages in the page store
+        preload_pages (int): Pages of the next chapter listed per manifest
+        bundles (bool): Also write bundle.bin/bundle.json per chapter
+
+    Returns:
+        dict: {"manifests": preload manifests written, "bundles": bundles present, "bytes": bundle bytes}
+    """
+    image_chapters = [chapter for chapter in chapters if chapter.get("images")]
+    bundle_indexes = {}
+    stats = {"manifests": 0, "bundles": 0, "bytes": 0}
+
+    for chapter in image_chapters:
+        chapter_dir = os.path.join(manga_dir, "chapters", str(chapter["number"]))
+        if not bundles:
+            _remove(os.path.join(chapter_dir, BUNDLE_FILENAME))
+            _remove(os.path.join(chapter_dir, BUNDLE_INDEX_FILENAME))
+            continue
+        os.makedirs(chapter_dir, exist_ok=True)
+        paths = [page_file(url, manga_dir, manga_id, output_base_dir) for url in chapter["images"]]
+        index = write_bundle(chapter_dir, f"{FRONTEND_PREFIX}{manga_id}/chapters/{chapter['number']}", paths)
+        if index:
+            bundle_indexes[chapter["number"]] = index
+            stats["bundles"] += 1
+            stats["bytes"] += index["size"]
+
+    for position, chapter in enumerate(image_chapters):
+        chapter_dir = os.path.join(manga_dir, "chapters", str(chapter["number"]))
+        manifest_path = os.path.join(chapter_dir, PRELOAD_FILENAME)
+        following = image_chapters[position + 1] if position + 1 < len(image_chapters) else None
+        if not following or preload_pages <= 0:
+            _remove(manifest_path)
+            continue
+
+        first = following["images"][:preload_pages]
+        sizes = [_file_size(page_file(url, manga_dir, manga_id, output_base_dir)) for url in first]
+        pages = [{"page": page, "src": url, "bytes": size}
+                 for page, (url, size) in enumerate(zip(first, sizes), 1)]
+        if all(size is not None for size in sizes):
+            pages.sort(key=lambda entry: entry["bytes"])
+
+        manifest = {
+            "v": PRELOAD_VERSION,
+            "chapter": chapter["number"],
+            "next": following["number"],
+            "bytes": sum(size or 0 for size in sizes),
+            "pages": pages,
+            "link": ", ".join(f"<{entry['src']}>; rel=preload; as=image" for entry in pages),
+        }
+        bundle = bundle_indexes.get(following["number"])
+        if bundle:
+            last = bundle["pages"][len(first) - 1]
+            manifest["bundle"] = {"src": bundle["src"], "range": [0, last[0] + last[1] - 1],
+                                  "pages": bundle["pages"][:len(first)]}
+        os.makedirs(chapter_dir, exist_ok=True)
+        atomic_write_json(manifest_path, manifest, ensure_ascii=False, separators=(',', ':'))
+        stats["manifests"] += 1
+
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description='Write next-chapter preload manifests (and chapter bundles)')
+    parser.add_argument('manga', nargs='+', metavar='ID', help='Manga folders to process')
+    parser.add_argument('--output', default='../../frontend/public/data/manga',
+                        help='Manga output directory (default: ../../frontend/public/data/manga)')
+    parser.add_argument('--preload-pages', type=int, default=PRELOAD_PAGES,
+                        help=f'Pages of the next chapter per manifest, 0 to remove them (default: {PRELOAD_PAGES})')
+    parser.add_argument('--bundles', action='store_true',
+                        help='Also write a range-indexed bundle.bin per chapter')
+    args = parser.parse_args()
+
+    output_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), args.output))
+    for manga_id in args.manga:
+        manga_dir = os.path.join(output_dir, manga_id)
+        chapters = read_chapters_json(manga_dir)
+        stats = write_preload_manifests(manga_dir, manga_id, chapters, output_dir,
+                                        preload_pages=args.preload_pages, bundles=args.bundles)
+        print(f"{manga_id}: {stats['manifests']} preload manifests, "
+              f"{stats['bundles']} bundles ({stats['bytes']} bytes)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
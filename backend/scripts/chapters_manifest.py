@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+chapters.json writers and readers.
+
+Three formats are supported:
+
+- "full": the original list of chapter objects, every image path spelled
+  out (pretty-printed, as the importers always wrote it).
+- "compact": an object with a base path, where each image list is replaced
+  by a path spec. Sequential pages become {"dir", "pad", "ext", "start",
+  "count"} and anything else becomes {"dir", "files"}. No indentation.
+- "split": like compact, but each chapter's entry is written to
+  chapters/<number>.json and the index only keeps "src" and the page count,
+  so the reader fetches just the chapter it opens.
+
+Compact example:
+
+    {"v": 2, "format": "compact", "id": "naruto", "base": "/data/manga/naruto/",
+     "chapters": [{"number": 1, "title": "Chapter 1", "pages": 42,
+                   "img": {"dir": "chapters/1/", "pad": 3, "ext": ".jpg",
+                           "start": 1, "count": 42}}]}
+
+Paths in a spec's "dir" are relative to "base" unless they start with "/".
+frontend/src/services/chapterManifest.js expands both compact formats back
+into the full format.
+
+Files are written with a streaming encoder, one chapter at a time, through
+a temporary file that is renamed into place.
+"""
+import argparse
+import glob
+import itertools
+import json
+import os
+import re
+import sys
+import tempfile
+
+from import_state import atomic_write_json, publish_mode
+
+CHAPTERS_VERSION = 2
+CHAPTERS_FORMATS = ["full", "compact", "split"]
+SEQUENTIAL_NAME = re.compile(r'^(\d+)(\.[A-Za-z0-9]+)?$')
+
+def compact_paths(paths, base):
+    """
+    Replace a list of paths with a compact path spec.
+
+    Args:
+        paths (list): Frontend paths
+        base (str): Manga base path, ending with '/'
+
+    Returns:
+        dict: {"dir", "pad", "ext", "start", "count"} for sequential pages,
+            otherwise {"dir", "files"}
+    """
+    if not paths:
+        return {"dir": "", "files": []}
+
+    directory = os.path.commonprefix([path.rsplit('/', 1)[0] + '/' for path in paths])
+    directory = directory[:directory.rfind('/') + 1]
+    names = [path[len(directory):] for path in paths]
+    if directory.startswith(base):
+        directory = directory[len(base):]
+
+    match = SEQUENTIAL_NAME.match(names[0])
+    if match:
+        pad, ext, start = len(match.group(1)), match.group(2) or '', int(match.group(1))
+        expected = [f"{number:0{pad}d}{ext}" for number in range(start, start + len(names))]
+        if names == expected:
+            return {"dir": directory, "pad": pad, "ext": ext, "start": start, "count": len(names)}
+
+    return {"dir": directory, "files": names}
+
+def expand_paths(spec, base):
+    """Inverse of compact_paths()."""
+    directory = spec["dir"] if spec["dir"].startswith('/') else base + spec["dir"]
+    if "files" in spec:
+        return [directory + name for name in spec["files"]]
+    return [f"{directory}{number:0{spec['pad']}d}{spec['ext']}"
+            for number in range(spec["start"], spec["start"] + spec["count"])]
+
+def compact_chapter(chapter, base):
+    """Convert a full chapter entry to its compact form."""
+    compact = {key: value for key, value in chapter.items() if key not in ("images", "variants", "url")}
+    if chapter.get("url") and chapter["url"] != f"{base}chapters/{chapter.get('number')}":
+        compact["url"] = chapter["url"]
+    if "images" in chapter:
+        compact["pages"] = len(chapter["images"])
+        compact["img"] = compact_paths(chapter["images"], base)
+    if chapter.get("variants"):
+        compact["variants"] = {width: compact_paths(paths, base) for width, paths in chapter["variants"].items()}
+    return compact
+
+def _stream_json(path, prefix, items, suffix, indent=None):
+    """
+    Write prefix, the JSON-encoded items separated by commas, then suffix.
+
+    Items are encoded one at a time, so the whole document never exists as
+    one string in memory. The file is written to a temporary name, fsynced
+    and renamed into place.
+
+    Args:
+        path (str): Target file
+        prefix (str): Text written before the first item (e.g. '[')
+        items (iterable): JSON-serializable items
+        suffix (str): Text written after the last item (e.g. ']')
+        indent (int): Pretty-print the items as elements of a top-level list
+    """
+    if indent is None:
+        separator, encode = ',', lambda item: json.dumps(item, ensure_ascii=False, separators=(',', ':'))
+    else:
+        pad = ' ' * indent
+        separator = ',\n' + pad
+        encode = lambda item: json.dumps(item, ensure_ascii=False, indent=indent).replace('\n', '\n' + pad)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.json')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(prefix)
+            for index, item in enumerate(items):
+                if index:
+                    f.write(separator)
+                f.write(encode(item))
+            f.write(suffix)
+            f.flush()
+            os.fsync(f.fileno())
+        publish_mode(temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def write_chapters_json(manga_dir, manga_id, chapters, chapters_format="full"):
+    """
+    Write chapters.json for a manga in the requested format.
+
+    Split chapter files that the new chapters.json does not reference are
+    removed.
+
+    Args:
+        manga_dir (str): Manga folder
+        manga_id (str): Manga id (folder name)
+        chapters (iterable): Full chapter entries, in order
+        chapters_format (str): "full", "compact" or "split"
+
+    Returns:
+        str: Path of chapters.json
+    """
+    if chapters_format not in CHAPTERS_FORMATS:
+        raise ValueError(f"Unknown chapters.json format: {chapters_format}")
+
+    chapters_path = os.path.join(manga_dir, "chapters.json")
+    chapters_dir = os.path.join(manga_dir, "chapters")
+    written = set()
+
+    if chapters_format == "full":
+        # Same bytes as json.dump(list, indent=2), without building the list
+        chapters = iter(chapters)
+        first = next(chapters, None)
+        if first is None:
+            _stream_json(chapters_path, '[]', [], '')
+        else:
+            _stream_json(chapters_path, '[\n  ', itertools.chain([first], chapters), '\n]', indent=2)
+        _remove_stale_chapter_files(chapters_dir, written)
+        return chapters_path
+
+    base = f"/data/manga/{manga_id}/"
+    head = {"v": CHAPTERS_VERSION, "format": chapters_format, "id": manga_id, "base": base}
+    prefix = json.dumps(head, ensure_ascii=False, separators=(',', ':'))[:-1] + ',"chapters":['
+
+    def entries():
+        for chapter in chapters:
+            compact = compact_chapter(chapter, base)
+            if chapters_format == "split":
+                chapter_filename = f"{chapter['number']}.json"
+                os.makedirs(chapters_dir, exist_ok=True)
+                atomic_write_json(os.path.join(chapters_dir, chapter_filename), compact,
+                                  ensure_ascii=False, separators=(',', ':'))
+                written.add(chapter_filename)
+                compact = {key: compact[key] for key in ("_id", "number", "title", "pages") if key in compact}
+                compact["src"] = f"chapters/{chapter_filename}"
+            yield compact
+
+    _stream_json(chapters_path, prefix, entries(), ']}')
+    _remove_stale_chapter_files(chapters_dir, written)
+    return chapters_path
+
+def _remove_stale_chapter_files(chapters_dir, keep):
+    """Remove split chapter files (chapters/<number>.json) that are not in keep."""
+    for path in glob.glob(os.path.join(chapters_dir, "*.json")):
+        if os.path.basename(path) not in keep:
+            os.remove(path)
+
+def read_chapters_json(manga_dir):
+    """
+    Read chapters.json in any format and return full chapter entries.
+
+    Split chapters are loaded from their chapter files.
+    """
+    with open(os.path.join(manga_dir, "chapters.json"), 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        return data
+
+    base = data["base"]
+    chapters = []
+    for entry in data["chapters"]:
+        if "src" in entry:
+            with open(os.path.join(manga_dir, entry["src"]), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        chapter = {key: value for key, value in entry.items() if key not in ("img", "variants")}
+        chapter.setdefault("url", f"{base}chapters/{entry['number']}")
+        if "img" in entry:
+            chapter["images"] = expand_paths(entry["img"], base)
+        if "variants" in entry:
+            chapter["variants"] = {width: expand_paths(spec, base) for width, spec in entry["variants"].items()}
+        chapters.append(chapter)
+    return chapters
+
+def main():
+    parser = argparse.ArgumentParser(description='Rewrite chapters.json of manga folders in another format')
+    parser.add_argument('manga_dirs', nargs='+', help='Manga folders containing chapters.json')
+    parser.add_argument('--format', default='compact', choices=CHAPTERS_FORMATS,
+                        help='Target chapters.json format (default: compact)')
+    args = parser.parse_args()
+
+    for manga_dir in args.manga_dirs:
+        chapters_path = os.path.join(manga_dir, "chapters.json")
+        before = os.path.getsize(chapters_path)
+        chapters = read_chapters_json(manga_dir)
+        manga_id = os.path.basename(os.path.normpath(manga_dir))
+        write_chapters_json(manga_dir, manga_id, chapters, args.format)
+        after = os.path.getsize(chapters_path)
+        print(f"{manga_dir}: {len(chapters)} chapters, {before} -> {after} bytes")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Cover sprite sheets for listing pages.
+
+Listing grids (home, new, completed, genre pages) used to load one
+full-size cover per series: 48 series meant 48 large image requests. This
+module resizes every cover to a fixed-size tile and packs the tiles of each
+listing page into one sprite sheet, with a JSON coordinate map per listing:
+
+    _sprites/all.json                    every series, newest first (catalog order)
+    _sprites/completed.json              completed series
+    _sprites/genre-hanh-dong.json        one map per genre ("Hành động")
+    _sprites/all-0.3fa85f6457.webp       sheet of the first PAGE_SIZE series of "all"
+
+    {"v": 1, "listing": "genre-hanh-dong", "title": "Hành động",
+     "tile": [160, 240], "columns": 8, "pageSize": 48,
+     "sheets": [{"src": "/data/manga/_sprites/genre-hanh-dong-0.3fa85f6457.webp",
+                 "size": [1280, 1440], "bytes": 402311}],
+     "series": {"naruto": [0, 160, 0], ...}}
+
+"series" maps each folder to [sheet, x, y]: the position of its tile in
+that sheet. Genre map names are the diacritic-folded genre tokens, the same
+folding the browser applies (frontend/src/services/coverSprites.js).
+
+Sheets are named after a hash of their tiles and of the cover files they
+were cut from, so an unchanged sheet keeps its URL (and stays cached) and
+is not encoded again. Tiles are kept losslessly in _sprites/.tiles, and a
+cover is only decoded again when its file changes (.sprites_state.json),
+so a new series shifting every page of "all" only costs re-packing tiles.
+"""
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from PIL import Image, ImageOps
+
+from catalog_index import CATALOG_FILENAME
+from image_variants import DEFAULT_FORMAT, FORMAT_EXTENSIONS
+from import_state import atomic_write_json, file_lock, publish_mode
+from page_store import new_hasher
+from search_index import STATUS_CODES, fold_text, tokenize
+
+SPRITES_DIRNAME = "_sprites"
+SPRITES_STATE_FILENAME = ".sprites_state.json"
+TILES_DIRNAME = ".tiles"
+SPRITES_VERSION = 1
+# Tile size of one cover (2:3, the usual cover proportions)
+TILE_SIZE = (160, 240)
+# Series per sheet (one listing page) and tiles per sheet row
+PAGE_SIZE = 48
+COLUMNS = 8
+FRONTEND_PREFIX = "/data/manga/"
+
+def listing_name(genre):
+    """Map name of a genre listing ("Hành động" -> "genre-hanh-dong")."""
+    return "genre-" + "-".join(tokenize(genre))
+
+def cover_file(output_base_dir, manga_id, thumbnail):
+    """
+    Find the cover file of a series.
+
+    Returns:
+        str: Path of the cover, or None if it is not a local file
+    """
+    if thumbnail and thumbnail.startswith(FRONTEND_PREFIX):
+        path = os.path.join(output_base_dir, *thumbnail[len(FRONTEND_PREFIX):].split("/"))
+        if os.path.isfile(path):
+            return path
+    manga_dir = os.path.join(output_base_dir, manga_id)
+    for extension in (".jpg", ".jpeg", ".png", ".webp"):
+        path = os.path.join(manga_dir, f"cover{extension}")
+        if os.path.isfile(path):
+            return path
+    return None
+
+def make_tile(source_path, tile_path, tile_size=TILE_SIZE):
+    """
+    Cut a fixed-size tile out of a cover (scaled and center-cropped).
+
+    The tile is stored as PNG so that packing it into sheets again and again
+    never loses quality.
+    """
+    with Image.open(source_path) as image:
+        image.draft('RGB', (tile_size[0] * 2, tile_size[1] * 2))
+        tile = ImageOps.fit(image.convert('RGB'), tile_size, Image.LANCZOS)
+    temp_path = f"{tile_path}.part"
+    tile.save(temp_path, 'PNG')
+    os.replace(temp_path, tile_path)
+    return tile_path
+
+def _tile_job(args):
+    source_path, tile_path, tile_size = args
+    try:
+        return make_tile(source_path, tile_path, tile_size)
+    except Exception as e:
+        print(f"  - Error making cover tile of {source_path}: {str(e)}")
+        return None
+
+def _fingerprint(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+def _load_state(state_path, tile_size):
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get("v") == SPRITES_VERSION and state.get("tile") == list(tile_size):
+            return state
+    except (OSError, ValueError):
+        pass
+    return {"v": SPRITES_VERSION, "tile": list(tile_size), "covers": {}}
+
+def listings(catalog):
+    """
+    Series ids of every listing, in display order.
+
+    Returns:
+        dict: {map name: (title, [series ids])}
+    """
+    series = catalog["series"]
+    result = {
+        "all": ("Tất cả", [entry["_id"] for entry in series]),
+        "completed": ("Hoàn thành", [entry["_id"] for entry in series
+                                     if STATUS_CODES.get(fold_text(entry.get("status") or "")) == "completed"]),
+    }
+    for genre, positions in catalog.get("genres", {}).items():
+        name = listing_name(genre)
+        if name == "genre-":
+            continue
+        title, ids = result.get(name, (genre, []))
+        # Genres that only differ by diacritics or case share one map
+        result[name] = (title, list(dict.fromkeys(ids + [series[position]["_id"] for position in positions])))
+    return result
+
+def write_sheet(sprites_dir, name, page, tiles, tile_size, image_format, quality, hasher_input):
+    """
+    Pack tiles into one sheet, unless a sheet with the same content exists.
+
+    Returns:
+        tuple: (sheet filename, [width, height], bytes, whether it was written)
+    """
+    hasher = new_hasher()
+    hasher.update(json.dumps(hasher_input).encode('utf-8'))
+    filename = f"{name}-{page}.{hasher.hexdigest()[:10]}{FORMAT_EXTENSIONS[image_format]}"
+    path = os.path.join(sprites_dir, filename)
+    rows = (len(tiles) + COLUMNS - 1) // COLUMNS
+    size = [tile_size[0] * min(len(tiles), COLUMNS), tile_size[1] * rows]
+    if os.path.exists(path):
+        return filename, size, os.path.getsize(path), False
+
+    sheet = Image.new('RGB', tuple(size), (255, 255, 255))
+    for position, tile_path in enumerate(tiles):
+        with Image.open(tile_path) as tile:
+            sheet.paste(tile, ((position % COLUMNS) * tile_size[0], (position // COLUMNS) * tile_size[1]))
+    temp_path = f"{path}.part"
+    try:
+        sheet.save(temp_path, image_format.upper(), quality=quality)
+        publish_mode(temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return filename, size, os.path.getsize(path), True
+
+def update_sprites(output_base_dir, tile_size=TILE_SIZE, image_format=DEFAULT_FORMAT, quality=75,
+                   workers=None, full=False):
+    """
+    Bring the cover sprite sheets up to date with catalog.json.
+
+    Args:
+        output_base_dir (str): Manga output directory (frontend/public/data/manga)
+        tile_size (tuple): Width and height of a cover tile
+        image_format (str): Sheet format ('webp', 'avif' or 'jpeg')
+        quality (int): Sheet encoder quality
+        workers (int): Processes cutting cover tiles (defaults to CPU count)
+        full (bool): Cut every tile again instead of only those of changed covers
+
+    Returns:
+        dict: {"listings": maps, "sheets": sheets, "written": sheets encoded,
+               "tiles": tiles cut, "errors": covers that could not be read}
+    """
+    with open(os.path.join(output_base_dir, CATALOG_FILENAME), 'r', encoding='utf-8') as f:
+        catalog = json.load(f)
+
+    sprites_dir = os.path.join(output_base_dir, SPRITES_DIRNAME)
+    tiles_dir = os.path.join(sprites_dir, TILES_DIRNAME)
+    os.makedirs(tiles_dir, exist_ok=True)
+
+    # Serialize sprite updates from concurrent imports
+    with file_lock(os.path.join(sprites_dir, ".sprites.lock")):
+        state_path = os.path.join(sprites_dir, SPRITES_STATE_FILENAME)
+        state = _load_state(state_path, tile_size)
+        if full:
+            state["covers"] = {}
+
+        # Cut tiles of new and changed covers
+        covers = {}
+        jobs = []
+        for entry in catalog["series"]:
+            manga_id = entry["_id"]
+            source = cover_file(output_base_dir, manga_id, entry.get("thumbnail"))
+            if not source:
+                continue
+            fingerprint = _fingerprint(source)
+            tile_path = os.path.join(tiles_dir, f"{manga_id}.png")
+            covers[manga_id] = {"file": fingerprint, "tile": tile_path}
+            if state["covers"].get(manga_id, {}).get("file") != fingerprint or not os.path.exists(tile_path):
+                jobs.append((source, tile_path, tuple(tile_size)))
+
+        if len(jobs) <= 1 or workers == 1:
+            results = [_tile_job(job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(_tile_job, jobs, chunksize=8))
+        failed = {job[1] for job, result in zip(jobs, results) if result is None}
+        covers = {manga_id: cover for manga_id, cover in covers.items() if cover["tile"] not in failed}
+
+        # Pack the sheets and write one map per listing
+        stats = {"listings": 0, "sheets": 0, "written": 0, "tiles": len(jobs) - len(failed), "errors": len(failed)}
+        keep = {SPRITES_STATE_FILENAME, TILES_DIRNAME, ".sprites.lock"}
+        now = datetime.now().isoformat()
+        for name, (title, ids) in sorted(listings(catalog).items()):
+            ids = [manga_id for manga_id in ids if manga_id in covers]
+            sheets = []
+            positions = {}
+            for page, start in enumerate(range(0, len(ids), PAGE_SIZE)):
+                page_ids = ids[start:start + PAGE_SIZE]
+                hasher_input = [list(tile_size), image_format, quality, COLUMNS,
+                                [[manga_id, covers[manga_id]["file"]] for manga_id in page_ids]]
+                filename, size, length, written = write_sheet(
+                    sprites_dir, name, page, [covers[manga_id]["tile"] for manga_id in page_ids],
+                    tile_size, image_format, quality, hasher_input)
+                sheets.append({"src": f"{FRONTEND_PREFIX}{SPRITES_DIRNAME}/{filename}", "size": size, "bytes": length})
+                for position, manga_id in enumerate(page_ids):
+                    positions[manga_id] = [page, (position % COLUMNS) * tile_size[0],
+                                           (position // COLUMNS) * tile_size[1]]
+                keep.add(filename)
+                stats["sheets"] += 1
+                stats["written"] += written
+
+            sprite_map = {"v": SPRITES_VERSION, "listing": name, "title": title, "updatedAt": now,
+                          "tile": list(tile_size), "columns": COLUMNS, "pageSize": PAGE_SIZE,
+                          "sheets": sheets, "series": positions}
+            atomic_write_json(os.path.join(sprites_dir, f"{name}.json"), sprite_map,
+                              ensure_ascii=False, separators=(',', ':'))
+            keep.add(f"{name}.json")
+            stats["listings"] += 1
+
+        # Drop sheets, maps and tiles nothing refers to any more
+        for filename in os.listdir(sprites_dir):
+            if filename not in keep:
+                os.remove(os.path.join(sprites_dir, filename))
+        tiles = {os.path.basename(cover["tile"]) for cover in covers.values()}
+        for filename in os.listdir(tiles_dir):
+            if filename not in tiles:
+                os.remove(os.path.join(tiles_dir, filename))
+
+        atomic_write_json(state_path, {"v": SPRITES_VERSION, "tile": list(tile_size),
+                                       "covers": {manga_id: {"file": cover["file"]}
+                                                  for manga_id, cover in covers.items()}},
+                          ensure_ascii=False, separators=(',', ':'))
+    return stats
+
+def parse_tile_size(value):
+    """Parse a tile size such as '160x240'."""
+    try:
+        width, height = (int(part) for part in value.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid tile size: {value}")
+    if width <= 0 or height <= 0:
+        raise argparse.ArgumentTypeError(f"Invalid tile size: {value}")
+    return (width, height)
+
+def main():
+    parser = argparse.ArgumentParser(description='Build cover sprite sheets for listing pages')
+    parser.add_argument('--output', default='../../frontend/public/data/manga',
+                        help='Manga output directory (default: ../../frontend/public/data/manga)')
+    parser.add_argument('--tile', type=parse_tile_size, default=TILE_SIZE, metavar='WxH',
+                        help=f'Size of a cover tile (default: {TILE_SIZE[0]}x{TILE_SIZE[1]})')
+    parser.add_argument('--format', choices=sorted(FORMAT_EXTENSIONS), default=DEFAULT_FORMAT,
+                        help=f'Sheet image format (default: {DEFAULT_FORMAT})')
+    parser.add_argument('--quality', type=int, default=75, help='Sheet encoder quality (default: 75)')
+    parser.add_argument('--workers', type=int, help='Processes cutting cover tiles (default: CPU count)')
+    parser.add_argument('--full', action='store_true',
+                        help='Cut every cover tile again instead of only those of changed covers')
+    args = parser.parse_args()
+
+    output_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), args.output))
+    stats = update_sprites(output_dir, args.tile, args.format, args.quality, args.workers, args.full)
+    print(f"Cover sprites: {stats['listings']} listings, {stats['sheets']} sheets "
+          f"({stats['written']} written, {stats['tiles']} tiles cut, {stats['errors']} errors)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,8 +5,31 @@ import shutil
 import sys
 import json
 import re
+import glob
+import threading
+import time
+import contextlib
+import socketserver
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import Manager
 from PIL import Image
 import argparse
+from datetime import datetime
+from xml.etree import ElementTree
+from cbz_index import INDEX_FILENAME, build_page_index, write_page_index
+from page_store import blob_frontend_path, store_dir_for, store_stream
+from import_state import atomic_write_json, is_unchanged, load_state, save_state
+from chapter_preload import PRELOAD_PAGES, write_preload_manifests
+from chapters_manifest import CHAPTERS_FORMATS, write_chapters_json
+from catalog_index import update_catalog
+from search_index import update_search_index
+from cover_sprites import update_sprites
+from page_metadata import annotate_pages, chapter_page_fields, read_page_metadata
+from import_metrics import ImportMetrics, emit_metrics, write_prometheus
+from staged_release import StagedRelease
+from safe_extract import (ArchiveLimitError, ExtractionMeter, add_limit_arguments, check_archive,
+                          parse_limits, read_small_member, share_bandwidth)
+from image_variants import DEFAULT_FORMAT, FORMAT_EXTENSIONS, make_thumbnail, parse_widths, transcode_pages
 
 def sanitize_filename(filename):
     """
@@ -18,39 +41,286 @@ def sanitize_filename(filename):
     sanitized = re.sub(r'\s+', '_', sanitized)
     return sanitized.lower()
 
-def extract_cbz(cbz_path, manga_name, output_base_dir):
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.gif', '.webp']
+
+def natural_sort_key(s):
+    """Sort key so that page10 comes after page9, not after page1."""
+    return [int(text) if text.isdigit() else text.lower() for text in re.split(r'(\d+)', s)]
+
+def manga_folder_name(manga_name):
+    """Sanitize manga name for folder name - make it short and clean."""
+    folder_name = sanitize_filename(manga_name)
+    if len(folder_name) > 30:  # Limit folder name length
+        folder_name = folder_name[:30]
+    return folder_name
+
+def list_image_files(zip_ref):
+    """Return the image members of an open archive in natural page order."""
+    file_list = sorted([f for f in zip_ref.namelist() if not f.endswith('/')])
+    print(f"Found {len(file_list)} files in archive")
+
+    image_files = [f for f in file_list if os.path.splitext(f.lower())[1] in IMAGE_EXTENSIONS]
+    print(f"Found {len(image_files)} image files")
+
+    return sorted(image_files, key=natural_sort_key)
+
+def extract_cover(zip_ref, cover_file, output_dir, folder_name, meter=None):
+    """
+    Extract the cover image next to info.json.
+
+    Args:
+        meter (ExtractionMeter): Optional byte budget/bandwidth cap for the copy
+
+    Returns:
+        str: Cover path for the frontend
+    """
+    cover_ext = os.path.splitext(cover_file)[1]
+    cover_path = os.path.join(output_dir, f"cover{cover_ext}")
+    print(f"Using {cover_file} as cover image")
+
+    with zip_ref.open(cover_file) as source, open(cover_path, 'wb') as target:
+        (meter or ExtractionMeter()).copy(source, target)
+
+    print(f"Cover extracted to {cover_path}")
+
+    # Create relative path for frontend
+    cover_rel_path = f"/data/manga/{folder_name}/cover{cover_ext}"
+    print(f"Cover path for frontend: {cover_rel_path}")
+    return cover_rel_path
+
+def frontend_path(output_base_dir, path):
+    """Convert a file inside the base output directory to its frontend path."""
+    rel_path = os.path.relpath(path, output_base_dir).replace(os.sep, '/')
+    return f"/data/manga/{rel_path}"
+
+def read_comic_info_bookmarks(zip_ref):
+    """
+    Read chapter bookmarks from ComicInfo.xml, if the archive has one.
+
+    ComicInfo marks the first page of a chapter with a Bookmark attribute:
+        <Pages><Page Image="12" Bookmark="Chapter 2"/></Pages>
+
+    Returns:
+        dict: {image index: bookmark title}, empty when there are none
+    """
+    comic_info = next((name for name in zip_ref.namelist()
+                       if os.path.basename(name).lower() == 'comicinfo.xml'), None)
+    if not comic_info:
+        return {}
+
+    try:
+        root = ElementTree.fromstring(read_small_member(zip_ref, comic_info))
+    except (ElementTree.ParseError, ArchiveLimitError) as e:
+        print(f"Ignoring unreadable ComicInfo.xml: {str(e)}")
+        return {}
+
+    bookmarks = {}
+    for page in root.iter('Page'):
+        bookmark = (page.get('Bookmark') or '').strip()
+        image = page.get('Image')
+        if bookmark and image is not None and image.isdigit():
+            bookmarks[int(image)] = bookmark
+    return bookmarks
+
+def detect_chapters(zip_ref, image_files):
+    """
+    Split the pages of an archive into chapters.
+
+    ComicInfo.xml bookmarks win when present; otherwise every folder inside
+    the archive becomes a chapter. Loose images at the archive root next to
+    chapter folders (a cover, front matter) are not a chapter of their own:
+    they are put in front of the first chapter. Archives with a single
+    folder (or none) are one chapter.
+
+    Args:
+        zip_ref (zipfile.ZipFile): Open archive
+        image_files (list): Image members in page order
+
+    Returns:
+        list: (title, members) tuples in reading order
+    """
+    bookmarks = read_comic_info_bookmarks(zip_ref)
+    if bookmarks:
+        chapters = []
+        for index, member in enumerate(image_files):
+            if index in bookmarks or not chapters:
+                chapters.append((bookmarks.get(index, "Chapter 1"), []))
+            chapters[-1][1].append(member)
+        print(f"Found {len(chapters)} chapters in ComicInfo.xml")
+        return chapters
+
+    folders = {}
+    for member in image_files:
+        folders.setdefault(os.path.dirname(member), []).append(member)
+    front_matter = folders.pop("", []) if len(folders) > 1 else []
+    if len(folders) <= 1:
+        return [("Chapter 1", front_matter + [member for members in folders.values() for member in members])]
+
+    print(f"Found {len(folders)} chapter folders in archive")
+    chapters = [(os.path.basename(folder), members) for folder, members in folders.items()]
+    chapters[0] = (chapters[0][0], front_matter + chapters[0][1])
+    return chapters
+
+def choose_cover(image_files):
+    """
+    Pick the cover image of an archive.
+
+    A loose image at the archive root next to chapter folders is the cover
+    (one named cover.* or folder.* first); only without one is the first
+    page of the first chapter used.
+    """
+    root_images = [member for member in image_files if not os.path.dirname(member)]
+    if root_images and len(root_images) < len(image_files):
+        named = [member for member in root_images
+                 if os.path.splitext(member)[0].lower() in ('cover', 'folder')]
+        return (named or root_images)[0]
+    return image_files[0]
+
+def page_chapters(zip_ref, image_files, cover):
+    """
+    Detect chapters and drop the cover page from them.
+
+    The cover (see choose_cover()) is not a chapter page unless it is the
+    only image. Chapters left without pages are dropped.
+
+    Returns:
+        list: (title, members) tuples in reading order
+    """
+    chapters = detect_chapters(zip_ref, image_files)
+    if len(image_files) > 1:
+        chapters = [(title, [member for member in members if member != cover]) for title, members in chapters]
+    return [(title, members) for title, members in chapters if members]
+
+def write_manga_json(output_dir, folder_name, manga_name, cbz_path, cover, chapters, info_extra=None,
+                     chapters_format="full"):
+    """
+    Write info.json and chapters.json for an imported manga.
+
+    Args:
+        output_dir (str): Manga output directory
+        folder_name (str): Sanitized folder name (used as id)
+        manga_name (str): Display title
+        cbz_path (str): Source archive, mentioned in the description
+        cover (str): Cover path for the frontend
+        chapters (list): One dict per chapter with "number", "title" and
+            "images" (page paths for the frontend); any other keys are
+            copied into the chapter entry
+        info_extra (dict): Optional extra fields for info.json
+        chapters_format (str): Layout of chapters.json, "full", "compact" or
+            "split" (see chapters_manifest.py)
+    """
+    current_time = datetime.now().isoformat()
+
+    info_json = {
+        "_id": folder_name,
+        "title": manga_name,
+        "author": "Unknown",
+        "artist": "Unknown",
+        "description": f"Imported from CBZ file: {os.path.basename(cbz_path)}",
+        "genre": "Manga",
+        "genres": ["Manga"],
+        "status": "ongoing",
+        "thumbnail": cover,
+        "type": "normal",
+        "releaseYear": datetime.now().year,
+        "chapters": len(chapters),
+        "number_of_chapters": len(chapters),
+        "views": 0,
+        "likes": 0,
+        "rating": 5.0,
+        "tags": ["Manga", "Imported"],
+        "createdAt": current_time,
+        "updatedAt": current_time
+    }
+    info_json.update(info_extra or {})
+
+    info_path = os.path.join(output_dir, "info.json")
+    atomic_write_json(info_path, info_json, indent=2)
+
+    print(f"Created info.json at {info_path}")
+
+    # Create chapters.json file, one entry at a time
+    def chapter_entries():
+        for chapter in chapters:
+            number = chapter["number"]
+            entry = {
+                "_id": f"{folder_name}-vol-{number}",
+                "number": number,
+                "title": chapter["title"],
+                "url": f"/data/manga/{folder_name}/chapters/{number}",
+                "pages": len(chapter["images"]),
+                "images": chapter["images"],
+                "createdAt": current_time,
+                "updatedAt": current_time
+            }
+            entry.update({key: value for key, value in chapter.items() if key not in entry})
+            yield entry
+
+    chapters_path = write_chapters_json(output_dir, folder_name, chapter_entries(), chapters_format)
+
+    print(f"Created chapters.json at {chapters_path}")
+
+def extract_cbz(cbz_path, manga_name, output_base_dir, progress=None,
+                variant_widths=None, variant_format=DEFAULT_FORMAT, transcode_workers=None,
+                dedupe=False, resume=False, chapters_format="full", placeholders=False, limits=None,
+                verbose=False, metrics=None, release=None, preload_pages=PRELOAD_PAGES, bundles=False):
     """
     Extract a CBZ file to the specified output directory.
 
+    Chapters are detected from folders inside the archive or ComicInfo.xml
+    bookmarks (see detect_chapters()) and written to chapters/<number>/.
+
     Args:
         cbz_path (str): Path to the CBZ file
         manga_name (str): Name of the manga (for folder naming)
         output_base_dir (str): Base directory where manga will be extracted
+        progress (callable): Optional callback invoked as progress(done, total)
+            after each page
+        variant_widths (list): Optional widths of resized page variants to
+            generate after extraction (e.g. [480, 960, 1600])
+        variant_format (str): Image format of the variants
+        transcode_workers (int): Number of processes used for transcoding and
+            page metadata
+        dedupe (bool): Write pages to the shared content-addressed store
+            (see page_store.py) instead of the chapter folder
+        resume (bool): Only extract pages whose CRC32/size changed since the
+            previous import of this manga (see import_state.py)
+        chapters_format (str): Layout of chapters.json (see write_manga_json())
+        placeholders (bool): Also record a BlurHash placeholder per page
+            (page dimensions are always recorded, see page_metadata.py)
+        limits (ExtractionLimits): Size, entry count, compression ratio and
+            bandwidth limits (see safe_extract.py); defaults apply when None
+        verbose (bool): Log every page (errors are always logged)
+        metrics (ImportMetrics): Collects per-stage metrics (see
+            import_metrics.py); a new one is used when None
+        release (StagedRelease): Build the manga folder in this release's
+            staging directory and publish it at the end (see
+            staged_release.py); without one the folder is written in place
+        preload_pages (int): Pages of the next chapter listed in each
+            chapter's preload manifest, 0 for none (see chapter_preload.py)
+        bundles (bool): Also write a range-indexed bundle of every chapter
 
     Returns:
-        dict: Information about the extracted manga
+        dict: Information about the extracted manga, with the metrics record
+            under "metrics"
+
+    Raises:
+        ArchiveLimitError: If the archive exceeds the limits
     """
     print(f"Starting extraction of {cbz_path}")
     print(f"Manga name: {manga_name}")
     print(f"Output directory: {output_base_dir}")
 
-    # Sanitize manga name for folder name - make it short and clean
-    folder_name = sanitize_filename(manga_name)
-    if len(folder_name) > 30:  # Limit folder name length
-        folder_name = folder_name[:30]
-
+    folder_name = manga_folder_name(manga_name)
     print(f"Sanitized folder name: {folder_name}")
 
-    # Create full output path
-    output_dir = os.path.join(output_base_dir, folder_name)
-    chapters_dir = os.path.join(output_dir, "chapters", "1")  # Default to chapter 1
-
+    # Create full output path (pages and manifests are written to staging when the import is staged)
+    public_dir = os.path.join(output_base_dir, folder_name)
+    output_dir = release.dir if release else public_dir
     print(f"Full output path: {output_dir}")
-    print(f"Chapters directory: {chapters_dir}")
 
     # Create output directories
     os.makedirs(output_dir, exist_ok=True)
-    os.makedirs(chapters_dir, exist_ok=True)
 
     # Information to return
     manga_info = {
@@ -58,134 +328,216 @@ def extract_cbz(cbz_path, manga_name, output_base_dir):
         "folder": folder_name,
         "cover": None,
         "pages": 0,
-        "chapter_images": []
+        "chapter_images": [],
+        "chapters": []
     }
+    page_paths = []
+    page_slots = []
+    store_dir = store_dir_for(output_base_dir)
+    previous_state = load_state(public_dir) if resume else {"pages": {}}
+    if release and resume:
+        # Unchanged pages are hard links to the live release's pages
+        release.seed_chapters()
+        for entry in previous_state["pages"].values():
+            entry["path"] = release.staged_path(entry["path"])
+    state = {"v": previous_state.get("v", 1), "source": os.path.basename(cbz_path), "pages": {}}
+    skipped = 0
+    copied_bytes = 0
+    errors = 0
+    meter = ExtractionMeter(limits)
+    metrics = metrics or ImportMetrics(cbz_path, "extract")
 
     try:
         # Open the CBZ file (which is a ZIP file)
-        with zipfile.ZipFile(cbz_path, 'r') as zip_ref:
-            # Get list of files in the archive
-            file_list = sorted([f for f in zip_ref.namelist() if not f.endswith('/')])
-            print(f"Found {len(file_list)} files in archive")
+        with metrics.stage("open"):
+            zip_ref = zipfile.ZipFile(cbz_path, 'r')
+        metrics.add("open", size=os.path.getsize(cbz_path), items=1)
+        with zip_ref:
+            with metrics.stage("index"):
+                image_files = list_image_files(zip_ref)
 
-            # Filter image files
-            image_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.webp']
-            image_files = [f for f in file_list if os.path.splitext(f.lower())[1] in image_extensions]
-            print(f"Found {len(image_files)} image files")
+                if not image_files:
+                    print("No image files found in the CBZ archive")
+                    return None
 
-            # Sort image files naturally (so page10 comes after page9, not after page1)
-            def natural_sort_key(s):
-                return [int(text) if text.isdigit() else text.lower() for text in re.split(r'(\d+)', s)]
+                # Refuse oversized archives and zip bombs before writing anything
+                declared = check_archive(zip_ref, image_files, meter.limits, output_base_dir)
+                print(f"Archive expands to {declared} bytes")
 
-            image_files = sorted(image_files, key=natural_sort_key)
+                cover = choose_cover(image_files)
+                chapters = page_chapters(zip_ref, image_files, cover)
+            metrics.add("index", items=len(image_files))
 
-            if not image_files:
-                print("No image files found in the CBZ archive")
-                return None
+            with metrics.stage("cover"):
+                manga_info["cover"] = extract_cover(zip_ref, cover, output_dir, folder_name, meter)
+            metrics.add("cover", size=zip_ref.getinfo(cover).file_size, items=1)
 
-            # Use the first image as cover
-            cover_file = image_files[0]
-            cover_ext = os.path.splitext(cover_file)[1]
-            cover_path = os.path.join(output_dir, f"cover{cover_ext}")
-            print(f"Using {cover_file} as cover image")
+            total = sum(len(members) for _, members in chapters)
+            done = 0
+            page_copy_start = time.perf_counter()
 
-            # Extract cover
-            with zip_ref.open(cover_file) as source, open(cover_path, 'wb') as target:
-                shutil.copyfileobj(source, target)
+            for number, (title, members) in enumerate(chapters, 1):
+                chapter_dir = os.path.join(output_dir, "chapters", str(number))
+                if not dedupe:
+                    os.makedirs(chapter_dir, exist_ok=True)
+                chapter = {"number": number, "title": title, "images": []}
+                if dedupe:
+                    chapter["hashes"] = []
 
-            print(f"Cover extracted to {cover_path}")
+                for i, img_file in enumerate(members):
+                    done += 1
+                    # Generate page number with leading zeros
+                    page_filename = f"{i+1:03d}{os.path.splitext(img_file)[1]}"
+                    page_path = os.path.join(chapter_dir, page_filename)
+                    slot = f"{number}/{page_filename}"
 
-            # Create relative path for frontend
-            cover_rel_path = f"/data/manga/{folder_name}/cover{cover_ext}"
-            manga_info["cover"] = cover_rel_path
-            print(f"Cover path for frontend: {cover_rel_path}")
+                    member = zip_ref.getinfo(img_file)
+                    previous = previous_state["pages"].get(slot)
+                    if (resume and previous and previous.get("dedupe", False) == dedupe
+                            and is_unchanged(previous, member.CRC, member.file_size)):
+                        # Same bytes as last import: keep the page that is already there
+                        chapter["images"].append(previous["image"])
+                        page_paths.append(previous["path"])
+                        page_slots.append(slot)
+                        if dedupe:
+                            chapter["hashes"].append(previous["hash"])
+                        state["pages"][slot] = previous
+                        skipped += 1
+                        if progress:
+                            progress(done, total)
+                        continue
 
-            # Extract all other images as chapter pages
-            for i, img_file in enumerate(image_files):
-                # Skip the first image if it's already used as cover and we have more than one image
-                if i == 0 and len(image_files) > 1:
-                    continue
+                    if verbose:
+                        print(f"Extracting page {done}/{total}: {img_file} -> {slot}")
 
-                # Generate page number with leading zeros
-                page_num = i
-                page_filename = f"{page_num+1:03d}{os.path.splitext(img_file)[1]}"
-                page_path = os.path.join(chapters_dir, page_filename)
+                    # Extract the image
+                    try:
+                        key = None
+                        if dedupe:
+                            # Pages already in the store are hashed but not written again
+                            page_ext = os.path.splitext(img_file)[1]
+                            with zip_ref.open(img_file) as source:
+                                key, page_path, written = store_stream(store_dir, meter.reader(source), page_ext)
+                            rel_path = blob_frontend_path(key, page_ext)
+                            chapter["hashes"].append(key)
+                            if not written and verbose:
+                                print(f"  - Already in store: {key}")
+                        else:
+                            # Replace rather than rewrite: the old file may be shared with the live release
+                            with zip_ref.open(img_file) as source, open(f"{page_path}.part", 'wb') as target:
+                                meter.copy(source, target)
+                            os.replace(f"{page_path}.part", page_path)
+                            rel_path = f"/data/manga/{folder_name}/chapters/{number}/{page_filename}"
 
-                print(f"Extracting page {i+1}/{len(image_files)}: {img_file} -> {page_filename}")
+                        # Add to chapter images list
+                        chapter["images"].append(rel_path)
+                        page_paths.append(page_path)
+                        page_slots.append(slot)
+                        state["pages"][slot] = {
+                            "member": img_file,
+                            "crc": member.CRC,
+                            "size": member.file_size,
+                            "path": page_path,
+                            "image": rel_path,
+                            "dedupe": dedupe,
+                            "hash": key
+                        }
+                        copied_bytes += member.file_size
+                        if verbose:
+                            print(f"  - Extracted to {page_path}")
+                            print(f"  - Frontend path: {rel_path}")
+                    except ArchiveLimitError:
+                        if os.path.exists(f"{page_path}.part"):
+                            os.remove(f"{page_path}.part")
+                        raise
+                    except Exception as e:
+                        errors += 1
+                        if os.path.exists(f"{page_path}.part"):
+                            os.remove(f"{page_path}.part")
+                        print(f"  - Error extracting {img_file}: {str(e)}")
 
-                # Extract the image
-                try:
-                    with zip_ref.open(img_file) as source, open(page_path, 'wb') as target:
-                        shutil.copyfileobj(source, target)
+                    if progress:
+                        progress(done, total)
 
-                    # Add to chapter images list
-                    rel_path = f"/data/manga/{folder_name}/chapters/1/{page_filename}"
-                    manga_info["chapter_images"].append(rel_path)
-                    print(f"  - Extracted to {page_path}")
-                    print(f"  - Frontend path: {rel_path}")
-                except Exception as e:
-                    print(f"  - Error extracting {img_file}: {str(e)}")
+                manga_info["chapters"].append(chapter)
+                manga_info["chapter_images"].extend(chapter["images"])
 
             manga_info["pages"] = len(manga_info["chapter_images"])
+            metrics.add("page_copy", seconds=time.perf_counter() - page_copy_start,
+                        size=copied_bytes, items=len(page_paths) - skipped, errors=errors)
+
+            if resume:
+                print(f"Resumed import: {skipped} unchanged pages skipped")
+                remove_stale_pages(previous_state, state)
+
+            # Page sizes (and placeholders) for the readers' layout; cached in the state
+            page_entries = [state["pages"][slot] for slot in page_slots]
+            with metrics.stage("metadata"):
+                annotate_pages(page_entries, placeholders, transcode_workers)
+            metrics.add("metadata", items=len(page_entries),
+                        errors=sum(1 for entry in page_entries if "width" not in entry))
+            start = 0
+            for chapter in manga_info["chapters"]:
+                end = start + len(chapter["images"])
+                chapter.update(chapter_page_fields(page_entries[start:end], placeholders))
+                start = end
 
             print(f"Successfully extracted {cbz_path} to {output_dir}")
             print(f"Total pages: {manga_info['pages']}")
-            print(f"Chapter images: {len(manga_info['chapter_images'])}")
-
-            # Create info.json file
-            from datetime import datetime
-            current_time = datetime.now().isoformat()
-
-            info_json = {
-                "_id": folder_name,
-                "title": manga_name,
-                "author": "Unknown",
-                "artist": "Unknown",
-                "description": f"Imported from CBZ file: {os.path.basename(cbz_path)}",
-                "genre": "Manga",
-                "genres": ["Manga"],
-                "status": "ongoing",
-                "thumbnail": manga_info["cover"],
-                "type": "normal",
-                "releaseYear": datetime.now().year,
-                "chapters": 1,
-                "number_of_chapters": 1,
-                "views": 0,
-                "likes": 0,
-                "rating": 5.0,
-                "tags": ["Manga", "Imported"],
-                "createdAt": current_time,
-                "updatedAt": current_time
-            }
+            print(f"Chapters: {len(manga_info['chapters'])}")
+
+        info_extra = {}
+        if variant_widths:
+            with metrics.stage("transcode"):
+                variants, cover_thumbnail = transcode_variants(
+                    output_base_dir, output_dir, manga_info, page_paths,
+                    variant_widths, variant_format, transcode_workers, skip_existing=resume,
+                    public_path=release.public_path if release else None)
+            metrics.add("transcode", items=len(page_paths) * len(variant_widths))
+            manga_info["variants"] = variants
+            manga_info["cover_thumbnail"] = cover_thumbnail
+            info_extra["coverThumbnail"] = cover_thumbnail
+
+            # Split the flat variant lists back into chapters
+            start = 0
+            for chapter in manga_info["chapters"]:
+                end = start + len(chapter["images"])
+                chapter["variants"] = {width: paths[start:end] for width, paths in variants.items()}
+                start = end
 
-            info_path = os.path.join(output_dir, "info.json")
-            with open(info_path, 'w', encoding='utf-8') as f:
-                json.dump(info_json, f, indent=2)
+        if release:
+            info_extra["version"] = release.version
+            # The state is read by the next import, after this release is live
+            for entry in state["pages"].values():
+                entry["path"] = release.public_path(entry["path"])
 
-            print(f"Created info.json at {info_path}")
+        if preload_pages:
+            info_extra["preload"] = preload_pages
+        if bundles:
+            info_extra["bundles"] = True
 
-            # Create chapters.json file
-            chapters_json = [
-                {
-                    "_id": f"{folder_name}-vol-1",
-                    "number": 1,
-                    "title": "Chapter 1",
-                    "url": f"/data/manga/{folder_name}/chapters/1",
-                    "pages": manga_info["pages"],
-                    "images": manga_info["chapter_images"],
-                    "createdAt": current_time,
-                    "updatedAt": current_time
-                }
-            ]
+        with metrics.stage("manifest_write"):
+            write_manga_json(output_dir, folder_name, manga_name, cbz_path,
+                             manga_info["cover"], manga_info["chapters"], info_extra, chapters_format)
+            save_state(output_dir, state)
+        metrics.add("manifest_write", size=manifest_size(output_dir), items=len(manga_info["chapters"]))
 
-            chapters_path = os.path.join(output_dir, "chapters.json")
-            with open(chapters_path, 'w', encoding='utf-8') as f:
-                json.dump(chapters_json, f, indent=2)
+        with metrics.stage("preload"):
+            preload = write_preload_manifests(output_dir, folder_name, manga_info["chapters"], output_base_dir,
+                                              preload_pages, bundles)
+        metrics.add("preload", size=preload["bytes"], items=preload["manifests"] + preload["bundles"])
 
-            print(f"Created chapters.json at {chapters_path}")
+        if release:
+            with metrics.stage("publish"):
+                release.publish()
+            metrics.add("publish", items=1)
 
-            return manga_info
+        manga_info["metrics"] = metrics.record(manga=folder_name, pages=manga_info["pages"], skipped=skipped)
+        return manga_info
 
+    except ArchiveLimitError as e:
+        print(f"Error: Archive rejected: {str(e)}")
+        raise
     except zipfile.BadZipFile:
         print("Error: The file is not a valid CBZ/ZIP file")
         print(f"File path: {cbz_path}")
@@ -198,15 +550,740 @@ def extract_cbz(cbz_path, manga_name, output_base_dir):
         traceback.print_exc()
         return None
 
+def manifest_size(output_dir):
+    """Bytes of info.json and chapters.json (including split chapter files) of a manga."""
+    paths = [os.path.join(output_dir, "info.json"), os.path.join(output_dir, "chapters.json")]
+    paths += glob.glob(os.path.join(output_dir, "chapters", "*.json"))
+    return sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+
+def remove_stale_pages(previous_state, state):
+    """
+    Delete pages (and their variants) written by the previous import that
+    the new import no longer uses. Store blobs are shared, so they are kept.
+    """
+    current_paths = {entry["path"] for entry in state["pages"].values()}
+    for slot, previous in previous_state["pages"].items():
+        if slot in state["pages"] or previous.get("dedupe") or previous["path"] in current_paths:
+            continue
+        stem = os.path.splitext(previous["path"])[0]
+        variant_pattern = os.path.join(os.path.dirname(stem), "w*", os.path.basename(stem) + ".*")
+        for stale_path in [previous["path"]] + glob.glob(variant_pattern):
+            if os.path.exists(stale_path):
+                os.remove(stale_path)
+
+def transcode_variants(output_base_dir, output_dir, manga_info, page_paths, widths, image_format, workers,
+                       skip_existing=False, public_path=None):
+    """
+    Generate resized page variants and a cover thumbnail.
+
+    Args:
+        public_path (callable): Maps a written file to its path in the public
+            manga folder (for staged imports, see StagedRelease.public_path)
+
+    Returns:
+        tuple: ({width: frontend paths aligned with the pages}, cover thumbnail path)
+    """
+    print(f"Transcoding {len(page_paths)} pages to {image_format} at widths {widths}")
+    page_variants = transcode_pages(page_paths, widths, image_format, workers, skip_existing)
+
+    # Pages narrower than a width keep their original image for that width,
+    # so every variant list stays aligned with chapter_images
+    public_path = public_path or (lambda path: path)
+    variants = {}
+    for width in widths:
+        variants[str(width)] = [
+            frontend_path(output_base_dir, public_path(generated[width])) if width in generated else original
+            for generated, original in zip(page_variants, manga_info["chapter_images"])
+        ]
+
+    cover_path = os.path.join(output_dir, os.path.basename(manga_info["cover"]))
+    thumbnail_path = os.path.join(output_dir, f"cover-thumb{FORMAT_EXTENSIONS[image_format]}")
+    make_thumbnail(cover_path, thumbnail_path, image_format=image_format)
+    return variants, frontend_path(output_base_dir, public_path(thumbnail_path))
+
+def index_cbz(cbz_path, manga_name, output_base_dir, progress=None, **options):
+    """
+    Import a CBZ file without extracting its pages.
+
+    The archive is kept next to info.json as volume.cbz and a sidecar page
+    index records where every page lives inside it, so pages can be served
+    as byte ranges of the archive (see cbz_index.py). Only the cover is
+    extracted.
+
+    Args:
+        cbz_path (str): Path to the CBZ file
+        manga_name (str): Name of the manga (for folder naming)
+        output_base_dir (str): Base directory where manga will be stored
+        progress (callable): Optional callback invoked as progress(done, total)
+        options: chapters_format, placeholders, limits, metrics, release and
+            preload_pages are honoured; extraction-only options (such as
+            variant_widths and bundles) are ignored
+
+    Returns:
+        dict: Information about the imported manga, with the metrics record
+            under "metrics"
+    """
+    print(f"Starting indexing of {cbz_path}")
+    metrics = options.get("metrics") or ImportMetrics(cbz_path, "index")
+
+    folder_name = manga_folder_name(manga_name)
+    release = options.get("release")
+    output_dir = release.dir if release else os.path.join(output_base_dir, folder_name)
+    os.makedirs(output_dir, exist_ok=True)
+
+    manga_info = {
+        "title": manga_name,
+        "folder": folder_name,
+        "cover": None,
+        "pages": 0,
+        "chapter_images": [],
+        "chapters": [],
+        "indexed": True
+    }
+
+    try:
+        # Keep the archive; a hard link avoids copying when on the same filesystem
+        archive_name = "volume.cbz"
+        archive_path = os.path.join(output_dir, archive_name)
+        with metrics.stage("open"):
+            if os.path.exists(archive_path):
+                os.remove(archive_path)
+            try:
+                os.link(cbz_path, archive_path)
+            except OSError:
+                shutil.copyfile(cbz_path, archive_path)
+            print(f"Archive stored at {archive_path}")
+            zip_ref = zipfile.ZipFile(archive_path, 'r')
+        metrics.add("open", size=os.path.getsize(archive_path), items=1)
+
+        with zip_ref:
+            with metrics.stage("index"):
+                image_files = list_image_files(zip_ref)
+
+                if not image_files:
+                    print("No image files found in the CBZ archive")
+                    return None
+
+                # Pages are inflated on request, so the same zip bomb checks apply
+                meter = ExtractionMeter(options.get("limits"))
+                try:
+                    check_archive(zip_ref, image_files, meter.limits)
+                except ArchiveLimitError:
+                    os.remove(archive_path)
+                    raise
+                cover = choose_cover(image_files)
+                chapters = page_chapters(zip_ref, image_files, cover)
+
+            with metrics.stage("cover"):
+                manga_info["cover"] = extract_cover(zip_ref, cover, output_dir, folder_name, meter)
+            metrics.add("cover", size=zip_ref.getinfo(cover).file_size, items=1)
+
+            # Page sizes (and placeholders), read from the archive members
+            placeholders = options.get("placeholders", False)
+            page_metadata = []
+            errors = 0
+            with metrics.stage("metadata"):
+                for _, members in chapters:
+                    for member in members:
+                        try:
+                            with zip_ref.open(member) as source:
+                                page_metadata.append(read_page_metadata(source, placeholders))
+                        except Exception as e:
+                            errors += 1
+                            print(f"  - Error reading page metadata of {member}: {str(e)}")
+                            page_metadata.append({})
+            metrics.add("metadata", items=len(page_metadata), errors=errors)
+
+        page_files = [member for _, members in chapters for member in members]
+        with metrics.stage("index"):
+            entries = build_page_index(archive_path, page_files)
+            write_page_index(os.path.join(output_dir, INDEX_FILENAME), archive_name, entries)
+        metrics.add("index", size=os.path.getsize(os.path.join(output_dir, INDEX_FILENAME)), items=len(entries))
+        print(f"Indexed {len(entries)} pages")
+
+        # Pages are numbered across the whole archive; "v" (the page CRC) changes the URL
+        # when a re-import changes the page, so the route can let clients cache it forever
+        page_number = 0
+        for number, (title, members) in enumerate(chapters, 1):
+            images = [f"/api/cbz/pages/{folder_name}/{page_number + i}?v={entries[page_number + i - 1][5]:08x}"
+                      for i in range(1, len(members) + 1)]
+            page_number += len(members)
+            chapter = {"number": number, "title": title, "images": images}
+            chapter.update(chapter_page_fields(page_metadata[page_number - len(members):page_number], placeholders))
+            manga_info["chapters"].append(chapter)
+            manga_info["chapter_images"].extend(images)
+
+        manga_info["pages"] = len(entries)
+        if progress:
+            progress(len(image_files), len(image_files))
+
+        info_extra = {"version": release.version} if release else {}
+        preload_pages = options.get("preload_pages", PRELOAD_PAGES)
+        if preload_pages:
+            info_extra["preload"] = preload_pages
+
+        with metrics.stage("manifest_write"):
+            write_manga_json(output_dir, folder_name, manga_name, cbz_path,
+                             manga_info["cover"], manga_info["chapters"], info_extra,
+                             chapters_format=options.get("chapters_format", "full"))
+        metrics.add("manifest_write", size=manifest_size(output_dir), items=len(manga_info["chapters"]))
+
+        # Pages are served from the archive: manifests list page URLs, without sizes or bundles
+        with metrics.stage("preload"):
+            preload = write_preload_manifests(output_dir, folder_name, manga_info["chapters"],
+                                              preload_pages=preload_pages)
+        metrics.add("preload", items=preload["manifests"])
+
+        if release:
+            with metrics.stage("publish"):
+                release.publish()
+            metrics.add("publish", items=1)
+
+        manga_info["metrics"] = metrics.record(manga=folder_name, pages=manga_info["pages"])
+        return manga_info
+
+    except ArchiveLimitError as e:
+        print(f"Error: Archive rejected: {str(e)}")
+        raise
+    except zipfile.BadZipFile as e:
+        print(f"Error: The file is not a valid CBZ/ZIP file: {str(e)}")
+        return None
+    except Exception as e:
+        print(f"An error occurred: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+def import_cbz(cbz_path, manga_name, output_base_dir, progress=None, index_only=False, staged=True, **options):
+    """
+    Import a CBZ file by extracting it, or by indexing it when index_only is set.
+
+    Unless staged is False, the manga folder is built in a staging directory
+    and published atomically when the import succeeds, so readers never see
+    a half-written folder (see staged_release.py). Extra keyword options are
+    passed through to extract_cbz()/index_cbz().
+    """
+    importer = index_cbz if index_only else extract_cbz
+    if not staged:
+        return importer(cbz_path, manga_name, output_base_dir, progress=progress, **options)
+
+    release = StagedRelease(output_base_dir, manga_folder_name(manga_name)).begin()
+    try:
+        result = importer(cbz_path, manga_name, output_base_dir, progress=progress, release=release, **options)
+    finally:
+        # No-op once published; otherwise the live folder stays as it was
+        release.abort()
+    return result
+
+def refresh_catalog(output_base_dir):
+    """Update catalog.json, search.json and the cover sprites after an import; failures only print a warning."""
+    try:
+        stats = update_catalog(output_base_dir)
+        print(f"Updated catalog: {stats['series']} series ({stats['read']} re-read)")
+    except Exception as e:
+        print(f"WARNING: Could not update catalog: {str(e)}")
+    try:
+        stats = update_search_index(output_base_dir)
+        print(f"Updated search index: {stats['docs']} stories ({stats['read']} re-read)")
+    except Exception as e:
+        print(f"WARNING: Could not update search index: {str(e)}")
+    try:
+        stats = update_sprites(output_base_dir)
+        print(f"Updated cover sprites: {stats['sheets']} sheets ({stats['written']} written)")
+    except Exception as e:
+        print(f"WARNING: Could not update cover sprites: {str(e)}")
+
+def import_options(args):
+    """Build import_cbz() keyword options from parsed command line arguments."""
+    options = {"index_only": args.index}
+    if args.variants:
+        options["variant_widths"] = parse_widths(args.variants)
+        options["variant_format"] = args.variant_format
+    if args.transcode_workers:
+        options["transcode_workers"] = args.transcode_workers
+    if args.dedupe:
+        options["dedupe"] = True
+    if args.resume:
+        options["resume"] = True
+    if args.chapters_format != "full":
+        options["chapters_format"] = args.chapters_format
+    if args.placeholders:
+        options["placeholders"] = True
+    if args.verbose:
+        options["verbose"] = True
+    if args.in_place:
+        options["staged"] = False
+    if args.preload_pages != PRELOAD_PAGES:
+        options["preload_pages"] = args.preload_pages
+    if args.bundles:
+        options["bundles"] = True
+    options["limits"] = parse_limits(args)
+    return options
+
+def find_cbz_files(directory):
+    """
+    Find all CBZ files in a directory (recursively).
+
+    Args:
+        directory (str): Directory to scan
+
+    Returns:
+        list: Sorted list of (cbz_path, manga_name) tuples
+    """
+    jobs = []
+    for root, _dirs, files in os.walk(directory):
+        for filename in files:
+            if filename.lower().endswith('.cbz'):
+                cbz_path = os.path.abspath(os.path.join(root, filename))
+                jobs.append((cbz_path, os.path.splitext(filename)[0]))
+    return sorted(jobs)
+
+def read_manifest(manifest_path):
+    """
+    Read a batch manifest file.
+
+    Each non-empty line holds a CBZ path, optionally followed by a tab and the
+    manga name. Lines starting with '#' are ignored. Relative paths are
+    resolved against the manifest's directory.
+
+    Args:
+        manifest_path (str): Path to the manifest file
+
+    Returns:
+        list: List of (cbz_path, manga_name) tuples
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    jobs = []
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            cbz_path, _, manga_name = line.partition('\t')
+            cbz_path = os.path.abspath(os.path.join(base_dir, cbz_path.strip()))
+            manga_name = manga_name.strip() or os.path.splitext(os.path.basename(cbz_path))[0]
+            jobs.append((cbz_path, manga_name))
+    return jobs
+
+def nested_workers(pool_workers):
+    """
+    Processes each pool worker may use for transcoding and page metadata.
+
+    Imports running in a pool of pool_workers processes share the CPUs, so
+    their nested pools get an equal share instead of cpu_count each.
+    """
+    return max(1, (os.cpu_count() or 1) // max(1, pool_workers or os.cpu_count() or 1))
+
+def _extract_job(cbz_path, manga_name, output_base_dir, options):
+    """
+    Run a single extraction inside a worker process.
+
+    Returns a plain dict so the result can be pickled back to the parent.
+    """
+    try:
+        result = import_cbz(cbz_path, manga_name, output_base_dir, **options)
+    except Exception as e:
+        return {"cbz_path": cbz_path, "name": manga_name, "success": False, "error": str(e)}
+    if not result:
+        return {"cbz_path": cbz_path, "name": manga_name, "success": False,
+                "error": "Extraction failed, no result returned"}
+    return {"cbz_path": cbz_path, "name": manga_name, "success": True, "result": result}
+
+def extract_batch(jobs, output_base_dir, workers=None, options=None, metrics_path=None):
+    """
+    Extract many CBZ files in parallel on a process pool.
+
+    A RESULT_JSON record (and a METRICS_JSON record when it succeeded) is
+    printed for every archive as soon as it finishes, so callers can stream
+    results instead of waiting for the whole batch.
+
+    Args:
+        jobs (list): List of (cbz_path, manga_name) tuples
+        output_base_dir (str): Base directory where manga will be extracted
+        workers (int): Number of worker processes (defaults to CPU count)
+        options (dict): Keyword options passed to import_cbz(); without
+            "transcode_workers" each import gets its share of the CPUs
+            (see nested_workers())
+        metrics_path (str): Optional Prometheus text file for the metrics of
+            the latest import
+
+    Returns:
+        list: One record per archive, in completion order
+    """
+    records = []
+    options = dict(options or {})
+    options.setdefault("transcode_workers", nested_workers(workers))
+    # Each import meters its own bandwidth, so the workers split the cap
+    options["limits"] = share_bandwidth(options.get("limits"), min(workers or os.cpu_count(), len(jobs)))
+    print(f"Starting batch extraction of {len(jobs)} archives with {workers or os.cpu_count()} workers")
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_extract_job, cbz_path, manga_name, output_base_dir, options)
+                   for cbz_path, manga_name in jobs]
+        for future in as_completed(futures):
+            record = future.result()
+            records.append(record)
+            print(f"RESULT_JSON_START{json.dumps(record)}RESULT_JSON_END", flush=True)
+            if record["success"]:
+                emit_metrics(record["result"]["metrics"], metrics_path)
+
+    failed = sum(1 for record in records if not record["success"])
+    print(f"Batch finished: {len(records) - failed} succeeded, {failed} failed")
+    return records
+
+def run_batch(args, output_dir):
+    """Collect batch jobs from the command line arguments and run them."""
+    if args.batch:
+        jobs = find_cbz_files(args.batch)
+    else:
+        jobs = read_manifest(args.manifest)
+
+    missing = [cbz_path for cbz_path, _ in jobs if not os.path.exists(cbz_path)]
+    for cbz_path in missing:
+        print(f"WARNING: CBZ file does not exist: {cbz_path}")
+    jobs = [job for job in jobs if job[0] not in missing]
+
+    # Two archives mapping to the same folder would race on the same files
+    seen_folders = {}
+    unique_jobs = []
+    for cbz_path, manga_name in jobs:
+        folder_name = manga_folder_name(manga_name)
+        if folder_name in seen_folders:
+            print(f"WARNING: Skipping {cbz_path}, folder '{folder_name}' is already used by {seen_folders[folder_name]}")
+            continue
+        seen_folders[folder_name] = cbz_path
+        unique_jobs.append((cbz_path, manga_name))
+    jobs = unique_jobs
+
+    if not jobs:
+        print("No CBZ files to extract")
+        return 1
+
+    records = extract_batch(jobs, output_dir, args.workers, import_options(args), args.metrics_prom)
+    refresh_catalog(output_dir)
+    return 0 if not missing and all(record["success"] for record in records) else 1
+
+def _serve_job(job_id, cbz_path, manga_name, output_base_dir, progress_queue, options, metrics_path=None):
+    """
+    Run an extraction job for the server inside a worker process.
+
+    Human-readable logging is redirected to stderr so stdout of the server
+    only ever carries protocol messages. The metrics record travels with the
+    result and is also written to metrics_path (Prometheus text) when set.
+    """
+    def report(done, total):
+        progress_queue.put({"id": job_id, "type": "progress", "done": done, "total": total})
+
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            result = import_cbz(cbz_path, manga_name, output_base_dir, progress=report, **options)
+            if result:
+                refresh_catalog(output_base_dir)
+                if metrics_path:
+                    write_prometheus(metrics_path, result["metrics"])
+        except Exception as e:
+            return {"id": job_id, "type": "error", "error": str(e)}
+    if not result:
+        return {"id": job_id, "type": "error", "error": "Extraction failed, no result returned"}
+    return {"id": job_id, "type": "result", "result": result}
+
+class ExtractionServer:
+    """
+    Long-lived extraction service.
+
+    Jobs are newline-delimited JSON objects:
+        {"id": "...", "cbz_path": "...", "name": "...", "output": "...",
+         "index": false, "variants": [480, 960], "variant_format": "webp",
+         "dedupe": false, "resume": false, "chapters_format": "full",
+         "placeholders": false, "preload_pages": 4, "bundles": false}
+    (everything but "id" and "cbz_path" is optional; "index" imports the
+    archive with index_cbz() instead of extracting it, "variants" generates
+    resized page variants after extraction, "dedupe" writes pages to the
+    content-addressed store, "resume" only rewrites changed pages and
+    "chapters_format" selects the chapters.json layout, "placeholders"
+    records BlurHash page placeholders, "preload_pages" sets the size of the
+    next-chapter preload manifests and "bundles" writes chapter bundles).
+    For each job the server answers with an "accepted" message, zero or more
+    "progress" messages and finally a "result" (whose "metrics" holds the
+    per-stage metrics record, see import_metrics.py) or "error" message, each
+    tagged with the job id. A {"type": "ping"} message is answered with
+    {"type": "pong"}.
+
+    Jobs run on a persistent process pool, so interpreter start-up and module
+    imports are paid once and concurrency is bounded by the pool size. Each
+    job's transcoding and metadata pools get a share of the CPUs (see
+    nested_workers()), and jobs writing the same manga folder run one after
+    the other, in the order they arrived. Every job is held to the server's
+    extraction limits (see safe_extract.py).
+    """
+
+    def __init__(self, output_base_dir, workers=None, limits=None, metrics_path=None, transcode_workers=None):
+        self.output_base_dir = output_base_dir
+        self.workers = workers or os.cpu_count()
+        self.transcode_workers = transcode_workers or nested_workers(self.workers)
+        # Each job meters its own bandwidth, so the workers split the cap
+        self.limits = share_bandwidth(limits, self.workers)
+        self.metrics_path = metrics_path
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        self.manager = Manager()
+        self.progress_queue = self.manager.Queue()
+        self.senders = {}
+        # Jobs waiting for a busy manga folder, keyed by (output dir, folder name)
+        self.folders = {}
+        self.lock = threading.Lock()
+        self.idle = threading.Condition(self.lock)
+        self.progress_thread = threading.Thread(target=self._forward_progress, daemon=True)
+        self.progress_thread.start()
+
+    def _forward_progress(self):
+        while True:
+            message = self.progress_queue.get()
+            if message is None:
+                break
+            with self.lock:
+                send = self.senders.get(message["id"])
+            if send:
+                send(message)
+
+    def handle_line(self, line, send):
+        """Parse one protocol line and dispatch it."""
+        line = line.strip()
+        if not line:
+            return
+        try:
+            message = json.loads(line)
+        except ValueError as e:
+            send({"type": "error", "error": f"Invalid JSON: {str(e)}"})
+            return
+        if not isinstance(message, dict):
+            send({"type": "error", "error": "Message must be a JSON object"})
+            return
+
+        if message.get("type") == "ping":
+            send({"id": message.get("id"), "type": "pong", "workers": self.workers})
+            return
+
+        job_id = message.get("id")
+        cbz_path = message.get("cbz_path")
+        if not isinstance(job_id, (str, int)) or not isinstance(cbz_path, str) or not cbz_path:
+            send({"id": job_id if isinstance(job_id, (str, int)) else None, "type": "error",
+                  "error": "Job requires 'id' and 'cbz_path'"})
+            return
+        if not os.path.exists(cbz_path):
+            send({"id": job_id, "type": "error", "error": f"CBZ file does not exist: {cbz_path}"})
+            return
+
+        try:
+            cbz_path = os.path.abspath(cbz_path)
+            manga_name = str(message.get("name") or os.path.splitext(os.path.basename(cbz_path))[0])
+            output_base_dir = str(message.get("output") or self.output_base_dir)
+            options = self.job_options(message)
+        except (TypeError, ValueError) as e:
+            send({"id": job_id, "type": "error", "error": f"Invalid job options: {str(e)}"})
+            return
+        self.submit(job_id, cbz_path, manga_name, output_base_dir, send, options)
+
+    def job_options(self, message):
+        """
+        Build the import options of a job message.
+
+        Raises:
+            TypeError, ValueError: If an option has the wrong type
+        """
+        options = {"index_only": bool(message.get("index")), "limits": self.limits,
+                   "transcode_workers": self.transcode_workers}
+        if message.get("dedupe"):
+            options["dedupe"] = True
+        if message.get("resume"):
+            options["resume"] = True
+        if message.get("placeholders"):
+            options["placeholders"] = True
+        if message.get("chapters_format") in CHAPTERS_FORMATS:
+            options["chapters_format"] = message["chapters_format"]
+        if message.get("preload_pages") is not None:
+            options["preload_pages"] = int(message["preload_pages"])
+        if message.get("bundles"):
+            options["bundles"] = True
+        if message.get("variants"):
+            options["variant_widths"] = sorted(int(width) for width in message["variants"])
+            options["variant_format"] = str(message.get("variant_format", DEFAULT_FORMAT))
+        return options
+
+    def submit(self, job_id, cbz_path, manga_name, output_base_dir, send, options=None):
+        folder = (os.path.abspath(output_base_dir), manga_folder_name(manga_name))
+        job = (job_id, cbz_path, manga_name, output_base_dir, send, options or {})
+        with self.lock:
+            self.senders[job_id] = send
+            waiting = self.folders.get(folder)
+            if waiting is None:
+                self.folders[folder] = []
+            else:
+                waiting.append(job)
+        send({"id": job_id, "type": "accepted"})
+        if waiting is None:
+            self._start(folder, job)
+
+    def _start(self, folder, job):
+        job_id, cbz_path, manga_name, output_base_dir, send, options = job
+        try:
+            future = self.executor.submit(_serve_job, job_id, cbz_path, manga_name, output_base_dir,
+                                          self.progress_queue, options, self.metrics_path)
+        except Exception as e:
+            # The pool is broken or shutting down: report the job and release the folder
+            self._finish(folder, job_id, send, {"id": job_id, "type": "error", "error": str(e)})
+            return
+
+        def done(future):
+            try:
+                message = future.result()
+            except Exception as e:
+                message = {"id": job_id, "type": "error", "error": str(e)}
+            self._finish(folder, job_id, send, message)
+
+        future.add_done_callback(done)
+
+    def _finish(self, folder, job_id, send, message):
+        """Report a finished job and start the next job queued on its folder."""
+        with self.lock:
+            self.senders.pop(job_id, None)
+            waiting = self.folders[folder]
+            following = waiting.pop(0) if waiting else None
+            if following is None:
+                del self.folders[folder]
+                self.idle.notify_all()
+        send(message)
+        if following:
+            self._start(folder, following)
+
+    def close(self):
+        # Queued jobs are submitted when the job before them finishes, so wait for them first
+        with self.idle:
+            while self.folders:
+                self.idle.wait()
+        self.executor.shutdown(wait=True)
+        self.progress_queue.put(None)
+        self.progress_thread.join()
+        self.manager.shutdown()
+
+def _line_writer(write):
+    """Build a thread-safe function that writes one JSON message per line."""
+    lock = threading.Lock()
+
+    def send(message):
+        data = json.dumps(message) + "\n"
+        with lock:
+            try:
+                write(data)
+            except (OSError, ValueError):
+                # The client went away; drop the message
+                pass
+    return send
+
+def serve_stdio(server):
+    """Serve jobs read from stdin, answering on stdout, until EOF."""
+    def write(data):
+        sys.stdout.write(data)
+        sys.stdout.flush()
+
+    send = _line_writer(write)
+    send({"type": "ready", "workers": server.workers})
+    for line in sys.stdin:
+        server.handle_line(line, send)
+    server.close()
+
+def serve_socket(server, socket_path):
+    """Serve jobs over a Unix domain socket, one connection per client."""
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            def write(data):
+                self.wfile.write(data.encode('utf-8'))
+                self.wfile.flush()
+
+            send = _line_writer(write)
+            for raw_line in self.rfile:
+                server.handle_line(raw_line.decode('utf-8'), send)
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    with socketserver.ThreadingUnixStreamServer(socket_path, Handler) as unix_server:
+        print(f"Extraction server listening on {socket_path} with {server.workers} workers", file=sys.stderr)
+        try:
+            unix_server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(socket_path)
+            server.close()
+
 def main():
     parser = argparse.ArgumentParser(description='Extract CBZ manga file')
-    parser.add_argument('cbz_path', help='Path to the CBZ file')
+    parser.add_argument('cbz_path', nargs='?', help='Path to the CBZ file')
     parser.add_argument('--name', help='Name of the manga (defaults to filename)')
     parser.add_argument('--output', default='../../frontend/public/data/manga',
                         help='Base output directory (default: ../../frontend/public/data/manga)')
+    parser.add_argument('--batch', metavar='DIR',
+                        help='Extract every CBZ file found in this directory')
+    parser.add_argument('--manifest', metavar='FILE',
+                        help='Extract the CBZ files listed in this file (one path per line, optional tab + name)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of worker processes for batch and server mode (default: CPU count)')
+    parser.add_argument('--index', action='store_true',
+                        help='Keep the archive and write a page index instead of extracting pages')
+    parser.add_argument('--variants', metavar='WIDTHS',
+                        help='Generate resized page variants at these widths, e.g. 480,960,1600')
+    parser.add_argument('--variant-format', default=DEFAULT_FORMAT, choices=sorted(FORMAT_EXTENSIONS),
+                        help=f'Image format of the page variants (default: {DEFAULT_FORMAT})')
+    parser.add_argument('--transcode-workers', type=int, default=None,
+                        help='Number of processes used for transcoding and page metadata per import '
+                             '(default: CPU count, divided between the workers in batch and server mode)')
+    parser.add_argument('--dedupe', action='store_true',
+                        help='Store pages once in the shared content-addressed store (_store)')
+    parser.add_argument('--resume', action='store_true',
+                        help='Only extract pages that changed since the previous import of this manga')
+    parser.add_argument('--placeholders', action='store_true',
+                        help='Record a BlurHash placeholder for every page in chapters.json')
+    parser.add_argument('--chapters-format', default='full', choices=CHAPTERS_FORMATS,
+                        help='Layout of chapters.json: full, compact (path templates) or split '
+                             '(one file per chapter) (default: full)')
+    add_limit_arguments(parser)
+    parser.add_argument('--in-place', action='store_true',
+                        help='Write into the live manga folder instead of staging and publishing a new release')
+    parser.add_argument('--preload-pages', type=int, default=PRELOAD_PAGES, metavar='N',
+                        help=f'Pages of the next chapter in each preload manifest, 0 for none (default: {PRELOAD_PAGES})')
+    parser.add_argument('--bundles', action='store_true',
+                        help='Also write a range-indexed bundle.bin of every chapter (pages stored twice)')
+    parser.add_argument('--verbose', action='store_true',
+                        help='Log every extracted page (by default only errors and a summary are logged)')
+    parser.add_argument('--metrics-prom', metavar='FILE',
+                        help='Also write the metrics of the latest import to this file in Prometheus text format')
+    parser.add_argument('--serve', action='store_true',
+                        help='Run as a long-lived server reading newline-delimited JSON jobs from stdin')
+    parser.add_argument('--socket', metavar='PATH',
+                        help='With --serve, listen on this Unix socket instead of stdin/stdout')
 
     args = parser.parse_args()
 
+    if args.serve:
+        output_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), args.output))
+        os.makedirs(output_dir, exist_ok=True)
+        metrics_path = os.path.abspath(args.metrics_prom) if args.metrics_prom else None
+        server = ExtractionServer(output_dir, args.workers, parse_limits(args), metrics_path,
+                                  args.transcode_workers)
+        if args.socket:
+            serve_socket(server, args.socket)
+        else:
+            serve_stdio(server)
+        return 0
+
+    if args.batch or args.manifest:
+        output_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), args.output))
+        os.makedirs(output_dir, exist_ok=True)
+        return run_batch(args, output_dir)
+
+    if not args.cbz_path:
+        parser.error('cbz_path is required unless --batch or --manifest is given')
+
     # Print arguments for debugging
     print(f"Arguments: cbz_path={args.cbz_path}, name={args.name}, output={args.output}")
     print(f"Python version: {sys.version}")
@@ -243,7 +1320,10 @@ def main():
 
     # Extract the CBZ file
     try:
-        result = extract_cbz(cbz_path, manga_name, output_dir)
+        result = import_cbz(cbz_path, manga_name, output_dir, **import_options(args))
+    except ArchiveLimitError:
+        # Already reported by the importer
+        return 1
     except Exception as e:
         print(f"Unexpected error during extraction: {str(e)}")
         import traceback
@@ -251,9 +1331,12 @@ def main():
         return 1
 
     if result:
-        # Output result as JSON for the calling process
+        refresh_catalog(output_dir)
+
+        # Output result and metrics as JSON for the calling process
         json_result = json.dumps(result)
         print(f"RESULT_JSON_START{json_result}RESULT_JSON_END")
+        emit_metrics(result["metrics"], args.metrics_prom)
         print("Extraction completed successfully!")
         return 0
     else:
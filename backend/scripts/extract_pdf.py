@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Rasterize PDF volumes into per-page images.
+
+Chapters whose "url" points at a whole volume PDF force the reader to
+download and render the entire file before the first page appears. This
+script renders every PDF page to an image, on a process pool, and gives
+the chapter a normal "images" list, so readers load pages one at a time
+like any extracted CBZ:
+
+    doraemon/Vol01.pdf  ->  doraemon/chapters/1/001.jpg ... 200.jpg
+
+Two modes:
+- --manga ID [ID ...]: convert the PDF chapters of existing manga folders
+  (the PDF is kept, its path moves to the chapter's "pdf" field).
+
+Both modes build the folder as a new staged release and publish it
+atomically, like extract_cbz.py, with preload manifests and a new
+info.json "version".
+- pdf_path [--name NAME]: import a PDF as a new manga with one chapter, as
+  extract_cbz.py does for archives.
+
+Requires PyMuPDF (pip install pymupdf).
+"""
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import pymupdf
+from PIL import Image
+
+from chapter_preload import PRELOAD_PAGES, write_preload_manifests
+from chapters_manifest import read_chapters_json, write_chapters_json
+from extract_cbz import manga_folder_name, refresh_catalog, write_manga_json
+from import_state import atomic_write_json
+from staged_release import StagedRelease, link_tree
+
+DEFAULT_DPI = 150
+DEFAULT_MAX_WIDTH = 1600
+DEFAULT_QUALITY = 85
+PDF_FORMATS = {'jpeg': '.jpg', 'webp': '.webp', 'png': '.png'}
+
+def _render_job(args):
+    """
+    Render a run of pages of one PDF inside a worker process.
+
+    Each job opens the document itself (documents cannot be shared between
+    processes) and returns [(page index, width, height)] for its pages.
+    """
+    pdf_path, page_indexes, chapter_dir, dpi, max_width, image_format, quality, skip_existing = args
+    extension = PDF_FORMATS[image_format]
+    pdf_mtime = os.path.getmtime(pdf_path)
+    results = []
+    with pymupdf.open(pdf_path) as document:
+        for index in page_indexes:
+            page_path = os.path.join(chapter_dir, f"{index + 1:03d}{extension}")
+            if skip_existing and os.path.exists(page_path) and os.path.getmtime(page_path) >= pdf_mtime:
+                with Image.open(page_path) as existing:
+                    results.append((index, existing.width, existing.height))
+                continue
+
+            page = document[index]
+            zoom = dpi / 72
+            if max_width and page.rect.width * zoom > max_width:
+                zoom = max_width / page.rect.width
+            pixmap = page.get_pixmap(matrix=pymupdf.Matrix(zoom, zoom), alpha=False)
+            image = Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+
+            # Write under a temporary name so an interrupted run never leaves a truncated page
+            temp_path = f"{page_path}.part"
+            image.save(temp_path, image_format.upper(), quality=quality)
+            os.replace(temp_path, page_path)
+            results.append((index, pixmap.width, pixmap.height))
+    return results
+
+def rasterize_pdf(pdf_path, chapter_dir, dpi=DEFAULT_DPI, max_width=DEFAULT_MAX_WIDTH,
+                  image_format='jpeg', quality=DEFAULT_QUALITY, workers=None, skip_existing=True):
+    """
+    Render every page of a PDF into a chapter folder.
+
+    Args:
+        pdf_path (str): PDF file
+        chapter_dir (str): Output folder for the page images (001.jpg, ...)
+        dpi (int): Render resolution
+        max_width (int): Scale pages down to at most this width (None to disable)
+        image_format (str): 'jpeg', 'webp' or 'png'
+        quality (int): Encoder quality
+        workers (int): Number of worker processes (defaults to CPU count)
+        skip_existing (bool): Keep page images newer than the PDF
+
+    Returns:
+        list: (file name, width, height) per page, in page order
+    """
+    os.makedirs(chapter_dir, exist_ok=True)
+    with pymupdf.open(pdf_path) as document:
+        page_count = document.page_count
+    print(f"Rasterizing {pdf_path}: {page_count} pages at {dpi} dpi")
+
+    # Contiguous runs of pages, a few per worker, so each worker opens the PDF a few times only
+    workers = workers or os.cpu_count() or 1
+    run_length = max(1, -(-page_count // (workers * 4)))
+    jobs = [(pdf_path, range(start, min(start + run_length, page_count)), chapter_dir,
+             dpi, max_width, image_format, quality, skip_existing)
+            for start in range(0, page_count, run_length)]
+
+    if workers == 1 or len(jobs) <= 1:
+        runs = [_render_job(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            runs = list(executor.map(_render_job, jobs))
+
+    extension = PDF_FORMATS[image_format]
+    return [(f"{index + 1:03d}{extension}", width, height) for run in runs for index, width, height in run]
+
+def pdf_local_path(output_base_dir, url):
+    """Map a frontend URL such as /data/manga/doraemon/Vol01.pdf to a file path."""
+    prefix = "/data/manga/"
+    if not url or not url.lower().endswith(".pdf") or not url.startswith(prefix):
+        return None
+    return os.path.join(output_base_dir, *url[len(prefix):].split("/"))
+
+def _remove_stale_pages(chapter_dir, pages):
+    """Remove page images of an earlier render that the new render did not produce."""
+    names = {name for name, _, _ in pages}
+    for name in os.listdir(chapter_dir):
+        if os.path.splitext(name)[1] in PDF_FORMATS.values() and name not in names:
+            os.remove(os.path.join(chapter_dir, name))
+
+def rasterize_manga(output_base_dir, manga_id, force=False, preload_pages=PRELOAD_PAGES, **render_options):
+    """
+    Convert the PDF chapters of an existing manga folder into image chapters.
+
+    The folder is rebuilt as a new release (see staged_release.py) and only
+    published when at least one chapter was converted.
+
+    Args:
+        output_base_dir (str): Manga output directory
+        manga_id (str): Manga folder name
+        force (bool): Re-render chapters that already have images
+        preload_pages (int): Pages of the next chapter listed in preload.json
+        render_options: Passed to rasterize_pdf()
+
+    Returns:
+        int: Number of chapters converted
+    """
+    release = StagedRelease(output_base_dir, manga_id).begin()
+    try:
+        release.seed_folder()
+        manga_dir = release.dir
+        # Keep the layout chapters.json already uses
+        with open(os.path.join(manga_dir, "chapters.json"), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        chapters_format = "full" if isinstance(data, list) else data.get("format", "compact")
+        chapters = read_chapters_json(manga_dir)
+
+        converted = 0
+        for chapter in chapters:
+            pdf_url = chapter.get("pdf") or chapter.get("url")
+            pdf_path = pdf_local_path(output_base_dir, pdf_url)
+            if not pdf_path or (chapter.get("images") and not force):
+                continue
+            if not os.path.exists(pdf_path):
+                print(f"  - Skipping chapter {chapter.get('number')}: {pdf_path} does not exist")
+                continue
+
+            number = chapter["number"]
+            chapter_dir = os.path.join(manga_dir, "chapters", str(number))
+            pages = rasterize_pdf(pdf_path, chapter_dir, skip_existing=not force, **render_options)
+            _remove_stale_pages(chapter_dir, pages)
+            chapter["pdf"] = pdf_url
+            chapter["url"] = f"/data/manga/{manga_id}/chapters/{number}"
+            chapter["images"] = [f"{chapter['url']}/{name}" for name, _, _ in pages]
+            chapter["pages"] = len(pages)
+            chapter["dimensions"] = [[width, height] for _, width, height in pages]
+            chapter["updatedAt"] = datetime.now().isoformat()
+            converted += 1
+            print(f"Chapter {number}: {len(pages)} pages written")
+
+        if converted:
+            info_path = os.path.join(manga_dir, "info.json")
+            with open(info_path, 'r', encoding='utf-8') as f:
+                info = json.load(f)
+            info["version"] = release.version
+            if preload_pages:
+                info["preload"] = preload_pages
+            info["updatedAt"] = datetime.now().isoformat()
+            atomic_write_json(info_path, info, ensure_ascii=False, indent=2)
+            write_chapters_json(manga_dir, manga_id, chapters, chapters_format)
+            write_preload_manifests(manga_dir, manga_id, chapters, output_base_dir, preload_pages,
+                                    bundles=bool(info.get("bundles")))
+            release.publish()
+    finally:
+        # No-op once published; otherwise the live folder stays as it was
+        release.abort()
+    return converted
+
+def import_pdf(pdf_path, manga_name, output_base_dir, skip_existing=True, preload_pages=PRELOAD_PAGES,
+               **render_options):
+    """
+    Import a PDF as a new manga with a single chapter.
+
+    The manga folder is built as a new release and published atomically (see
+    staged_release.py); with skip_existing, pages of the live release that are
+    newer than the PDF are reused.
+
+    Returns:
+        dict: Information about the imported manga, like extract_cbz()
+    """
+    folder_name = manga_folder_name(manga_name)
+    release = StagedRelease(output_base_dir, folder_name).begin()
+    try:
+        chapter_dir = os.path.join(release.dir, "chapters", "1")
+        live_chapter_dir = os.path.join(release.public_dir, "chapters", "1")
+        if skip_existing and os.path.isdir(live_chapter_dir):
+            link_tree(live_chapter_dir, chapter_dir)
+        pages = rasterize_pdf(pdf_path, chapter_dir, skip_existing=skip_existing, **render_options)
+        if not pages:
+            print("The PDF has no pages")
+            return None
+        _remove_stale_pages(chapter_dir, pages)
+
+        # The first page doubles as the cover
+        cover_name = pages[0][0]
+        cover_path = os.path.join(release.dir, f"cover{os.path.splitext(cover_name)[1]}")
+        with Image.open(os.path.join(chapter_dir, cover_name)) as cover:
+            cover.save(cover_path)
+        cover = f"/data/manga/{folder_name}/{os.path.basename(cover_path)}"
+
+        images = [f"/data/manga/{folder_name}/chapters/1/{name}" for name, _, _ in pages]
+        chapter = {"number": 1, "title": "Chapter 1", "images": images,
+                   "dimensions": [[width, height] for _, width, height in pages]}
+        info_extra = {"description": f"Imported from PDF file: {os.path.basename(pdf_path)}",
+                      "version": release.version}
+        if preload_pages:
+            info_extra["preload"] = preload_pages
+        write_manga_json(release.dir, folder_name, manga_name, pdf_path, cover, [chapter], info_extra)
+        write_preload_manifests(release.dir, folder_name, [chapter], output_base_dir, preload_pages)
+        release.publish()
+    finally:
+        release.abort()
+    return {
+        "title": manga_name,
+        "folder": folder_name,
+        "cover": cover,
+        "pages": len(images),
+        "chapter_images": images,
+        "chapters": [chapter]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Rasterize PDF volumes into per-page images')
+    parser.add_argument('pdf_path', nargs='?', help='PDF file to import as a new manga')
+    parser.add_argument('--name', help='Name of the manga (defaults to filename)')
+    parser.add_argument('--manga', nargs='+', metavar='ID',
+                        help='Convert the PDF chapters of these existing manga folders')
+    parser.add_argument('--output', default='../../frontend/public/data/manga',
+                        help='Base output directory (default: ../../frontend/public/data/manga)')
+    parser.add_argument('--dpi', type=int, default=DEFAULT_DPI,
+                        help=f'Render resolution (default: {DEFAULT_DPI})')
+    parser.add_argument('--max-width', type=int, default=DEFAULT_MAX_WIDTH,
+                        help=f'Largest page width in pixels, 0 for no limit (default: {DEFAULT_MAX_WIDTH})')
+    parser.add_argument('--format', default='jpeg', choices=sorted(PDF_FORMATS),
+                        help='Page image format (default: jpeg)')
+    parser.add_argument('--quality', type=int, default=DEFAULT_QUALITY,
+                        help=f'Encoder quality (default: {DEFAULT_QUALITY})')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of worker processes (default: CPU count)')
+    parser.add_argument('--force', action='store_true',
+                        help='Re-render chapters and pages that already have images')
+    args = parser.parse_args()
+
+    if not args.pdf_path and not args.manga:
+        parser.error('a pdf_path or --manga is required')
+
+    output_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), args.output))
+    render_options = {
+        "dpi": args.dpi,
+        "max_width": args.max_width or None,
+        "image_format": args.format,
+        "quality": args.quality,
+        "workers": args.workers,
+    }
+
+    if args.manga:
+        for manga_id in args.manga:
+            converted = rasterize_manga(output_dir, manga_id, force=args.force, **render_options)
+            print(f"{manga_id}: {converted} PDF chapters converted")
+        refresh_catalog(output_dir)
+        return 0
+
+    pdf_path = os.path.abspath(args.pdf_path)
+    if not os.path.exists(pdf_path):
+        print(f"PDF file does not exist: {pdf_path}")
+        return 1
+    manga_name = args.name or os.path.splitext(os.path.basename(pdf_path))[0]
+    os.makedirs(output_dir, exist_ok=True)
+    result = import_pdf(pdf_path, manga_name, output_dir,
+                        skip_existing=not args.force, **render_options)
+    if not result:
+        return 1
+    refresh_catalog(output_dir)
+    print(f"Imported {result['pages']} pages into {result['folder']}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Responsive image derivatives for imported pages.
+
+Pages are resized to a few fixed widths (e.g. 480/960/1600) and re-encoded
+as WebP so readers on small screens do not have to download full-size scans.
+Variants are written next to the original page, in one folder per width:
+
+    chapters/1/002.jpg
+    chapters/1/w480/002.webp
+    chapters/1/w960/002.webp
+"""
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+
+from import_state import publish_mode
+
+DEFAULT_WIDTHS = [480, 960, 1600]
+DEFAULT_FORMAT = 'webp'
+THUMBNAIL_SIZE = (240, 360)
+
+FORMAT_EXTENSIONS = {
+    'webp': '.webp',
+    'avif': '.avif',
+    'jpeg': '.jpg',
+}
+
+def parse_widths(value):
+    """Parse a comma separated list of widths such as '480,960,1600'."""
+    widths = sorted({int(width) for width in value.split(',') if width.strip()})
+    if not widths or widths[0] <= 0:
+        raise ValueError(f"Invalid variant widths: {value}")
+    return widths
+
+def _prepare(image, image_format):
+    """Convert palette/CMYK images to a mode the target encoder accepts."""
+    if image_format == 'jpeg':
+        return image.convert('RGB') if image.mode != 'RGB' else image
+    if image.mode in ('RGB', 'RGBA'):
+        return image
+    has_alpha = image.mode in ('LA', 'PA') or 'transparency' in image.info
+    return image.convert('RGBA' if has_alpha else 'RGB')
+
+def transcode_page(page_path, widths, image_format=DEFAULT_FORMAT, quality=80, skip_existing=False):
+    """
+    Write resized variants of one page.
+
+    Widths larger than the page itself are skipped (we never upscale).
+
+    Args:
+        page_path (str): Path of the extracted page
+        widths (list): Target widths in pixels
+        image_format (str): Output format ('webp', 'avif' or 'jpeg')
+        quality (int): Encoder quality
+        skip_existing (bool): Keep variants that are newer than the page
+
+    Returns:
+        dict: {width: variant path} for every variant available
+    """
+    page_dir, page_filename = os.path.split(page_path)
+    stem = os.path.splitext(page_filename)[0]
+    extension = FORMAT_EXTENSIONS[image_format]
+    variants = {}
+    page_mtime = os.path.getmtime(page_path)
+
+    with Image.open(page_path) as image:
+        # Only decode the page if at least one variant has to be written
+        prepared = None
+        for width in widths:
+            if width >= image.width:
+                continue
+            height = max(1, round(image.height * width / image.width))
+            variant_dir = os.path.join(page_dir, f"w{width}")
+            os.makedirs(variant_dir, exist_ok=True)
+            variant_path = os.path.join(variant_dir, f"{stem}{extension}")
+            if skip_existing and os.path.exists(variant_path) and os.path.getmtime(variant_path) >= page_mtime:
+                variants[width] = variant_path
+                continue
+            if prepared is None:
+                prepared = _prepare(image, image_format)
+            # Replace rather than rewrite: the old variant may be shared with a live release.
+            # The temporary name is unique, so concurrent transcodes of a page never share it
+            fd, temp_path = tempfile.mkstemp(dir=variant_dir, suffix='.part')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    prepared.resize((width, height), Image.LANCZOS).save(f, image_format.upper(), quality=quality)
+                publish_mode(temp_path)
+                os.replace(temp_path, variant_path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+            variants[width] = variant_path
+
+    return variants
+
+def make_thumbnail(source_path, thumbnail_path, size=THUMBNAIL_SIZE, image_format=DEFAULT_FORMAT, quality=75):
+    """
+    Write a small thumbnail of an image (used for the cover).
+
+    Returns:
+        str: The thumbnail path
+    """
+    with Image.open(source_path) as image:
+        image = _prepare(image, image_format)
+        image.thumbnail(size, Image.LANCZOS)
+        image.save(thumbnail_path, image_format.upper(), quality=quality)
+    return thumbnail_path
+
+def _transcode_job(args):
+    page_path, widths, image_format, skip_existing = args
+    try:
+        return transcode_page(page_path, widths, image_format, skip_existing=skip_existing)
+    except Exception as e:
+        print(f"  - Error transcoding {page_path}: {str(e)}")
+        return {}
+
+def transcode_pages(page_paths, widths, image_format=DEFAULT_FORMAT, workers=None, skip_existing=False):
+    """
+    Transcode many pages in parallel on a process pool.
+
+    Args:
+        page_paths (list): Extracted page paths, in page order
+        widths (list): Target widths in pixels
+        image_format (str): Output format
+        workers (int): Number of worker processes (defaults to CPU count)
+        skip_existing (bool): Keep variants that are newer than their page
+
+    Returns:
+        list: One {width: variant path} dict per page, in page order
+    """
+    jobs = [(page_path, widths, image_format, skip_existing) for page_path in page_paths]
+    if len(jobs) <= 1 or workers == 1:
+        return [_transcode_job(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_transcode_job, jobs, chunksize=8))
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Per-stage metrics of an import.
+
+An import is split into stages (open, index, cover, page_copy, metadata,
+transcode, manifest_write, preload, publish). Each stage records its wall
+time, the bytes it handled, how many items it processed and how many of
+them failed. The record is returned with the import result and printed
+as one machine-readable line:
+
+    METRICS_JSON_START{"v": 1, "stages": {"page_copy": {...}}, ...}METRICS_JSON_END
+
+and can also be written in the Prometheus text exposition format, for the
+node_exporter textfile collector.
+"""
+import contextlib
+import json
+import os
+import tempfile
+import time
+
+from import_state import publish_mode
+
+METRICS_VERSION = 1
+STAGES = ["open", "index", "cover", "page_copy", "metadata", "transcode", "manifest_write", "preload", "publish"]
+
+class ImportMetrics:
+    """
+    Timings, byte counts and error counts of one import, per stage.
+
+    Args:
+        source (str): Imported archive or folder
+        mode (str): Kind of import ("extract", "index", ...)
+    """
+
+    def __init__(self, source=None, mode="extract"):
+        self.source = source
+        self.mode = mode
+        self.started = time.perf_counter()
+        self.stages = {}
+
+    def add(self, stage, seconds=0.0, size=0, items=0, errors=0):
+        """Add to the counters of a stage (size in bytes)."""
+        record = self.stages.setdefault(stage, {"seconds": 0.0, "bytes": 0, "items": 0, "errors": 0})
+        record["seconds"] += seconds
+        record["bytes"] += size
+        record["items"] += items
+        record["errors"] += errors
+
+    @contextlib.contextmanager
+    def stage(self, stage):
+        """Time a block as (part of) a stage; counters are added with add()."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, seconds=time.perf_counter() - start)
+
+    def record(self, **extra):
+        """
+        Build the metrics record.
+
+        Args:
+            extra: Additional top-level fields (such as "manga")
+
+        Returns:
+            dict: {"v", "source", "mode", "seconds", "errors", "stages"}
+        """
+        stages = {name: dict(values, seconds=round(values["seconds"], 6))
+                  for name, values in sorted(self.stages.items(),
+                                             key=lambda item: STAGES.index(item[0]) if item[0] in STAGES else len(STAGES))}
+        record = {
+            "v": METRICS_VERSION,
+            "source": os.path.basename(self.source) if self.source else None,
+            "mode": self.mode,
+            "seconds": round(time.perf_counter() - self.started, 6),
+            "errors": sum(values["errors"] for values in self.stages.values()),
+            "stages": stages,
+        }
+        record.update(extra)
+        return record
+
+def emit_metrics(record, prometheus_path=None):
+    """Print a metrics record as one METRICS_JSON line, and optionally write it for Prometheus."""
+    print(f"METRICS_JSON_START{json.dumps(record)}METRICS_JSON_END", flush=True)
+    if prometheus_path:
+        write_prometheus(prometheus_path, record)
+
+def prometheus_text(record, prefix="manga_import"):
+    """
+    Format a metrics record in the Prometheus text exposition format.
+
+    Values describe the most recent import (gauges), labelled by stage.
+    """
+    mode = record.get("mode") or ""
+    series = [
+        ("stage_seconds", "Wall time of the stage in the last import", "seconds"),
+        ("stage_bytes", "Bytes handled by the stage in the last import", "bytes"),
+        ("stage_items", "Items processed by the stage in the last import", "items"),
+        ("stage_errors", "Failed items of the stage in the last import", "errors"),
+    ]
+    lines = []
+    for name, help_text, field in series:
+        lines.append(f"# HELP {prefix}_{name} {help_text}")
+        lines.append(f"# TYPE {prefix}_{name} gauge")
+        for stage, values in record["stages"].items():
+            lines.append(f'{prefix}_{name}{{stage="{stage}",mode="{mode}"}} {values[field]}')
+    lines.append(f"# HELP {prefix}_seconds Wall time of the last import")
+    lines.append(f"# TYPE {prefix}_seconds gauge")
+    lines.append(f'{prefix}_seconds{{mode="{mode}"}} {record["seconds"]}')
+    lines.append(f"# HELP {prefix}_last_success_timestamp_seconds Unix time of the last import")
+    lines.append(f"# TYPE {prefix}_last_success_timestamp_seconds gauge")
+    lines.append(f'{prefix}_last_success_timestamp_seconds{{mode="{mode}"}} {time.time():.0f}')
+    return "\n".join(lines) + "\n"
+
+def write_prometheus(path, record):
+    """Write a metrics record as a Prometheus text file, atomically (scrapers never see half a file)."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.prom')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(prometheus_text(record))
+        publish_mode(temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Per-manga import state for incremental (resumable) re-imports.
+
+The state file (.import_state.json in the manga folder) remembers, for every
+page slot that was written, where its bytes came from and a cheap fingerprint
+of them (CRC32 + size, taken from the ZIP central directory for archives).
+A re-import compares fingerprints and only rewrites the pages that changed.
+"""
+import contextlib
+import json
+import os
+import tempfile
+import time
+import zlib
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: byte-range locks through msvcrt instead
+    fcntl = None
+    import msvcrt
+
+STATE_FILENAME = ".import_state.json"
+STATE_VERSION = 1
+
+def publish_mode(path):
+    """
+    Give a temporary file the permissions of a normally created file.
+
+    mkstemp() creates files readable by the owner only, which the web server
+    serving frontend/public may not be able to read.
+    """
+    umask = os.umask(0)
+    os.umask(umask)
+    os.chmod(path, 0o666 & ~umask)
+
+def atomic_write_json(path, data, **dump_kwargs):
+    """
+    Write JSON to a temporary file and rename it over the target.
+
+    Readers see either the old or the new file, never a half-written one.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.json')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, **dump_kwargs)
+            f.flush()
+            os.fsync(f.fileno())
+        publish_mode(temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+@contextlib.contextmanager
+def file_lock(path):
+    """
+    Hold an exclusive lock on a lock file for the duration of the block.
+
+    Serializes read-modify-write updates of shared files (catalog, search
+    index, sprites) between concurrent imports. Uses flock() on POSIX and
+    msvcrt.locking() on Windows.
+    """
+    with open(path, 'a+') as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK gives up after about ten seconds; keep waiting
+                    time.sleep(0.1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+def load_state(manga_dir):
+    """
+    Load the import state of a manga folder.
+
+    Returns:
+        dict: The state, or an empty state if none exists or it is unreadable
+    """
+    state_path = os.path.join(manga_dir, STATE_FILENAME)
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get("v") == STATE_VERSION:
+            return state
+    except (OSError, ValueError):
+        pass
+    return {"v": STATE_VERSION, "pages": {}}
+
+def save_state(manga_dir, state):
+    """Atomically write the import state of a manga folder."""
+    atomic_write_json(os.path.join(manga_dir, STATE_FILENAME), state, separators=(',', ':'))
+
+def file_fingerprint(path):
+    """Return (crc32, size) of a file on disk."""
+    crc = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            crc = zlib.crc32(chunk, crc)
+    return crc, os.path.getsize(path)
+
+def is_unchanged(entry, crc, size):
+    """Check a state entry against a fingerprint, and that its output still exists."""
+    return (entry is not None
+            and entry.get("crc") == crc
+            and entry.get("size") == size
+            and os.path.exists(entry.get("path", "")))
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Page dimensions and placeholder hashes, recorded in chapters.json at import.
+
+Readers use the dimensions to reserve layout for pages that have not loaded
+yet (no reflow when lazy loading long strips). Placeholders are BlurHash
+strings (https://blurha.sh), around 30 characters per page. The reader decodes
+them into a blurred preview while the real page loads.
+
+Dimensions come from the image header only (Pillow does not decode pixel
+data until it is asked to). Placeholders are computed from a reduced-size
+decode of at most 32x32 pixels.
+"""
+import math
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from PIL import Image
+
+BLURHASH_COMPONENTS = (4, 3)
+BLURHASH_SAMPLE_SIZE = (32, 32)
+BASE83 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+
+_SRGB_TO_LINEAR = [((value / 255) / 12.92 if value / 255 <= 0.04045
+                    else ((value / 255 + 0.055) / 1.055) ** 2.4) for value in range(256)]
+
+def _base83(value, length):
+    return ''.join(BASE83[(value // 83 ** (length - 1 - i)) % 83] for i in range(length))
+
+def _linear_to_srgb(value):
+    value = max(0.0, min(1.0, value))
+    if value <= 0.0031308:
+        return int(value * 12.92 * 255 + 0.5)
+    return int((1.055 * value ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+def blurhash_encode(image, components=BLURHASH_COMPONENTS):
+    """
+    Encode a (small) image as a BlurHash string.
+
+    Args:
+        image (PIL.Image.Image): Image to encode, ideally already reduced to
+            a few dozen pixels per side
+        components (tuple): Number of (x, y) cosine components, 1-9 each
+
+    Returns:
+        str: The BlurHash
+    """
+    x_components, y_components = components
+    image = image.convert('RGB')
+    width, height = image.size
+    pixels = [tuple(_SRGB_TO_LINEAR[channel] for channel in pixel) for pixel in image.getdata()]
+
+    factors = []
+    for j in range(y_components):
+        basis_y = [math.cos(math.pi * j * y / height) for y in range(height)]
+        for i in range(x_components):
+            basis_x = [math.cos(math.pi * i * x / width) for x in range(width)]
+            r = g = b = 0.0
+            for y in range(height):
+                row = y * width
+                for x in range(width):
+                    basis = basis_x[x] * basis_y[y]
+                    pr, pg, pb = pixels[row + x]
+                    r += basis * pr
+                    g += basis * pg
+                    b += basis * pb
+            scale = (1 if i == 0 and j == 0 else 2) / (width * height)
+            factors.append((r * scale, g * scale, b * scale))
+
+    dc, ac = factors[0], factors[1:]
+    result = _base83((x_components - 1) + (y_components - 1) * 9, 1)
+    if ac:
+        quantised_max = max(0, min(82, int(max(abs(c) for factor in ac for c in factor) * 166 - 0.5)))
+        max_value = (quantised_max + 1) / 166
+        result += _base83(quantised_max, 1)
+    else:
+        max_value = 1
+        result += _base83(0, 1)
+
+    result += _base83((_linear_to_srgb(dc[0]) << 16) + (_linear_to_srgb(dc[1]) << 8) + _linear_to_srgb(dc[2]), 4)
+    for factor in ac:
+        r, g, b = (max(0, min(18, int(math.floor(math.copysign(abs(c / max_value) ** 0.5, c) * 9 + 9.5))))
+                   for c in factor)
+        result += _base83(r * 19 * 19 + g * 19 + b, 2)
+    return result
+
+def read_page_metadata(source, placeholder=False):
+    """
+    Read the dimensions (and optionally a placeholder) of one page.
+
+    Args:
+        source: Path or seekable binary file object of the page
+        placeholder (bool): Also compute a BlurHash
+
+    Returns:
+        dict: {"width", "height"} plus "blurhash" when requested
+    """
+    with Image.open(source) as image:
+        metadata = {"width": image.width, "height": image.height}
+        if placeholder:
+            # draft() lets the JPEG decoder scale down while decoding
+            image.draft('RGB', BLURHASH_SAMPLE_SIZE)
+            sample = image.convert('RGB')
+            sample.thumbnail(BLURHASH_SAMPLE_SIZE)
+            metadata["blurhash"] = blurhash_encode(sample)
+    return metadata
+
+def _metadata_job(args):
+    path, placeholder = args
+    try:
+        return read_page_metadata(path, placeholder)
+    except Exception as e:
+        print(f"  - Error reading page metadata of {path}: {str(e)}")
+        return {}
+
+def annotate_pages(entries, placeholders=False, workers=None):
+    """
+    Add page metadata to import state entries that do not have it yet.
+
+    Entries carried over unchanged from a previous import keep their
+    metadata, so only new or changed pages are read. Header reads run on a
+    thread pool; placeholder hashing is CPU bound and runs on a process pool.
+
+    Args:
+        entries (list): Import state entries (dicts with a "path" key), updated
+            in place with "width", "height" and optionally "blurhash"
+        placeholders (bool): Compute BlurHash placeholders
+        workers (int): Pool size (defaults to the executor's default)
+    """
+    pending = [entry for entry in entries
+               if "width" not in entry or (placeholders and "blurhash" not in entry)]
+    if not pending:
+        return
+    jobs = [(entry["path"], placeholders) for entry in pending]
+    if len(jobs) == 1 or workers == 1:
+        results = map(_metadata_job, jobs)
+        for entry, metadata in zip(pending, results):
+            entry.update(metadata)
+        return
+    executor_class = ProcessPoolExecutor if placeholders else ThreadPoolExecutor
+    with executor_class(max_workers=workers) as executor:
+        for entry, metadata in zip(pending, executor.map(_metadata_job, jobs, chunksize=16)):
+            entry.update(metadata)
+
+def chapter_page_fields(entries, placeholders=False):
+    """
+    Build the chapters.json page metadata fields of one chapter.
+
+    Returns:
+        dict: {"dimensions": [[width, height], ...]} plus "placeholders" when
+            requested; pages whose metadata could not be read get null
+    """
+    fields = {"dimensions": [[entry["width"], entry["height"]] if "width" in entry else None
+                             for entry in entries]}
+    if placeholders:
+        fields["placeholders"] = [entry.get("blurhash") for entry in entries]
+    return fields
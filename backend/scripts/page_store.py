@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Content-addressed page store shared by all imports.
+
+Every unique page image is stored once, under a name derived from a hash of
+its bytes:
+
+    frontend/public/data/manga/_store/3f/3fa85f6457174562b3fc2c963f66afa6.jpg
+
+Chapter manifests reference these paths (and list the hashes), so credits
+pages, covers and re-uploaded volumes that already exist in the store cost
+no extra disk space, and re-importing a known volume writes no page bytes.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+
+from import_state import publish_mode
+
+STORE_DIRNAME = "_store"
+CHUNK_SIZE = 1024 * 1024
+# Pages up to this size are hashed in memory before anything is written
+SPOOL_SIZE = 32 * 1024 * 1024
+
+def new_hasher():
+    """Return the hash object used for page keys (BLAKE2b, 128-bit)."""
+    return hashlib.blake2b(digest_size=16)
+
+def store_dir_for(output_base_dir):
+    """Return the store directory inside a manga output directory."""
+    return os.path.join(output_base_dir, STORE_DIRNAME)
+
+def blob_path(store_dir, key, extension):
+    """Return the filesystem path of a blob."""
+    return os.path.join(store_dir, key[:2], f"{key}{extension.lower()}")
+
+def blob_frontend_path(key, extension):
+    """Return the frontend path of a blob."""
+    return f"/data/manga/{STORE_DIRNAME}/{key[:2]}/{key}{extension.lower()}"
+
+def hash_file(path):
+    """Hash a file's contents in chunks and return the hex key."""
+    hasher = new_hasher()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+def _temp_blob(store_dir):
+    """Open a uniquely named temporary file in the store (never shared between writers)."""
+    fd, temp_path = tempfile.mkstemp(dir=store_dir, suffix='.part')
+    return os.fdopen(fd, 'wb'), temp_path
+
+def store_stream(store_dir, source, extension):
+    """
+    Store the contents of a readable binary stream.
+
+    The data is hashed while it is read into memory, and only written (to a
+    temporary file in the store, then renamed into place) when the blob is
+    not known yet, so pages already in the store cost no writes. Streams
+    larger than SPOOL_SIZE are copied to the temporary file as they are read.
+
+    Args:
+        store_dir (str): Store directory
+        source: Readable binary file object (e.g. a ZIP member)
+        extension (str): File extension to keep, such as '.jpg'
+
+    Returns:
+        tuple: (key, blob path, written) where written is False when the blob
+            already existed
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    hasher = new_hasher()
+    chunks = []
+    spooled = 0
+    target, temp_path = None, None
+    try:
+        for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+            hasher.update(chunk)
+            if target is None:
+                chunks.append(chunk)
+                spooled += len(chunk)
+                if spooled > SPOOL_SIZE:
+                    target, temp_path = _temp_blob(store_dir)
+                    target.writelines(chunks)
+                    chunks = []
+            else:
+                target.write(chunk)
+        key = hasher.hexdigest()
+        path = blob_path(store_dir, key, extension)
+        if os.path.exists(path):
+            if target is not None:
+                target.close()
+                os.remove(temp_path)
+            return key, path, False
+        if target is None:
+            target, temp_path = _temp_blob(store_dir)
+            target.writelines(chunks)
+        target.close()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        publish_mode(temp_path)
+        os.replace(temp_path, path)
+        return key, path, True
+    except BaseException:
+        if target is not None:
+            target.close()
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def store_file(store_dir, source_path, move=False):
+    """
+    Store an existing file.
+
+    Args:
+        store_dir (str): Store directory
+        source_path (str): File to store
+        move (bool): Remove the source file afterwards (a rename when the blob
+            is new, so no bytes are copied)
+
+    Returns:
+        tuple: (key, blob path, written)
+    """
+    key = hash_file(source_path)
+    extension = os.path.splitext(source_path)[1]
+    path = blob_path(store_dir, key, extension)
+
+    if os.path.exists(path):
+        if move:
+            os.remove(source_path)
+        return key, path, False
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if move:
+        try:
+            os.replace(source_path, path)
+            return key, path, True
+        except OSError:
+            # Different filesystem; fall back to copy + remove
+            pass
+    target, temp_path = _temp_blob(store_dir)
+    try:
+        with target, open(source_path, 'rb') as source:
+            shutil.copyfileobj(source, target, CHUNK_SIZE)
+        publish_mode(temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    if move:
+        os.remove(source_path)
+    return key, path, True
@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+"""
+Precomputed rankings and trending scores.
+
+The rankings page and the "hot stories" section used to sort every story by
+its raw views/likes/rating fields on each request. This job streams the
+MongoDB export (stories, ratings, comments, chapters), aggregates the signal
+per story and writes small JSON snapshots the frontend can fetch directly:
+
+    rankings/day.json     {"v": 1, "window": "day", "asOf": "...",
+    rankings/week.json     "tables": {"rating": [...], "comments": [...],
+    rankings/month.json               "activity": [...], ...}}
+    rankings/all.json
+    rankings/trending.json  stories by time-decayed activity score
+    rankings/genres.json    top-N per genre (trending and rating)
+
+Every table holds the top N entries only (selected with heapq), each a
+compact story record plus its "score".
+
+Refreshes are incremental. Per-story aggregates of each collection (daily
+buckets for the last WINDOW_DAYS days, all-time totals and the decayed
+trending sum) are kept in .rankings_state.json together with the size and
+mtime of the dump file they came from. Only collections whose dump changed
+are streamed again; otherwise the windows are rebuilt from the saved
+buckets and the trending sums are decayed to the new time. Snapshot files
+whose content did not change are not rewritten, so HTTP caches stay valid.
+
+The dump files may be JSON arrays (mongoexport --jsonArray) or one document
+per line; they are parsed incrementally and never loaded whole.
+"""
+import argparse
+import heapq
+import json
+import math
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+from import_state import atomic_write_json
+
+RANKINGS_VERSION = 1
+STATE_FILENAME = ".rankings_state.json"
+COLLECTIONS = ["stories", "ratings", "comments", "chapters"]
+# Windows of the ranking tables, in days (None for all time)
+WINDOWS = {"day": 1, "week": 7, "month": 30, "all": None}
+WINDOW_DAYS = max(days for days in WINDOWS.values() if days)
+DEFAULT_TOP = 20
+DEFAULT_GENRE_TOP = 10
+DEFAULT_HALF_LIFE_HOURS = 72
+# Weight of one event in the activity and trending scores
+EVENT_WEIGHTS = {"ratings": 3.0, "comments": 2.0, "chapters": 5.0}
+# Ratings a story needs before its own average outweighs the prior
+RATING_PRIOR_WEIGHT = 5
+# Fields of a story copied into ranking entries
+ENTRY_FIELDS = ["title", "author", "thumbnail", "status", "genre", "views", "likes", "rating", "chapters"]
+READ_CHUNK_SIZE = 1 << 16
+
+def iter_documents(path, chunk_size=READ_CHUNK_SIZE):
+    """
+    Stream the documents of a MongoDB export, one at a time.
+
+    Accepts a JSON array or newline-delimited documents.
+
+    Yields:
+        dict: Each document
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    eof = False
+    with open(path, 'r', encoding='utf-8') as f:
+        while True:
+            # Skip separators between documents
+            while position < len(buffer) and buffer[position] in " \t\r\n,[]":
+                position += 1
+            if position >= len(buffer):
+                if eof:
+                    return
+                buffer = f.read(chunk_size)
+                position = 0
+                eof = not buffer
+                continue
+            try:
+                document, end = decoder.raw_decode(buffer, position)
+            except ValueError:
+                if eof:
+                    raise
+                # Incomplete document: read more and try again
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+            yield document
+            position = end
+
+def object_id(value):
+    """Plain string id of an extended JSON ObjectId ({"$oid": ...}) or string."""
+    if isinstance(value, dict):
+        return value.get("$oid")
+    return str(value) if value is not None else None
+
+def _timestamp(value):
+    """Unix time of an extended JSON date ({"$date": ...}) or ISO string, or None."""
+    if isinstance(value, dict):
+        value = value.get("$date")
+        if isinstance(value, dict):
+            value = int(value.get("$numberLong", 0)) / 1000
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            return None
+    return None
+
+def _day(timestamp):
+    return int(timestamp // 86400)
+
+def _file_fingerprint(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+def _decay(seconds, half_life_hours):
+    # Not clamped at 0: decayed sums must stay exact when aged to a later time
+    return math.exp(-math.log(2) * seconds / (half_life_hours * 3600))
+
+def aggregate_stories(path):
+    """Story records by id (the fields ranking entries show)."""
+    stories = {}
+    for document in iter_documents(path):
+        story_id = object_id(document.get("_id"))
+        if not story_id:
+            continue
+        story = {field: document[field] for field in ENTRY_FIELDS if field in document}
+        genres = document.get("genre") or []
+        story["genres"] = [genres] if isinstance(genres, str) else list(genres)
+        story.pop("genre", None)
+        if isinstance(story.get("chapters"), list):
+            story["chapters"] = len(story["chapters"])
+        stories[story_id] = story
+    return stories
+
+def aggregate_events(path, collection, now, half_life_hours):
+    """
+    Aggregate the events of one collection per story.
+
+    Returns:
+        dict: story id -> {"total", "sum", "days": {day: [count, sum]}, "decayed"}
+              ("sum" is the sum of rating values, for ratings)
+    """
+    first_day = _day(now) - WINDOW_DAYS + 1
+    weight = EVENT_WEIGHTS[collection]
+    aggregates = {}
+    for document in iter_documents(path):
+        story_id = object_id(document.get("storyId"))
+        timestamp = _timestamp(document.get("createdAt"))
+        if not story_id or timestamp is None:
+            continue
+        value = float(document.get("rating") or 0) if collection == "ratings" else 0.0
+        aggregate = aggregates.setdefault(story_id, {"total": 0, "sum": 0.0, "days": {}, "decayed": 0.0})
+        aggregate["total"] += 1
+        aggregate["sum"] += value
+        day = _day(timestamp)
+        if day >= first_day:
+            bucket = aggregate["days"].setdefault(str(day), [0, 0.0])
+            bucket[0] += 1
+            bucket[1] += value
+        aggregate["decayed"] += weight * _decay(now - timestamp, half_life_hours)
+    return aggregates
+
+def age_aggregates(aggregates, previous_now, now, half_life_hours):
+    """Move saved aggregates from previous_now to now: decay the trending sums, drop expired days."""
+    factor = _decay(now - previous_now, half_life_hours)
+    first_day = _day(now) - WINDOW_DAYS + 1
+    for aggregate in aggregates.values():
+        aggregate["decayed"] *= factor
+        aggregate["days"] = {day: bucket for day, bucket in aggregate["days"].items() if int(day) >= first_day}
+
+def _window_counts(aggregate, days, now):
+    """(count, sum) of an aggregate within the last `days` days (all time for None)."""
+    if aggregate is None:
+        return 0, 0.0
+    if days is None:
+        return aggregate["total"], aggregate["sum"]
+    first_day, last_day = _day(now) - days + 1, _day(now)
+    count, total = 0, 0.0
+    for day, (day_count, day_sum) in aggregate["days"].items():
+        if first_day <= int(day) <= last_day:
+            count += day_count
+            total += day_sum
+    return count, total
+
+def _entry(story_id, story, score, **extra):
+    entry = {"_id": story_id}
+    entry.update(story)
+    entry.update(extra)
+    entry["score"] = round(score, 4)
+    return entry
+
+def top_n(scored, n):
+    """The n entries with the highest (score, tie-breaker) pairs, best first."""
+    return heapq.nlargest(n, scored, key=lambda item: item[0])
+
+def rating_scores(stories, ratings, days, now):
+    """
+    Bayesian average rating of the stories rated within a window.
+
+    Stories with few ratings are pulled towards the prior: the story's own
+    stored rating for all time, the mean of the window otherwise.
+
+    Returns:
+        dict: story id -> (score, rating count)
+    """
+    window_ratings = {story_id: _window_counts(ratings.get(story_id), days, now) for story_id in stories}
+    count_sum = sum(count for count, _ in window_ratings.values())
+    global_mean = sum(total for _, total in window_ratings.values()) / count_sum if count_sum else 0.0
+
+    scores = {}
+    for story_id, (count, total) in window_ratings.items():
+        stored = stories[story_id].get("rating")
+        if days is None and stored is not None:
+            prior = stored
+        elif count:
+            prior = global_mean
+        else:
+            continue
+        scores[story_id] = ((RATING_PRIOR_WEIGHT * prior + total) / (RATING_PRIOR_WEIGHT + count), count)
+    return scores
+
+def window_tables(stories, aggregates, days, now, top):
+    """
+    Ranking tables of one window.
+
+    Returns:
+        dict: table name -> list of entries, best first
+    """
+    ratings, comments, chapters = (aggregates.get(name, {}) for name in ("ratings", "comments", "chapters"))
+    ratings_by_story = rating_scores(stories, ratings, days, now)
+
+    rated, comment_scores, activity_scores = [], [], []
+    for story_id, story in stories.items():
+        score, count = ratings_by_story.get(story_id, (None, 0))
+        comment_count = _window_counts(comments.get(story_id), days, now)[0]
+        chapter_count = _window_counts(chapters.get(story_id), days, now)[0]
+        extra = {"ratingCount": count, "comments": comment_count}
+
+        if score is not None:
+            rated.append(((score, count), story_id, extra))
+        if comment_count:
+            comment_scores.append(((comment_count, count), story_id, extra))
+        activity = (EVENT_WEIGHTS["ratings"] * count + EVENT_WEIGHTS["comments"] * comment_count
+                    + EVENT_WEIGHTS["chapters"] * chapter_count)
+        if activity:
+            activity_scores.append(((activity, story.get("views") or 0), story_id, extra))
+
+    scored_tables = {"rating": rated, "comments": comment_scores, "activity": activity_scores}
+    if days is None:
+        # Views and likes are only kept as totals on the story
+        scored_tables["views"] = [((story.get("views") or 0, 0), story_id, {})
+                                  for story_id, story in stories.items() if story.get("views")]
+        scored_tables["likes"] = [((story.get("likes") or 0, 0), story_id, {})
+                                  for story_id, story in stories.items() if story.get("likes")]
+
+    return {name: [_entry(story_id, stories[story_id], key[0], **extra)
+                   for key, story_id, extra in top_n(scored, top)]
+            for name, scored in scored_tables.items()}
+
+def trending_scores(stories, aggregates):
+    """
+    Time-decayed trending score of every story.
+
+    Each rating, comment and new chapter adds its weight, halved every
+    half-life since it happened. All-time popularity only breaks ties.
+    """
+    scores = {}
+    for story_id, story in stories.items():
+        decayed = sum(aggregates.get(name, {}).get(story_id, {}).get("decayed", 0.0) for name in EVENT_WEIGHTS)
+        popularity = math.log10(1 + (story.get("views") or 0) + 10 * (story.get("likes") or 0))
+        scores[story_id] = (decayed, popularity)
+    return scores
+
+def link_folders(stories, catalog_path):
+    """Add the manga folder ("folder") of stories that have one in the catalog, matched by title or thumbnail."""
+    try:
+        with open(catalog_path, 'r', encoding='utf-8') as f:
+            catalog = json.load(f)
+    except (OSError, ValueError):
+        return
+    by_title = {str(entry.get("title", "")).strip().lower(): entry["_id"] for entry in catalog.get("series", [])}
+    folders = set(by_title.values())
+    for story in stories.values():
+        story.pop("folder", None)
+        folder = by_title.get(str(story.get("title", "")).strip().lower())
+        thumbnail = story.get("thumbnail") or ""
+        if not folder and thumbnail.startswith("/data/manga/"):
+            candidate = thumbnail[len("/data/manga/"):].split("/")[0]
+            folder = candidate if candidate in folders else None
+        if folder:
+            story["folder"] = folder
+
+def _load_state(state_path):
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get("v") == RANKINGS_VERSION:
+            return state
+    except (OSError, ValueError):
+        pass
+    return None
+
+def _write_snapshot(path, snapshot):
+    """Write a snapshot unless the file already holds the same rankings; returns True if written."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            current = json.load(f)
+        if {**current, "asOf": None} == {**snapshot, "asOf": None}:
+            return False
+    except (OSError, ValueError):
+        pass
+    atomic_write_json(path, snapshot, ensure_ascii=False, separators=(',', ':'))
+    return True
+
+def update_rankings(dump_dir, output_dir, now=None, top=DEFAULT_TOP, genre_top=DEFAULT_GENRE_TOP,
+                    half_life_hours=DEFAULT_HALF_LIFE_HOURS, catalog_path=None, full=False):
+    """
+    Bring the ranking snapshots up to date with the dump.
+
+    Args:
+        dump_dir (str): Directory of the MongoDB export (<collection>.json files)
+        output_dir (str): Directory of the snapshots
+        now (float): Unix time the rankings are computed for (defaults to now)
+        top (int): Entries per ranking table
+        genre_top (int): Entries per genre
+        half_life_hours (float): Half-life of an event in the trending score
+        catalog_path (str): catalog.json used to link stories to manga folders
+        full (bool): Ignore the saved state and stream every collection again
+
+    Returns:
+        dict: {"stories": count, "streamed": collections read, "written": snapshots written}
+    """
+    now = time.time() if now is None else now
+    os.makedirs(output_dir, exist_ok=True)
+    state_path = os.path.join(output_dir, STATE_FILENAME)
+    state = None if full else _load_state(state_path)
+    if state and (state.get("halfLifeHours") != half_life_hours or now < state.get("now", 0)):
+        state = None
+    previous = state["collections"] if state else {}
+
+    collections = {}
+    streamed = []
+    for name in COLLECTIONS:
+        path = os.path.join(dump_dir, f"{name}.json")
+        if not os.path.exists(path):
+            collections[name] = {"file": None, "data": {}}
+            continue
+        fingerprint = _file_fingerprint(path)
+        cached = previous.get(name)
+        if cached and cached["file"] == fingerprint:
+            if name != "stories":
+                age_aggregates(cached["data"], state["now"], now, half_life_hours)
+            collections[name] = cached
+            continue
+        streamed.append(name)
+        if name == "stories":
+            data = aggregate_stories(path)
+        else:
+            data = aggregate_events(path, name, now, half_life_hours)
+        collections[name] = {"file": fingerprint, "data": data}
+
+    stories = collections["stories"]["data"]
+    if catalog_path:
+        link_folders(stories, catalog_path)
+    aggregates = {name: collections[name]["data"] for name in EVENT_WEIGHTS}
+    as_of = datetime.fromtimestamp(now, timezone.utc).isoformat()
+
+    snapshots = {}
+    for window, days in WINDOWS.items():
+        snapshots[f"{window}.json"] = {
+            "v": RANKINGS_VERSION,
+            "window": window,
+            "days": days,
+            "asOf": as_of,
+            "tables": window_tables(stories, aggregates, days, now, top),
+        }
+
+    scores = trending_scores(stories, aggregates)
+    trending = top_n(((scores[story_id], story_id) for story_id in stories), top)
+    snapshots["trending.json"] = {
+        "v": RANKINGS_VERSION,
+        "asOf": as_of,
+        "halfLifeHours": half_life_hours,
+        "series": [_entry(story_id, stories[story_id], score[0]) for score, story_id in trending],
+    }
+
+    genres = {}
+    for story_id, story in stories.items():
+        for genre in story.get("genres", []):
+            genres.setdefault(genre, []).append(story_id)
+    all_ratings = rating_scores(stories, aggregates["ratings"], None, now)
+    rating_key = {story_id: (score, stories[story_id].get("views") or 0) for story_id, (score, _) in all_ratings.items()}
+    snapshots["genres.json"] = {
+        "v": RANKINGS_VERSION,
+        "asOf": as_of,
+        "genres": {
+            genre: {
+                "trending": [_entry(story_id, stories[story_id], scores[story_id][0])
+                             for story_id in heapq.nlargest(genre_top, ids, key=lambda i: scores[i])],
+                "rating": [_entry(story_id, stories[story_id], rating_key[story_id][0])
+                           for story_id in heapq.nlargest(genre_top, (i for i in ids if i in rating_key),
+                                                          key=rating_key.get)],
+            }
+            for genre, ids in sorted(genres.items())
+        },
+    }
+
+    written = sum(_write_snapshot(os.path.join(output_dir, name), snapshot) for name, snapshot in snapshots.items())
+    atomic_write_json(state_path, {"v": RANKINGS_VERSION, "now": now, "halfLifeHours": half_life_hours,
+                                   "collections": collections},
+                      ensure_ascii=False, separators=(',', ':'))
+    return {"stories": len(stories), "streamed": streamed, "written": written}
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompute rankings and trending scores from the MongoDB dump')
+    parser.add_argument('--dump', default='../../database/mongodb/dump',
+                        help='Directory of the MongoDB export (default: ../../database/mongodb/dump)')
+    parser.add_argument('--output', default='../../frontend/public/data/rankings',
+                        help='Snapshot directory (default: ../../frontend/public/data/rankings)')
+    parser.add_argument('--catalog', default='../../frontend/public/data/manga/catalog.json',
+                        help='catalog.json used to link stories to manga folders')
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP,
+                        help=f'Entries per ranking table (default: {DEFAULT_TOP})')
+    parser.add_argument('--genre-top', type=int, default=DEFAULT_GENRE_TOP,
+                        help=f'Entries per genre (default: {DEFAULT_GENRE_TOP})')
+    parser.add_argument('--half-life-hours', type=float, default=DEFAULT_HALF_LIFE_HOURS,
+                        help=f'Half-life of activity in the trending score (default: {DEFAULT_HALF_LIFE_HOURS})')
+    parser.add_argument('--now', help='Compute the rankings as of this ISO date instead of now')
+    parser.add_argument('--full', action='store_true',
+                        help='Stream every collection again instead of only the changed ones')
+    args = parser.parse_args()
+
+    base_dir = os.path.dirname(__file__)
+    now = _timestamp(args.now) if args.now else None
+    if args.now and now is None:
+        parser.error(f'invalid date: {args.now}')
+    stats = update_rankings(os.path.abspath(os.path.join(base_dir, args.dump)),
+                            os.path.abspath(os.path.join(base_dir, args.output)),
+                            now=now, top=args.top, genre_top=args.genre_top,
+                            half_life_hours=args.half_life_hours,
+                            catalog_path=os.path.abspath(os.path.join(base_dir, args.catalog)),
+                            full=args.full)
+    streamed = ", ".join(stats["streamed"]) or "none"
+    print(f"Rankings: {stats['stories']} stories (streamed: {streamed}, {stats['written']} snapshots written)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Limits for extracting untrusted archives.
+
+Uploaded CBZ files are checked against configurable limits before anything
+is written. The limits cover entry count, declared per-entry and total
+uncompressed size, compression ratio, and the free disk space left
+afterwards. Members are then copied in fixed-size chunks through a meter.
+The meter enforces the byte budget on the bytes actually read, and it can
+cap the I/O bandwidth so imports do not starve readers being served from
+the same disk.
+"""
+import copy
+import shutil
+import threading
+import time
+
+CHUNK_SIZE = 1024 * 1024
+MB = 1024 * 1024
+
+DEFAULT_MAX_TOTAL_BYTES = 4096 * MB
+DEFAULT_MAX_ENTRY_BYTES = 256 * MB
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_MAX_RATIO = 100
+# Ratios are only checked for entries at least this large (tiny files compress well)
+RATIO_MIN_BYTES = MB
+# Disk space that must remain free after an import
+DEFAULT_MIN_FREE_BYTES = 512 * MB
+# Largest metadata file (ComicInfo.xml) read into memory
+MAX_METADATA_BYTES = MB
+
+class ArchiveLimitError(ValueError):
+    """Raised when an archive exceeds one of the extraction limits."""
+
+class ExtractionLimits:
+    """
+    Extraction limits; None disables a limit.
+
+    Args:
+        max_total_bytes (int): Total uncompressed bytes extracted per archive
+        max_entry_bytes (int): Uncompressed size of a single entry
+        max_entries (int): Number of entries in the archive
+        max_ratio (float): Uncompressed/compressed size of a single entry
+        min_free_bytes (int): Free disk space required after extraction
+        bandwidth (float): I/O cap in bytes per second, per import (see
+            share_bandwidth() for imports running side by side)
+    """
+
+    def __init__(self, max_total_bytes=DEFAULT_MAX_TOTAL_BYTES, max_entry_bytes=DEFAULT_MAX_ENTRY_BYTES,
+                 max_entries=DEFAULT_MAX_ENTRIES, max_ratio=DEFAULT_MAX_RATIO,
+                 min_free_bytes=DEFAULT_MIN_FREE_BYTES, bandwidth=None):
+        self.max_total_bytes = max_total_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.max_entries = max_entries
+        self.max_ratio = max_ratio
+        self.min_free_bytes = min_free_bytes
+        self.bandwidth = bandwidth
+
+def share_bandwidth(limits, workers):
+    """
+    Split the bandwidth cap between imports running in parallel.
+
+    The meter of each import enforces its own cap, so a pool of `workers`
+    imports gets limits with 1/workers of the bandwidth each, keeping the
+    total at the configured cap.
+
+    Returns:
+        ExtractionLimits: A copy of limits (limits itself when there is no cap)
+    """
+    if not limits or not limits.bandwidth or not workers or workers <= 1:
+        return limits
+    shared = copy.copy(limits)
+    shared.bandwidth = limits.bandwidth / workers
+    return shared
+
+def check_archive(zip_ref, members, limits, output_dir=None):
+    """
+    Check an archive's central directory against the limits before extracting.
+
+    Args:
+        zip_ref (zipfile.ZipFile): Open archive
+        members (list): Names of the entries that will be extracted
+        limits (ExtractionLimits): Limits to enforce
+        output_dir (str): Directory the pages go to (for the free space check)
+
+    Returns:
+        int: Declared uncompressed size of the members
+
+    Raises:
+        ArchiveLimitError: If a limit is exceeded
+    """
+    entry_count = len(zip_ref.infolist())
+    if limits.max_entries is not None and entry_count > limits.max_entries:
+        raise ArchiveLimitError(f"Archive has {entry_count} entries, limit is {limits.max_entries}")
+
+    total = 0
+    for name in members:
+        info = zip_ref.getinfo(name)
+        if limits.max_entry_bytes is not None and info.file_size > limits.max_entry_bytes:
+            raise ArchiveLimitError(f"{name} is {info.file_size} bytes uncompressed, "
+                                    f"limit is {limits.max_entry_bytes}")
+        if (limits.max_ratio is not None and info.file_size >= RATIO_MIN_BYTES
+                and info.file_size > limits.max_ratio * max(info.compress_size, 1)):
+            raise ArchiveLimitError(f"{name} has compression ratio "
+                                    f"{info.file_size / max(info.compress_size, 1):.0f}, limit is {limits.max_ratio}")
+        total += info.file_size
+
+    if limits.max_total_bytes is not None and total > limits.max_total_bytes:
+        raise ArchiveLimitError(f"Archive expands to {total} bytes, limit is {limits.max_total_bytes}")
+
+    if output_dir and limits.min_free_bytes is not None:
+        free = shutil.disk_usage(output_dir).free
+        if free - total < limits.min_free_bytes:
+            raise ArchiveLimitError(f"Not enough disk space: {free} bytes free, archive needs {total} "
+                                    f"and {limits.min_free_bytes} must stay free")
+    return total
+
+def read_small_member(zip_ref, name, max_bytes=MAX_METADATA_BYTES):
+    """Read a metadata entry (such as ComicInfo.xml) fully, refusing large ones."""
+    size = zip_ref.getinfo(name).file_size
+    if size > max_bytes:
+        raise ArchiveLimitError(f"{name} is {size} bytes, limit is {max_bytes}")
+    with zip_ref.open(name) as source:
+        return source.read(max_bytes + 1)[:max_bytes]
+
+class Throttle:
+    """Token bucket limiting throughput to `rate` bytes per second (thread safe)."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.allowance = rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self, amount):
+        with self.lock:
+            now = time.monotonic()
+            self.allowance = min(self.rate, self.allowance + (now - self.updated) * self.rate)
+            self.updated = now
+            self.allowance -= amount
+            delay = -self.allowance / self.rate if self.allowance < 0 else 0
+        if delay:
+            time.sleep(delay)
+
+class ExtractionMeter:
+    """
+    Byte budget and bandwidth cap shared by every copy of one import.
+
+    Counts the bytes actually read from the archive, so entries that lie about
+    their size in the central directory still cannot exceed the budget.
+    """
+
+    def __init__(self, limits=None):
+        self.limits = limits or ExtractionLimits()
+        self.total = 0
+        self.throttle = Throttle(self.limits.bandwidth) if self.limits.bandwidth else None
+
+    def charge(self, amount):
+        self.total += amount
+        if self.limits.max_total_bytes is not None and self.total > self.limits.max_total_bytes:
+            raise ArchiveLimitError(f"Extraction exceeded {self.limits.max_total_bytes} bytes")
+        if self.throttle:
+            self.throttle.consume(amount)
+
+    def reader(self, source):
+        """Wrap a readable binary stream so every read is charged to the meter."""
+        return MeteredReader(source, self)
+
+    def copy(self, source, target):
+        """Copy a stream in fixed-size chunks through the meter."""
+        shutil.copyfileobj(self.reader(source), target, CHUNK_SIZE)
+
+class MeteredReader:
+    """Readable stream that charges every read to an ExtractionMeter."""
+
+    def __init__(self, source, meter):
+        self.source = source
+        self.meter = meter
+
+    def read(self, size=CHUNK_SIZE):
+        # Never hand out unbounded reads, whatever the caller asks for
+        if size is None or size < 0 or size > CHUNK_SIZE:
+            size = CHUNK_SIZE
+        data = self.source.read(size)
+        self.meter.charge(len(data))
+        return data
+
+def parse_limits(args):
+    """Build ExtractionLimits from parsed command line arguments (sizes in MB)."""
+    def megabytes(value):
+        return None if value is None or value <= 0 else int(value * MB)
+
+    return ExtractionLimits(
+        max_total_bytes=megabytes(args.max_total_mb),
+        max_entry_bytes=megabytes(args.max_entry_mb),
+        max_entries=args.max_entries if args.max_entries > 0 else None,
+        max_ratio=args.max_ratio if args.max_ratio > 0 else None,
+        min_free_bytes=megabytes(args.min_free_mb),
+        bandwidth=megabytes(args.bandwidth_mb),
+    )
+
+def add_limit_arguments(parser):
+    """Add the extraction limit options to an argparse parser (0 disables a limit)."""
+    parser.add_argument('--max-total-mb', type=float, default=DEFAULT_MAX_TOTAL_BYTES / MB,
+                        help=f'Largest total uncompressed size per archive (default: {DEFAULT_MAX_TOTAL_BYTES // MB})')
+    parser.add_argument('--max-entry-mb', type=float, default=DEFAULT_MAX_ENTRY_BYTES / MB,
+                        help=f'Largest uncompressed page (default: {DEFAULT_MAX_ENTRY_BYTES // MB})')
+    parser.add_argument('--max-entries', type=int, default=DEFAULT_MAX_ENTRIES,
+                        help=f'Most entries per archive (default: {DEFAULT_MAX_ENTRIES})')
+    parser.add_argument('--max-ratio', type=float, default=DEFAULT_MAX_RATIO,
+                        help=f'Highest compression ratio of an entry (default: {DEFAULT_MAX_RATIO})')
+    parser.add_argument('--min-free-mb', type=float, default=DEFAULT_MIN_FREE_BYTES / MB,
+                        help=f'Disk space that must stay free after an import (default: {DEFAULT_MIN_FREE_BYTES // MB})')
+    parser.add_argument('--bandwidth-mb', type=float, default=0,
+                        help='Cap extraction I/O at this many MB/s, shared by all workers in batch '
+                             'and server mode (default: unlimited)')
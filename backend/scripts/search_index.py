@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Full-text search index over titles, authors, descriptions and tags.
+
+Story search used to filter whole story lists in the browser with
+toLowerCase().includes(), which is slow on large catalogs and wrong for
+Vietnamese: "hanh dong" never matched "Hành động". This module builds one
+search.json next to catalog.json from every <id>/info.json (and, optionally,
+the stories of the MongoDB dump):
+
+    {"v": 1, "updatedAt": "...",
+     "docs": [{"_id": "naruto", "title": "Naruto", "link": "/manga/naruto", ...}],
+     "terms": ["an", "cuoc", "dong", "hanh", ...],
+     "postings": [[0, 9, 2, 1], ...],
+     "grams": {"anh": [3, 17], ...},
+     "facets": {"genres": {"Hành động": "BQ=="}, "status": {...}, "type": {...}}}
+
+- Tokens are diacritic-folded (NFD without combining marks, đ -> d) and
+  lowercased, both here and in the browser (frontend/src/services/searchIndex.js).
+- "terms" is sorted, so a typeahead prefix is a binary search for a range
+  of terms. "grams" maps each trigram to the terms containing it, for
+  matches inside a word.
+- "postings" is aligned with "terms": flat [doc delta, score, ...] pairs, doc
+  numbers delta-encoded. Scores weight title matches above author, tag and
+  description matches (FIELD_WEIGHTS).
+- Facets are bitmaps over doc numbers (bit i of byte i >> 3, base64), so
+  filtering by genre, status and type is a few AND operations. Statuses
+  are keyed by code ("completed", "ongoing"; see STATUS_CODES).
+
+Updates are incremental like the catalog: the documents built from each
+info.json are kept in .search_state.json with the file's mtime, and only
+changed folders are read again. The dump is streamed again only when
+stories.json changed.
+"""
+import argparse
+import base64
+import bisect
+import json
+import os
+import re
+import sys
+import unicodedata
+from datetime import datetime
+
+from import_state import atomic_write_json, file_lock
+from rankings import iter_documents, object_id
+
+SEARCH_FILENAME = "search.json"
+SEARCH_STATE_FILENAME = ".search_state.json"
+SEARCH_VERSION = 1
+# Score of one occurrence of a term, per field
+FIELD_WEIGHTS = {"title": 8, "author": 3, "genres": 2, "tags": 2, "description": 1}
+# Occurrences of a term in one field that still add to its score
+MAX_FIELD_OCCURRENCES = 3
+FACET_FIELDS = ["genres", "status", "type"]
+# Status facet keys: the codes the filter form uses, whatever language info.json is in
+STATUS_CODES = {"hoan thanh": "completed", "da hoan thanh": "completed", "completed": "completed",
+                "dang tien hanh": "ongoing", "dang ra": "ongoing", "ongoing": "ongoing"}
+# Fields kept in "docs" so results can be shown without loading the catalog
+DOC_FIELDS = ["title", "author", "thumbnail", "status", "type", "genres", "views", "rating"]
+GRAM_SIZE = 3
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+def fold_text(text):
+    """Lowercase text without Vietnamese diacritics ("Hành Động" -> "hanh dong")."""
+    decomposed = unicodedata.normalize("NFD", str(text))
+    stripped = "".join(char for char in decomposed if unicodedata.category(char) != "Mn")
+    return stripped.replace("đ", "d").replace("Đ", "D").lower()
+
+def tokenize(text):
+    """Folded word tokens of a text."""
+    return TOKEN_PATTERN.findall(fold_text(text)) if text else []
+
+def _field_text(value):
+    if isinstance(value, (list, tuple)):
+        return " ".join(str(item) for item in value)
+    return str(value) if value is not None else ""
+
+def build_document(info, doc_id, link):
+    """
+    Build the search document of one story.
+
+    Returns:
+        dict: {"doc": display fields, "terms": {term: score}}
+    """
+    genres = info.get("genres") or info.get("genre") or []
+    info = dict(info, genres=[genres] if isinstance(genres, str) else list(genres))
+
+    doc = {"_id": doc_id, "link": link}
+    doc.update({field: info[field] for field in DOC_FIELDS if info.get(field) not in (None, "", [])})
+
+    terms = {}
+    for field, weight in FIELD_WEIGHTS.items():
+        counts = {}
+        for token in tokenize(_field_text(info.get(field))):
+            counts[token] = counts.get(token, 0) + 1
+        for token, count in counts.items():
+            terms[token] = terms.get(token, 0) + weight * min(count, MAX_FIELD_OCCURRENCES)
+    return {"doc": doc, "terms": terms}
+
+def _bitmap(positions, size):
+    bits = bytearray((size + 7) // 8)
+    for position in positions:
+        bits[position >> 3] |= 1 << (position & 7)
+    return base64.b64encode(bytes(bits)).decode("ascii")
+
+def build_index(documents):
+    """
+    Build the search index from search documents (see build_document).
+
+    Returns:
+        dict: The search.json structure without "v" and "updatedAt"
+    """
+    postings = {}
+    facets = {field: {} for field in FACET_FIELDS}
+    for number, document in enumerate(documents):
+        for term, score in document["terms"].items():
+            postings.setdefault(term, []).append((number, score))
+        for field in FACET_FIELDS:
+            values = document["doc"].get(field)
+            for value in ([values] if isinstance(values, str) else values or []):
+                if field == "status":
+                    value = STATUS_CODES.get(fold_text(value), value)
+                facets[field].setdefault(value, []).append(number)
+
+    terms = sorted(postings)
+    encoded = []
+    for term in terms:
+        flat, previous = [], 0
+        for number, score in postings[term]:
+            flat.extend((number - previous, score))
+            previous = number
+        encoded.append(flat)
+
+    grams = {}
+    for position, term in enumerate(terms):
+        for start in range(len(term) - GRAM_SIZE + 1):
+            gram_terms = grams.setdefault(term[start:start + GRAM_SIZE], [])
+            if not gram_terms or gram_terms[-1] != position:
+                gram_terms.append(position)
+
+    return {
+        "docs": [document["doc"] for document in documents],
+        "terms": terms,
+        "postings": encoded,
+        "grams": dict(sorted(grams.items())),
+        "facets": {field: {value: _bitmap(numbers, len(documents)) for value, numbers in sorted(values.items())}
+                   for field, values in facets.items()},
+    }
+
+def _load_state(state_path):
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get("v") == SEARCH_VERSION:
+            return state
+    except (OSError, ValueError):
+        pass
+    return {"v": SEARCH_VERSION, "folders": {}, "dump": None}
+
+def _dump_documents(stories_path):
+    documents = []
+    for story in iter_documents(stories_path):
+        story_id = object_id(story.get("_id"))
+        if story_id:
+            documents.append(build_document(story, story_id, f"/story/{story_id}"))
+    return documents
+
+def update_search_index(output_base_dir, dump_dir=None, full=False):
+    """
+    Bring search.json up to date with the manga folders (and the stories dump).
+
+    Args:
+        output_base_dir (str): Manga output directory (frontend/public/data/manga)
+        dump_dir (str): MongoDB export directory; None keeps the dump stories of the last build
+        full (bool): Ignore the saved state and read every folder (and the dump) again
+
+    Returns:
+        dict: {"docs": total, "read": folders read, "terms": distinct terms}
+    """
+    # Serialize index updates from concurrent imports
+    with file_lock(os.path.join(output_base_dir, ".search.lock")):
+        state_path = os.path.join(output_base_dir, SEARCH_STATE_FILENAME)
+        state = _load_state(state_path)
+        if full:
+            state["folders"] = {}
+
+        folders = {}
+        read = 0
+        for name in sorted(os.listdir(output_base_dir)):
+            manga_dir = os.path.join(output_base_dir, name)
+            info_path = os.path.join(manga_dir, "info.json")
+            if name.startswith(('.', '_')) or not os.path.isfile(info_path):
+                continue
+            mtime = os.stat(info_path).st_mtime_ns
+            cached = state["folders"].get(name)
+            if cached and cached["mtime"] == mtime:
+                folders[name] = cached
+                continue
+            read += 1
+            try:
+                with open(info_path, 'r', encoding='utf-8') as f:
+                    info = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"  - Skipping {name}: {str(e)}")
+                continue
+            doc_id = info.get("_id") or name
+            folders[name] = {"mtime": mtime, "document": build_document(info, doc_id, f"/manga/{doc_id}")}
+
+        dump = state.get("dump")
+        stories_path = os.path.join(dump_dir, "stories.json") if dump_dir else None
+        if stories_path and os.path.exists(stories_path):
+            stat = os.stat(stories_path)
+            fingerprint = [stat.st_size, stat.st_mtime_ns]
+            if full or not dump or dump["file"] != fingerprint:
+                dump = {"file": fingerprint, "documents": _dump_documents(stories_path)}
+
+        documents = [folder["document"] for folder in folders.values()]
+        # Stories of the dump that already have a manga folder are indexed once, as the folder
+        titles = {fold_text(document["doc"].get("title", "")) for document in documents}
+        for document in (dump or {}).get("documents", []):
+            if fold_text(document["doc"].get("title", "")) not in titles:
+                documents.append(document)
+
+        index = build_index(documents)
+        atomic_write_json(os.path.join(output_base_dir, SEARCH_FILENAME),
+                          {"v": SEARCH_VERSION, "updatedAt": datetime.now().isoformat(), **index},
+                          ensure_ascii=False, separators=(',', ':'))
+        atomic_write_json(state_path, {"v": SEARCH_VERSION, "folders": folders, "dump": dump},
+                          ensure_ascii=False, separators=(',', ':'))
+    return {"docs": len(documents), "read": read, "terms": len(index["terms"])}
+
+def search(index, query, limit=20):
+    """
+    Query a loaded search index from scripts.
+
+    Every query token must match exactly, except the last one, which may be a
+    prefix (the browser also matches inside words, through "grams").
+
+    Returns:
+        list: (score, doc) pairs, best first
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return []
+    terms = index["terms"]
+    scores = None
+    for position, token in enumerate(tokens):
+        if position == len(tokens) - 1:
+            start = bisect.bisect_left(terms, token)
+            end = bisect.bisect_left(terms, token + "\uffff")
+            matches = range(start, end)
+        else:
+            at = bisect.bisect_left(terms, token)
+            matches = [at] if at < len(terms) and terms[at] == token else []
+        token_scores = {}
+        for term_position in matches:
+            number = 0
+            flat = index["postings"][term_position]
+            for i in range(0, len(flat), 2):
+                number += flat[i]
+                token_scores[number] = max(token_scores.get(number, 0), flat[i + 1])
+        scores = token_scores if scores is None else {number: score + token_scores[number]
+                                                      for number, score in scores.items() if number in token_scores}
+    ranked = sorted(scores.items(), key=lambda item: -item[1])[:limit]
+    return [(score, index["docs"][number]) for number, score in ranked]
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the story search index (search.json)')
+    parser.add_argument('--output', default='../../frontend/public/data/manga',
+                        help='Manga output directory (default: ../../frontend/public/data/manga)')
+    parser.add_argument('--dump', default='../../database/mongodb/dump',
+                        help='MongoDB export with stories.json (default: ../../database/mongodb/dump)')
+    parser.add_argument('--no-dump', action='store_true',
+                        help='Do not read the dump (keeps the dump stories of the last build)')
+    parser.add_argument('--full', action='store_true',
+                        help='Rebuild from scratch instead of only reading changed folders')
+    parser.add_argument('--query', help='Search the index after building it and print the results')
+    args = parser.parse_args()
+
+    base_dir = os.path.dirname(__file__)
+    output_dir = os.path.abspath(os.path.join(base_dir, args.output))
+    dump_dir = None if args.no_dump else os.path.abspath(os.path.join(base_dir, args.dump))
+    stats = update_search_index(output_dir, dump_dir, full=args.full)
+    print(f"Search index: {stats['docs']} stories, {stats['terms']} terms ({stats['read']} folders read)")
+
+    if args.query:
+        with open(os.path.join(output_dir, SEARCH_FILENAME), 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        for score, doc in search(index, args.query):
+            print(f"  {score:4d}  {doc['title']}  ({doc['link']})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
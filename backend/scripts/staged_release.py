@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Staged, atomically published manga folders.
+
+Imports used to write pages and manifests straight into the live folder, so
+a reader could see half a chapter, pages missing or a manifest that did not
+match the pages on disk. An import now builds a complete new release of
+the folder in a staging directory, syncs it to disk and publishes it with a
+single atomic rename of a symlink:
+
+    <output>/naruto -> .releases/naruto/20261018T101500-3f9a1c
+    <output>/.releases/naruto/20261018T101500-3f9a1c/   (published)
+    <output>/.releases/naruto/.staging-20261018T113000-a21b7e/   (in progress)
+
+Readers always resolve the folder to one complete release. A crashed import
+only leaves a staging directory behind, which a later import removes. The
+release id is written into info.json as "version", so caches can key on it.
+Unchanged pages are hard-linked from the previous release instead of
+copied (seed_chapters), and a few previous releases are kept for readers
+that are still fetching from them.
+
+Where symlinks are unavailable the folder itself is swapped with two renames
+(a window of a few microseconds without the folder).
+"""
+import os
+import shutil
+import time
+import uuid
+
+RELEASES_DIRNAME = ".releases"
+STAGING_PREFIX = ".staging-"
+# Previous releases kept after a publish (readers may still be fetching from them)
+KEEP_RELEASES = 2
+# Staging directories older than this belong to crashed imports
+STALE_STAGING_SECONDS = 6 * 3600
+
+def new_version():
+    """Sortable release id: UTC timestamp plus a random suffix."""
+    return f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{uuid.uuid4().hex[:6]}"
+
+def fsync_tree(root):
+    """Flush every file and directory below root to disk."""
+    for dirpath, _dirnames, filenames in os.walk(root):
+        for name in filenames:
+            fd = os.open(os.path.join(dirpath, name), os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        fsync_dir(dirpath)
+
+def fsync_dir(path):
+    """Flush a directory entry (renames inside it); not supported on every platform."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def link_tree(source, target):
+    """Recreate a directory tree with hard links to the files (copies across filesystems)."""
+    for dirpath, _dirnames, filenames in os.walk(source):
+        target_dir = os.path.join(target, os.path.relpath(dirpath, source))
+        os.makedirs(target_dir, exist_ok=True)
+        for name in filenames:
+            source_path = os.path.join(dirpath, name)
+            target_path = os.path.join(target_dir, name)
+            try:
+                os.link(source_path, target_path)
+            except OSError:
+                shutil.copy2(source_path, target_path)
+
+class StagedRelease:
+    """
+    One release of a manga folder, built in staging and published atomically.
+
+    Everything the import writes goes below `dir`. Paths recorded for later
+    imports (such as the import state) must use the public folder; use
+    public_path()/staged_path() to convert between the two.
+
+    Files hard-linked by seed_chapters() are shared with the live release:
+    replace them (write a temporary file and os.replace() it) instead of
+    rewriting them in place.
+
+    Args:
+        output_base_dir (str): Manga output directory
+        manga_id (str): Folder name of the manga
+        keep (int): Previous releases kept after publishing
+    """
+
+    def __init__(self, output_base_dir, manga_id, keep=KEEP_RELEASES):
+        self.output_base_dir = os.path.abspath(output_base_dir)
+        self.manga_id = manga_id
+        self.keep = keep
+        self.version = new_version()
+        self.public_dir = os.path.join(self.output_base_dir, manga_id)
+        self.releases_dir = os.path.join(self.output_base_dir, RELEASES_DIRNAME, manga_id)
+        self.dir = os.path.join(self.releases_dir, STAGING_PREFIX + self.version)
+
+    def begin(self):
+        """Create the staging directory (removing ones left by crashed imports)."""
+        os.makedirs(self.releases_dir, exist_ok=True)
+        now = time.time()
+        for name in os.listdir(self.releases_dir):
+            path = os.path.join(self.releases_dir, name)
+            if name.startswith(STAGING_PREFIX) and now - os.path.getmtime(path) > STALE_STAGING_SECONDS:
+                shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(self.dir)
+        return self
+
+    def seed_chapters(self):
+        """Hard-link the chapters/ tree of the live release into staging (for incremental imports)."""
+        chapters_dir = os.path.join(self.public_dir, "chapters")
+        if os.path.isdir(chapters_dir):
+            link_tree(chapters_dir, os.path.join(self.dir, "chapters"))
+
+    def seed_folder(self):
+        """Hard-link the whole live release into staging (for edits of an existing folder)."""
+        if os.path.isdir(self.public_dir):
+            link_tree(self.public_dir, self.dir)
+
+    def staged_path(self, path):
+        """Map a path in the public folder to the same path in staging (other paths are unchanged)."""
+        prefix = self.public_dir + os.sep
+        absolute = os.path.abspath(path)
+        return os.path.join(self.dir, absolute[len(prefix):]) if absolute.startswith(prefix) else path
+
+    def public_path(self, path):
+        """Map a path in staging to the same path in the public folder (other paths are unchanged)."""
+        prefix = self.dir + os.sep
+        absolute = os.path.abspath(path)
+        return os.path.join(self.public_dir, absolute[len(prefix):]) if absolute.startswith(prefix) else path
+
+    def publish(self):
+        """
+        Sync the staged release to disk and make it the live folder.
+
+        Returns:
+            str: Directory of the published release
+        """
+        fsync_tree(self.dir)
+        release_dir = os.path.join(self.releases_dir, self.version)
+        os.rename(self.dir, release_dir)
+        fsync_dir(self.releases_dir)
+
+        if os.path.isdir(self.public_dir) and not os.path.islink(self.public_dir):
+            # Folder written before staged imports: keep it as the previous release
+            os.rename(self.public_dir, os.path.join(self.releases_dir, f"legacy-{self.version}"))
+
+        link_path = os.path.join(self.output_base_dir, f".{self.manga_id}.link-{self.version}")
+        try:
+            os.symlink(os.path.relpath(release_dir, self.output_base_dir), link_path, target_is_directory=True)
+        except (OSError, NotImplementedError):
+            self._swap_directory(release_dir)
+        else:
+            os.replace(link_path, self.public_dir)
+        fsync_dir(self.output_base_dir)
+
+        self.prune()
+        print(f"Published release {self.version} of {self.manga_id}")
+        return release_dir
+
+    def _swap_directory(self, release_dir):
+        """Publish without symlinks: rename the live folder away and the release into place."""
+        previous = os.path.join(self.releases_dir, f"previous-{self.version}")
+        if os.path.lexists(self.public_dir):
+            os.rename(self.public_dir, previous)
+        os.rename(release_dir, self.public_dir)
+
+    def prune(self):
+        """Remove published releases beyond the newest `keep` previous ones."""
+        live = os.path.realpath(self.public_dir)
+        releases = sorted((name for name in os.listdir(self.releases_dir) if not name.startswith(STAGING_PREFIX)),
+                          key=lambda name: os.path.getmtime(os.path.join(self.releases_dir, name)), reverse=True)
+        old = [name for name in releases if os.path.join(self.releases_dir, name) != live]
+        for name in old[self.keep:]:
+            shutil.rmtree(os.path.join(self.releases_dir, name), ignore_errors=True)
+
+    def abort(self):
+        """Throw the staged release away; the live folder is untouched."""
+        shutil.rmtree(self.dir, ignore_errors=True)
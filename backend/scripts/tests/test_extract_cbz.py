@@ -0,0 +1,57 @@
+"""Chapter and cover detection of extract_cbz.py."""
+import io
+import os
+import sys
+import unittest
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extract_cbz import choose_cover, list_image_files, page_chapters
+
+def make_archive(names):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name in names:
+            archive.writestr(name, name.encode('utf-8'))
+    buffer.seek(0)
+    return zipfile.ZipFile(buffer)
+
+class ChapterDetectionTest(unittest.TestCase):
+
+    def detect(self, names):
+        with make_archive(names) as zip_ref:
+            image_files = list_image_files(zip_ref)
+            cover = choose_cover(image_files)
+            return cover, page_chapters(zip_ref, image_files, cover)
+
+    def test_root_cover_next_to_chapter_folders(self):
+        cover, chapters = self.detect(["cover.jpg", "Ch1/001.jpg", "Ch1/002.jpg",
+                                       "Ch2/001.jpg", "Ch3/001.jpg"])
+        self.assertEqual(cover, "cover.jpg")
+        self.assertEqual(chapters, [("Ch1", ["Ch1/001.jpg", "Ch1/002.jpg"]),
+                                    ("Ch2", ["Ch2/001.jpg"]),
+                                    ("Ch3", ["Ch3/001.jpg"])])
+
+    def test_root_front_matter_goes_before_first_chapter(self):
+        cover, chapters = self.detect(["cover.jpg", "credits.jpg", "Ch1/001.jpg", "Ch2/001.jpg"])
+        self.assertEqual(cover, "cover.jpg")
+        self.assertEqual(chapters, [("Ch1", ["credits.jpg", "Ch1/001.jpg"]), ("Ch2", ["Ch2/001.jpg"])])
+
+    def test_root_cover_with_single_folder_is_one_chapter(self):
+        cover, chapters = self.detect(["cover.jpg", "Vol1/001.jpg", "Vol1/002.jpg"])
+        self.assertEqual(cover, "cover.jpg")
+        self.assertEqual(chapters, [("Chapter 1", ["Vol1/001.jpg", "Vol1/002.jpg"])])
+
+    def test_first_page_is_cover_without_root_image(self):
+        cover, chapters = self.detect(["Ch1/001.jpg", "Ch1/002.jpg", "Ch2/001.jpg"])
+        self.assertEqual(cover, "Ch1/001.jpg")
+        self.assertEqual(chapters, [("Ch1", ["Ch1/002.jpg"]), ("Ch2", ["Ch2/001.jpg"])])
+
+    def test_flat_archive(self):
+        cover, chapters = self.detect(["001.jpg", "002.jpg", "010.jpg"])
+        self.assertEqual(cover, "001.jpg")
+        self.assertEqual(chapters, [("Chapter 1", ["002.jpg", "010.jpg"])])
+
+if __name__ == "__main__":
+    unittest.main()
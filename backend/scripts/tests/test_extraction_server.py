@@ -0,0 +1,57 @@
+"""Protocol handling of the extract_cbz.py --serve server."""
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extract_cbz import ExtractionServer
+
+class ExtractionServerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cbz_path = os.path.join(self.tmpdir.name, "book.cbz")
+        with open(self.cbz_path, "wb") as f:
+            f.write(b"not a zip")
+        self.server = ExtractionServer(self.tmpdir.name, workers=1)
+        self.sent = []
+
+    def tearDown(self):
+        self.server.close()
+        self.tmpdir.cleanup()
+
+    def send(self, message):
+        self.sent.append(message)
+
+    def test_bad_lines_are_rejected_and_server_keeps_serving(self):
+        bad_lines = [
+            '{"id": ',
+            '[1, 2]',
+            '"job"',
+            '{"id": [1], "cbz_path": "x.cbz"}',
+            '{"id": "a", "cbz_path": 5}',
+            '{"id": "b", "cbz_path": "%s", "preload_pages": "many"}' % self.cbz_path,
+            '{"id": "c", "cbz_path": "%s", "variants": [320, "wide"]}' % self.cbz_path,
+            '{"id": "d", "cbz_path": "%s", "variants": 640}' % self.cbz_path,
+        ]
+        for line in bad_lines:
+            self.server.handle_line(line, self.send)
+        self.assertEqual(len(self.sent), len(bad_lines))
+        self.assertTrue(all(message["type"] == "error" for message in self.sent))
+        self.assertEqual([message.get("id") for message in self.sent[3:]], [None, "a", "b", "c", "d"])
+        self.assertEqual(self.server.folders, {})
+
+        self.server.handle_line('{"id": "p", "type": "ping"}', self.send)
+        self.assertEqual(self.sent[-1], {"id": "p", "type": "pong", "workers": 1})
+
+    def test_folder_is_released_when_the_pool_refuses_a_job(self):
+        self.server.executor.shutdown(wait=True)
+        self.server.handle_line('{"id": 1, "cbz_path": "%s"}' % self.cbz_path, self.send)
+        self.assertEqual([message["type"] for message in self.sent], ["accepted", "error"])
+        self.assertEqual(self.server.folders, {})
+        self.assertEqual(self.server.senders, {})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,7 +3,7 @@ const router = express.Router();
 const multer = require('multer');
 const path = require('path');
 const fs = require('fs');
-const { spawn } = require('child_process');
+const zlib = require('zlib');
 const Story = require('../models/Story');
 const Chapter = require('../models/Chapter');
 const { promisify } = require('util');
@@ -11,6 +11,7 @@ const readdir = promisify(fs.readdir);
 const stat = promisify(fs.stat);
 const authMiddleware = require('../middleware/authMiddleware');
 const adminMiddleware = require('../middleware/adminMiddleware');
+const cbzExtractionService = require('../utils/CbzExtractionService');
 
 // Cấu hình multer để lưu file tạm thời
 const storage = multer.diskStorage({
@@ -42,6 +43,38 @@ const upload = multer({
   limits: { fileSize: 1024 * 1024 * 1000 } // Giới hạn 1GB
 });
 
+// Đọc danh sách độ rộng ảnh thu nhỏ từ form (vd: "480,960,1600")
+const parseVariantWidths = (value) => {
+  if (!value) {
+    return undefined;
+  }
+  const widths = String(value).split(',').map((width) => parseInt(width, 10)).filter((width) => width > 0);
+  return widths.length ? widths : undefined;
+};
+
+// Tạo các chapter trong database từ kết quả giải nén (một CBZ có thể chứa nhiều chương)
+const saveImportedChapters = async (storyId, mangaInfo) => {
+  const chapters = mangaInfo.chapters && mangaInfo.chapters.length
+    ? mangaInfo.chapters
+    : [{ number: 1, title: 'Chapter 1', images: mangaInfo.chapter_images }];
+
+  const savedChapters = await Chapter.insertMany(chapters.map((chapter) => ({
+    story: storyId,
+    chapter_number: chapter.number,
+    title: chapter.title,
+    content: JSON.stringify({
+      images: chapter.images,
+      pages: chapter.images.length
+    })
+  })));
+  console.log(`Saved ${savedChapters.length} chapters for story ${storyId}`);
+  return savedChapters;
+};
+
+const countImportedChapters = (mangaInfo) => (
+  mangaInfo.chapters && mangaInfo.chapters.length ? mangaInfo.chapters.length : 1
+);
+
 // Route để upload và xử lý file CBZ
 router.post('/import',
   (req, res, next) => {
@@ -66,144 +99,60 @@ router.post('/import',
       // Tên truyện (sử dụng title hoặc tên file nếu không có title)
       const mangaName = title || path.basename(req.file.originalname, '.cbz');
 
-      // Đường dẫn đến script Python
-      const pythonScriptPath = path.join(__dirname, '../../scripts/extract_cbz.py');
-
-      // Đường dẫn đến thư mục output
-      const outputDir = path.resolve(path.join(__dirname, '../../../frontend/public/data/manga'));
+      console.log('Extracting CBZ via extraction server...');
+      console.log('CBZ file path:', cbzFilePath);
+      console.log('Manga name:', mangaName);
 
-      // Đảm bảo thư mục output tồn tại
-      if (!fs.existsSync(outputDir)) {
-        fs.mkdirSync(outputDir, { recursive: true });
+      let mangaInfo;
+      try {
+        mangaInfo = await cbzExtractionService.extract(cbzFilePath, mangaName, {
+          indexOnly: req.body.indexOnly === 'true',
+          variants: parseVariantWidths(req.body.variants),
+          dedupe: req.body.dedupe === 'true',
+          chaptersFormat: req.body.chaptersFormat,
+          placeholders: req.body.placeholders === 'true'
+        });
+      } catch (error) {
+        return res.status(500).json({
+          success: false,
+          message: 'Lỗi khi giải nén file CBZ',
+          error: error.message
+        });
       }
 
-      console.log('Output directory (absolute path):', outputDir);
-
-      console.log('Executing Python script to extract CBZ...');
-      console.log('CBZ file path:', cbzFilePath);
-      console.log('Manga name:', mangaName);
-      console.log('Output directory:', outputDir);
-
-      // Chạy script Python để giải nén file CBZ
-      // Kiểm tra xem python3 hay python có sẵn
-      const pythonCommand = process.platform === 'win32' ? 'python' : 'python3';
-      console.log('Using Python command:', pythonCommand);
-
-      const pythonProcess = spawn(pythonCommand, [
-        pythonScriptPath,
-        cbzFilePath,
-        '--name', mangaName,
-        '--output', outputDir
-      ]);
-
-      let pythonOutput = '';
-      let pythonError = '';
-
-      pythonProcess.stdout.on('data', (data) => {
-        pythonOutput += data.toString();
-        console.log('Python stdout:', data.toString());
+      // Tạo thumbnail path
+      const thumbnailPath = mangaInfo.cover;
+
+      // Tạo story mới trong database
+      const story = new Story({
+        title: mangaName,
+        description: description || `Truyện được import từ file CBZ: ${req.file.originalname}`,
+        author: author || 'Unknown',
+        genre: genre || 'Manga',
+        thumbnail: thumbnailPath,
+        status: status || 'ongoing',
+        type: type || 'normal',
+        number_of_chapters: countImportedChapters(mangaInfo)
       });
 
-      pythonProcess.stderr.on('data', (data) => {
-        pythonError += data.toString();
-        console.error('Python stderr:', data.toString());
-      });
+      // Lưu story vào database
+      const savedStory = await story.save();
+      console.log('Story saved successfully:', savedStory._id);
 
-      pythonProcess.on('close', async (code) => {
-        console.log(`Python process exited with code ${code}`);
+      // Tạo và lưu các chapter vào database
+      const savedChapters = await saveImportedChapters(savedStory._id, mangaInfo);
 
-        if (code !== 0) {
-          return res.status(500).json({
-            success: false,
-            message: 'Lỗi khi giải nén file CBZ',
-            error: pythonError
-          });
-        }
+      // Xóa file CBZ tạm thời
+      fs.unlinkSync(cbzFilePath);
 
-        try {
-          console.log('Full Python output:', pythonOutput);
-
-          // Tìm phần JSON trong output với marker
-          let jsonOutput = '';
-          const jsonStartMarker = 'RESULT_JSON_START';
-          const jsonEndMarker = 'RESULT_JSON_END';
-          const jsonStartIndex = pythonOutput.indexOf(jsonStartMarker);
-          const jsonEndIndex = pythonOutput.indexOf(jsonEndMarker);
-
-          if (jsonStartIndex >= 0 && jsonEndIndex >= 0 && jsonEndIndex > jsonStartIndex) {
-            jsonOutput = pythonOutput.substring(
-              jsonStartIndex + jsonStartMarker.length,
-              jsonEndIndex
-            );
-            console.log('Extracted JSON:', jsonOutput);
-          } else {
-            // Fallback: tìm kiếm JSON thông thường
-            const bracketStartIndex = pythonOutput.indexOf('{');
-            const bracketEndIndex = pythonOutput.lastIndexOf('}');
-
-            if (bracketStartIndex >= 0 && bracketEndIndex >= 0 && bracketEndIndex > bracketStartIndex) {
-              jsonOutput = pythonOutput.substring(bracketStartIndex, bracketEndIndex + 1);
-              console.log('Extracted JSON (fallback method):', jsonOutput);
-            } else {
-              throw new Error('Không tìm thấy JSON trong output của Python');
-            }
-          }
-
-          const mangaInfo = JSON.parse(jsonOutput);
-
-          // Tạo thumbnail path
-          const thumbnailPath = mangaInfo.cover;
-
-          // Tạo story mới trong database
-          const story = new Story({
-            title: mangaName,
-            description: description || `Truyện được import từ file CBZ: ${req.file.originalname}`,
-            author: author || 'Unknown',
-            genre: genre || 'Manga',
-            thumbnail: thumbnailPath,
-            status: status || 'ongoing',
-            type: type || 'normal',
-            number_of_chapters: 1
-          });
-
-          // Lưu story vào database
-          const savedStory = await story.save();
-          console.log('Story saved successfully:', savedStory._id);
-
-          // Tạo chapter mới
-          const chapter = new Chapter({
-            story: savedStory._id,
-            chapter_number: 1,
-            title: 'Chapter 1',
-            content: JSON.stringify({
-              images: mangaInfo.chapter_images,
-              pages: mangaInfo.pages
-            })
-          });
-
-          // Lưu chapter vào database
-          const savedChapter = await chapter.save();
-          console.log('Chapter saved successfully:', savedChapter._id);
-
-          // Xóa file CBZ tạm thời
-          fs.unlinkSync(cbzFilePath);
-
-          // Trả về kết quả thành công
-          res.status(200).json({
-            success: true,
-            message: 'Import thành công: ' + mangaName,
-            storyId: savedStory._id,
-            thumbnailPath: thumbnailPath,
-            chapterId: savedChapter._id
-          });
-        } catch (error) {
-          console.error('Error processing Python output:', error);
-          res.status(500).json({
-            success: false,
-            message: 'Lỗi khi xử lý kết quả từ Python script',
-            error: error.message
-          });
-        }
+      // Trả về kết quả thành công
+      res.status(200).json({
+        success: true,
+        message: 'Import thành công: ' + mangaName,
+        storyId: savedStory._id,
+        thumbnailPath: thumbnailPath,
+        chapterId: savedChapters[0]._id,
+        chapterIds: savedChapters.map((chapter) => chapter._id)
       });
     } catch (error) {
       console.error('Error importing CBZ:', error);
@@ -273,132 +222,36 @@ router.post('/simple-import', upload.single('cbzFile'), async (req, res) => {
     const mangaName = req.body.title || path.basename(fileName, '.cbz');
     console.log('Manga name:', mangaName);
 
-    // Đường dẫn đến script Python
-    const pythonScriptPath = path.join(__dirname, '../../scripts/extract_cbz.py');
-    console.log('Python script path:', pythonScriptPath);
-
-    // Đường dẫn đến thư mục output
-    const outputDir = path.resolve(path.join(__dirname, '../../../frontend/public/data/manga'));
-    console.log('Output directory:', outputDir);
-
-    // Đảm bảo thư mục output tồn tại
-    if (!fs.existsSync(outputDir)) {
-      fs.mkdirSync(outputDir, { recursive: true });
-    }
-
-    // Chạy script Python để giải nén file CBZ
-    const pythonCommand = process.platform === 'win32' ? 'python' : 'python3';
-    console.log('Using Python command:', pythonCommand);
-
-    const pythonProcess = spawn(pythonCommand, [
-      pythonScriptPath,
-      cbzFilePath,
-      '--name', mangaName,
-      '--output', outputDir
-    ]);
-
-    let pythonOutput = '';
-    let pythonError = '';
-
-    pythonProcess.stdout.on('data', (data) => {
-      const output = data.toString();
-      pythonOutput += output;
-      console.log('Python stdout:', output);
+    // Giải nén qua tiến trình extraction server chạy nền
+    const mangaInfo = await cbzExtractionService.extract(cbzFilePath, mangaName, {
+      indexOnly: req.body.indexOnly === 'true',
+      variants: parseVariantWidths(req.body.variants),
+      dedupe: req.body.dedupe === 'true',
+      chaptersFormat: req.body.chaptersFormat,
+      placeholders: req.body.placeholders === 'true'
     });
 
-    pythonProcess.stderr.on('data', (data) => {
-      const error = data.toString();
-      pythonError += error;
-      console.error('Python stderr:', error);
+    // Tạo story mới trong database
+    const story = new Story({
+      title: mangaName,
+      description: req.body.description || `Truyện được import từ file CBZ: ${fileName}`,
+      author: req.body.author || 'Unknown',
+      genre: req.body.genre || 'Manga',
+      thumbnail: mangaInfo.cover,
+      status: req.body.status || 'ongoing',
+      type: req.body.type || 'normal',
+      number_of_chapters: countImportedChapters(mangaInfo)
     });
 
-    // Xử lý khi script Python hoàn tất
-    await new Promise((resolve, reject) => {
-      pythonProcess.on('close', async (code) => {
-        console.log(`Python process exited with code ${code}`);
+    // Lưu story vào database
+    const savedStory = await story.save();
+    console.log('Story saved successfully:', savedStory._id);
 
-        if (code !== 0) {
-          reject(new Error(`Python script failed with code ${code}: ${pythonError}`));
-          return;
-        }
+    // Tạo và lưu các chapter vào database
+    await saveImportedChapters(savedStory._id, mangaInfo);
 
-        try {
-          // Tìm phần JSON trong output
-          let jsonOutput = '';
-          const jsonStartMarker = 'RESULT_JSON_START';
-          const jsonEndMarker = 'RESULT_JSON_END';
-          const jsonStartIndex = pythonOutput.indexOf(jsonStartMarker);
-          const jsonEndIndex = pythonOutput.indexOf(jsonEndMarker);
-
-          if (jsonStartIndex >= 0 && jsonEndIndex >= 0 && jsonEndIndex > jsonStartIndex) {
-            jsonOutput = pythonOutput.substring(
-              jsonStartIndex + jsonStartMarker.length,
-              jsonEndIndex
-            );
-            console.log('Extracted JSON:', jsonOutput);
-          } else {
-            // Fallback: tìm kiếm JSON thông thường
-            const bracketStartIndex = pythonOutput.indexOf('{');
-            const bracketEndIndex = pythonOutput.lastIndexOf('}');
-
-            if (bracketStartIndex >= 0 && bracketEndIndex >= 0 && bracketEndIndex > bracketStartIndex) {
-              jsonOutput = pythonOutput.substring(bracketStartIndex, bracketEndIndex + 1);
-              console.log('Extracted JSON (fallback method):', jsonOutput);
-            } else {
-              reject(new Error('Không tìm thấy JSON trong output của Python'));
-              return;
-            }
-          }
-
-          const mangaInfo = JSON.parse(jsonOutput);
-
-          // Tạo story mới trong database
-          const story = new Story({
-            title: mangaName,
-            description: req.body.description || `Truyện được import từ file CBZ: ${fileName}`,
-            author: req.body.author || 'Unknown',
-            genre: req.body.genre || 'Manga',
-            thumbnail: mangaInfo.cover,
-            status: req.body.status || 'ongoing',
-            type: req.body.type || 'normal',
-            number_of_chapters: 1
-          });
-
-          // Lưu story vào database
-          const savedStory = await story.save();
-          console.log('Story saved successfully:', savedStory._id);
-
-          // Tạo chapter mới
-          const chapter = new Chapter({
-            story: savedStory._id,
-            chapter_number: 1,
-            title: 'Chapter 1',
-            content: JSON.stringify({
-              images: mangaInfo.chapter_images,
-              pages: mangaInfo.pages
-            })
-          });
-
-          // Lưu chapter vào database
-          const savedChapter = await chapter.save();
-          console.log('Chapter saved successfully:', savedChapter._id);
-
-          // Xóa file CBZ tạm thời
-          fs.unlinkSync(cbzFilePath);
-
-          resolve({
-            success: true,
-            message: 'Import thành công: ' + mangaName,
-            storyId: savedStory._id,
-            thumbnailPath: mangaInfo.cover,
-            chapterId: savedChapter._id,
-            mangaInfo: mangaInfo
-          });
-        } catch (error) {
-          reject(error);
-        }
-      });
-    });
+    // Xóa file CBZ tạm thời
+    fs.unlinkSync(cbzFilePath);
 
     // Trả về kết quả thành công
     res.status(200).json({
@@ -420,6 +273,83 @@ router.post('/simple-import', upload.single('cbzFile'), async (req, res) => {
   }
 });
 
+// Cache index trang của các truyện import ở chế độ index (key: thư mục, kiểm tra mtime)
+const pageIndexCache = new Map();
+
+const PAGE_CONTENT_TYPES = {
+  '.jpg': 'image/jpeg',
+  '.jpeg': 'image/jpeg',
+  '.png': 'image/png',
+  '.gif': 'image/gif',
+  '.webp': 'image/webp'
+};
+
+const loadPageIndex = async (mangaFolder) => {
+  const indexPath = path.join(mangaFolder, 'pages.idx.json');
+  const stats = await stat(indexPath);
+  const cached = pageIndexCache.get(mangaFolder);
+  if (cached && cached.mtimeMs === stats.mtimeMs) {
+    return cached.index;
+  }
+  const index = JSON.parse(await promisify(fs.readFile)(indexPath, 'utf8'));
+  pageIndexCache.set(mangaFolder, { mtimeMs: stats.mtimeMs, index });
+  return index;
+};
+
+// Đọc trang trực tiếp từ file CBZ theo index (không cần giải nén ra thư mục)
+router.get('/pages/:folder/:page', async (req, res) => {
+  try {
+    const mangaDir = path.resolve(path.join(__dirname, '../../../frontend/public/data/manga'));
+    const mangaFolder = path.join(mangaDir, req.params.folder);
+    if (path.dirname(mangaFolder) !== mangaDir) {
+      return res.status(400).json({ success: false, message: 'Thư mục không hợp lệ' });
+    }
+
+    let index;
+    try {
+      index = await loadPageIndex(mangaFolder);
+    } catch (error) {
+      return res.status(404).json({ success: false, message: 'Không tìm thấy index trang' });
+    }
+
+    const pageNumber = parseInt(req.params.page, 10);
+    const entry = index.pages[pageNumber - 1];
+    if (!entry) {
+      return res.status(404).json({ success: false, message: 'Không tìm thấy trang' });
+    }
+
+    const [name, offset, method, csize, size, crc] = entry;
+    const archivePath = path.join(mangaFolder, index.archive);
+    const contentType = PAGE_CONTENT_TYPES[path.extname(name).toLowerCase()] || 'application/octet-stream';
+    const version = crc.toString(16).padStart(8, '0');
+    const etag = `"${version}-${size}"`;
+
+    // URL có ?v=<CRC> (do extract_cbz.py tạo) đổi theo nội dung trang nên được cache vĩnh viễn;
+    // URL không có phiên bản phải kiểm tra lại bằng ETag để không giữ trang cũ sau khi import lại
+    res.set({
+      'Content-Type': contentType,
+      'ETag': etag,
+      'Cache-Control': req.query.v === version ? 'public, max-age=31536000, immutable' : 'no-cache'
+    });
+    if (req.headers['if-none-match'] === etag) {
+      return res.status(304).end();
+    }
+    res.set('Content-Length', size);
+
+    // Trang lưu không nén (stored) được gửi thẳng theo byte range của file CBZ
+    const source = fs.createReadStream(archivePath, { start: offset, end: offset + csize - 1 });
+    const stream = method === 0 ? source : source.pipe(zlib.createInflateRaw());
+    stream.on('error', (error) => {
+      console.error('Error reading page from CBZ:', error);
+      res.destroy(error);
+    });
+    stream.pipe(res);
+  } catch (error) {
+    console.error('Error serving CBZ page:', error);
+    res.status(500).json({ success: false, message: 'Lỗi khi đọc trang', error: error.message });
+  }
+});
+
 // API endpoint để lấy danh sách thư mục manga
 router.get('/manga-directories', async (req, res) => {
   try {
@@ -446,6 +376,10 @@ router.get('/manga-directories', async (req, res) => {
     // Lọc ra chỉ các thư mục
     const directories = [];
     for (const item of items) {
+      // Bỏ qua thư mục nội bộ (.releases, .downloads, _store...); thư mục truyện có thể là symlink tới bản phát hành
+      if (item.startsWith('.') || item.startsWith('_')) {
+        continue;
+      }
       const itemPath = path.join(mangaDir, item);
       const stats = await stat(itemPath);
       if (stats.isDirectory()) {
@@ -33,6 +33,10 @@ router.get('/', async (req, res) => {
     // Lọc ra chỉ các thư mục
     const directories = [];
     for (const item of items) {
+      // Bỏ qua thư mục nội bộ (.releases, .downloads, _store...); thư mục truyện có thể là symlink tới bản phát hành
+      if (item.startsWith('.') || item.startsWith('_')) {
+        continue;
+      }
       const itemPath = path.join(mangaDir, item);
       const stats = await stat(itemPath);
       if (stats.isDirectory()) {
@@ -0,0 +1,137 @@
+const path = require('path');
+const readline = require('readline');
+const { spawn } = require('child_process');
+
+// Singleton quản lý tiến trình Python giải nén CBZ chạy nền (extract_cbz.py --serve)
+// Tiến trình được khởi động một lần và nhận job qua stdin dạng JSON mỗi dòng,
+// tránh phải spawn python3 mới cho mỗi lần upload.
+class CbzExtractionService {
+  constructor() {
+    if (!CbzExtractionService.instance) {
+      this.process = null;
+      this.jobs = new Map();
+      this.nextJobId = 1;
+      this.scriptPath = path.join(__dirname, '../../scripts/extract_cbz.py');
+      this.outputDir = path.resolve(path.join(__dirname, '../../../frontend/public/data/manga'));
+      this.workers = process.env.CBZ_WORKERS || '2';
+      // Giới hạn giải nén (xem backend/scripts/safe_extract.py); không đặt thì dùng mặc định của script
+      this.limitArgs = [
+        ['--max-total-mb', process.env.CBZ_MAX_TOTAL_MB],
+        ['--max-entries', process.env.CBZ_MAX_ENTRIES],
+        ['--max-ratio', process.env.CBZ_MAX_RATIO],
+        ['--bandwidth-mb', process.env.CBZ_BANDWIDTH_MB]
+      ].filter(([, value]) => value).flat();
+      // File Prometheus (textfile collector) nhận số liệu của lần import gần nhất, xem backend/scripts/import_metrics.py
+      this.metricsArgs = process.env.CBZ_METRICS_PROM ? ['--metrics-prom', process.env.CBZ_METRICS_PROM] : [];
+      CbzExtractionService.instance = this;
+    }
+    return CbzExtractionService.instance;
+  }
+
+  start() {
+    if (this.process) {
+      return this.process;
+    }
+
+    const pythonCommand = process.platform === 'win32' ? 'python' : 'python3';
+    console.log('Starting CBZ extraction server with', pythonCommand);
+
+    const child = spawn(pythonCommand, [
+      this.scriptPath,
+      '--serve',
+      '--workers', String(this.workers),
+      '--output', this.outputDir,
+      ...this.limitArgs,
+      ...this.metricsArgs
+    ]);
+
+    readline.createInterface({ input: child.stdout }).on('line', (line) => this.handleMessage(line));
+
+    child.stderr.on('data', (data) => {
+      console.error('CBZ extractor:', data.toString());
+    });
+
+    child.on('exit', (code) => {
+      console.error(`CBZ extraction server exited with code ${code}`);
+      this.process = null;
+      // Các job đang chờ sẽ không bao giờ có kết quả, báo lỗi cho chúng
+      for (const job of this.jobs.values()) {
+        job.reject(new Error(`CBZ extraction server exited with code ${code}`));
+      }
+      this.jobs.clear();
+    });
+
+    this.process = child;
+    return child;
+  }
+
+  handleMessage(line) {
+    let message;
+    try {
+      message = JSON.parse(line);
+    } catch (error) {
+      console.error('Invalid message from CBZ extractor:', line);
+      return;
+    }
+
+    const job = this.jobs.get(message.id);
+    if (!job) {
+      return;
+    }
+
+    if (message.type === 'progress') {
+      if (job.onProgress) {
+        job.onProgress(message.done, message.total);
+      }
+    } else if (message.type === 'result') {
+      this.jobs.delete(message.id);
+      this.logMetrics(message.result && message.result.metrics);
+      job.resolve(message.result);
+    } else if (message.type === 'error') {
+      this.jobs.delete(message.id);
+      job.reject(new Error(message.error));
+    }
+  }
+
+  // Một dòng tóm tắt cho mỗi lần import thay vì log từng trang
+  logMetrics(metrics) {
+    if (!metrics) {
+      return;
+    }
+    const stages = Object.entries(metrics.stages || {})
+      .map(([stage, values]) => `${stage}=${values.seconds.toFixed(3)}s`)
+      .join(' ');
+    console.log(`CBZ import ${metrics.manga}: ${metrics.pages} trang trong ${metrics.seconds.toFixed(2)}s, `
+      + `${metrics.errors} lỗi (${stages})`);
+  }
+
+  // Gửi một job giải nén, trả về Promise với thông tin manga (cover, pages, chapter_images)
+  // options.indexOnly: giữ nguyên file CBZ và chỉ ghi index trang thay vì giải nén
+  // options.variants: mảng độ rộng ảnh thu nhỏ cần tạo (vd: [480, 960, 1600])
+  // options.dedupe: lưu ảnh trang vào kho content-addressed dùng chung (_store)
+  // options.chaptersFormat: định dạng chapters.json ('full', 'compact' hoặc 'split')
+  // options.placeholders: ghi thêm placeholder BlurHash cho mỗi trang
+  // options.onProgress: callback (done, total) theo tiến độ
+  extract(cbzPath, mangaName, options = {}) {
+    const { onProgress, indexOnly = false, variants, dedupe = false, chaptersFormat, placeholders = false } = options;
+    const child = this.start();
+    const id = String(this.nextJobId++);
+
+    return new Promise((resolve, reject) => {
+      this.jobs.set(id, { resolve, reject, onProgress });
+      child.stdin.write(JSON.stringify({
+        id,
+        cbz_path: cbzPath,
+        name: mangaName,
+        output: this.outputDir,
+        index: indexOnly,
+        variants,
+        dedupe,
+        chapters_format: chaptersFormat,
+        placeholders
+      }) + '\n');
+    });
+  }
+}
+
+module.exports = new CbzExtractionService();
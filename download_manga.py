@@ -1,14 +1,44 @@
 import os
-import json
 import random
-import time
+import asyncio
+import importlib.util
 from datetime import datetime, timedelta
 import subprocess
 import re
+import sys
+
+# Dùng chung kho ảnh content-addressed với extract_cbz.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend", "scripts"))
+from page_store import blob_frontend_path, store_dir_for, store_file
+from import_state import atomic_write_json, file_fingerprint, is_unchanged, load_state, save_state
+from chapters_manifest import write_chapters_json
+from chapter_preload import PRELOAD_PAGES, write_preload_manifests
+from catalog_index import update_catalog
+from search_index import update_search_index
+from cover_sprites import update_sprites
+from page_metadata import annotate_pages, chapter_page_fields
+from staged_release import StagedRelease
 
 # Thư mục đầu ra cho dữ liệu truyện
 OUTPUT_DIR = "frontend/public/data/manga"
 
+# Lưu mỗi ảnh trang một lần duy nhất trong kho _store (khử trùng lặp giữa các lần import).
+# Tắt mặc định như --dedupe của extract_cbz.py, vì bật lên sẽ đổi cách lưu ảnh trên đĩa
+DEDUPE_PAGES = False
+
+# Cấu hình bộ tải ảnh (xem manga_fetcher.py)
+FETCH_CONCURRENCY = 8      # Số request đồng thời tối đa
+FETCH_RATE = 5.0           # Số request/giây tối đa, tránh gửi quá nhiều request
+FETCH_RETRIES = 3          # Số lần thử lại khi lỗi mạng/429/5xx
+SERIES_CONCURRENCY = 2     # Số truyện được tải song song
+
+# Định dạng chapters.json: "full" (danh sách đầy đủ), "compact" (mẫu đường dẫn, không thụt lề)
+# hoặc "split" (mỗi chương một file chapters/<số>.json), xem backend/scripts/chapters_manifest.py
+CHAPTERS_FORMAT = "full"
+
+# Ghi thêm placeholder BlurHash cho mỗi trang (kích thước trang luôn được ghi), xem backend/scripts/page_metadata.py
+PAGE_PLACEHOLDERS = False
+
 # Thông tin truyện muốn tải
 MANGA_INFO = {
     "one-piece": {
@@ -49,64 +79,111 @@ def create_manga_info(manga_id, manga_data):
         "tags": manga_data["tags"]
     }
 
-def download_manga(manga_id, manga_data):
-    """Tải truyện từ MangaDex sử dụng mangadex-downloader"""
+async def run_command(*args):
+    """Chạy lệnh ngoài (không qua shell) mà không chặn event loop"""
+    process = await asyncio.create_subprocess_exec(*args)
+    return_code = await process.wait()
+    if return_code != 0:
+        raise subprocess.CalledProcessError(return_code, args)
+
+async def download_manga(manga_id, manga_data, fetcher):
+    """Tải truyện từ MangaDex sử dụng mangadex-downloader
+    
+    Truyện được dựng trong thư mục staging rồi công bố bằng một lần đổi symlink atomic
+    (xem backend/scripts/staged_release.py), người đọc không bao giờ thấy thư mục dở dang.
+    """
     print(f"Đang tải truyện: {manga_data['title']} ({manga_id})")
     
-    # Tạo thư mục cho truyện
+    # Thư mục công khai của truyện và thư mục tải tạm (giữ lại giữa các lần chạy để tiếp tục)
     manga_folder = f"{OUTPUT_DIR}/{manga_id}"
-    os.makedirs(manga_folder, exist_ok=True)
-    os.makedirs(f"{manga_folder}/chapters", exist_ok=True)
+    temp_folder = f"{OUTPUT_DIR}/.downloads/{manga_id}"
+    release = StagedRelease(OUTPUT_DIR, manga_id).begin()
     
     # Tải truyện sử dụng mangadex-downloader
     try:
+        # Ảnh trang không đổi được hard link từ bản đang phục vụ thay vì ghi lại
+        release.seed_chapters()
+        os.makedirs(f"{release.dir}/chapters", exist_ok=True)
+        
         # Tải bìa truyện
-        cover_cmd = f"mangadex-dl --cover-only --id {manga_data['id']} -o {manga_folder}/temp"
-        subprocess.run(cover_cmd, shell=True, check=True)
+        os.makedirs(temp_folder, exist_ok=True)
+        await run_command("mangadex-dl", "--cover-only", "--id", manga_data['id'], "-o", temp_folder)
         
-        # Di chuyển file bìa vào thư mục chính
-        cover_files = os.listdir(f"{manga_folder}/temp")
+        # Di chuyển file bìa vào bản đang dựng (không tải được thì giữ bìa cũ)
+        # (thư mục tạm có thể còn các chương của lần chạy lỗi trước, chỉ xét file)
+        cover_files = [f for f in os.listdir(temp_folder) if os.path.isfile(os.path.join(temp_folder, f))]
         if cover_files:
             cover_file = cover_files[0]
-            os.rename(f"{manga_folder}/temp/{cover_file}", f"{manga_folder}/cover.jpg")
-            os.rmdir(f"{manga_folder}/temp")
+            os.rename(f"{temp_folder}/{cover_file}", f"{release.dir}/cover.jpg")
+            if not os.listdir(temp_folder):
+                os.rmdir(temp_folder)
+        elif os.path.exists(f"{manga_folder}/cover.jpg"):
+            os.link(f"{manga_folder}/cover.jpg", f"{release.dir}/cover.jpg")
         
         # Tải các chương
-        chapter_cmd = f"mangadex-dl --id {manga_data['id']} -o {manga_folder}/temp --limit {manga_data['chapter_limit']} --no-group-folder --no-progress"
-        subprocess.run(chapter_cmd, shell=True, check=True)
+        await run_command("mangadex-dl", "--id", manga_data['id'], "-o", temp_folder,
+                          "--limit", str(manga_data['chapter_limit']), "--no-group-folder", "--no-progress")
         
-        # Xử lý các chương đã tải
-        chapters_info = process_downloaded_chapters(manga_id, manga_folder)
+        # Xử lý các chương đã tải (công việc đĩa chạy trong thread để không chặn các truyện khác)
+        chapters_info = await asyncio.to_thread(process_downloaded_chapters, manga_id, release.dir,
+                                                temp_folder, release)
+        if chapters_info is None:
+            chapters_info = await create_sample_chapters(manga_id, 10, fetcher, release.dir)
         
-        # Cập nhật thông tin truyện
+        # Cập nhật thông tin truyện; "version" là mã bản phát hành để cache phân biệt
         manga_info = create_manga_info(manga_id, manga_data)
         manga_info["chapters"] = len(chapters_info)
+        manga_info["version"] = release.version
+        manga_info["preload"] = PRELOAD_PAGES
         
-        # Lưu thông tin truyện vào file JSON
-        with open(f"{manga_folder}/info.json", 'w', encoding='utf-8') as f:
-            json.dump(manga_info, f, ensure_ascii=False, indent=2)
+        # Lưu thông tin truyện vào file JSON (ghi atomic để người đọc không thấy file dở dang)
+        atomic_write_json(f"{release.dir}/info.json", manga_info, ensure_ascii=False, indent=2)
         
         # Lưu thông tin các chương vào file JSON
-        with open(f"{manga_folder}/chapters.json", 'w', encoding='utf-8') as f:
-            json.dump(chapters_info, f, ensure_ascii=False, indent=2)
+        write_chapters_json(release.dir, manga_id, chapters_info, CHAPTERS_FORMAT)
+        
+        # Danh sách ảnh đầu của chương kế tiếp để trình đọc tải trước (chapters/<n>/preload.json)
+        write_preload_manifests(release.dir, manga_id, chapters_info, OUTPUT_DIR)
+        
+        # fsync rồi đổi symlink: bản mới thay bản cũ trong một thao tác
+        release.publish()
         
         print(f"Đã hoàn thành tải truyện {manga_data['title']}")
         print(f"Dữ liệu được lưu tại: {manga_folder}")
         
     except Exception as e:
+        release.abort()
         print(f"Lỗi khi tải truyện {manga_id}: {e}")
-        # Tạo dữ liệu mẫu nếu có lỗi
-        create_sample_data(manga_id, manga_data)
+        if os.path.exists(f"{manga_folder}/chapters.json"):
+            # Giữ nguyên dữ liệu của lần import trước; thư mục temp được giữ lại để chạy lại tiếp tục
+            print(f"Giữ dữ liệu hiện có của {manga_id}, chạy lại để tiếp tục từ chỗ dừng")
+        else:
+            # Tạo dữ liệu mẫu nếu có lỗi và chưa có dữ liệu nào
+            await create_sample_data(manga_id, manga_data, fetcher)
 
-def process_downloaded_chapters(manga_id, manga_folder):
-    """Xử lý các chương đã tải và tạo thông tin"""
+def process_downloaded_chapters(manga_id, manga_folder, temp_folder=None, release=None):
+    """Xử lý các chương đã tải và tạo thông tin
+    
+    Chỉ di chuyển những ảnh có dấu vân tay (CRC32 + kích thước) khác với lần import trước,
+    dựa trên file trạng thái .import_state.json của truyện.
+    
+    Khi có release (StagedRelease), manga_folder là thư mục staging của nó: trạng thái cũ
+    được đọc từ thư mục đang phục vụ và đường dẫn lưu trong trạng thái luôn là đường dẫn công khai.
+    """
     chapters_info = []
-    temp_folder = f"{manga_folder}/temp"
+    chapter_slots = []
+    temp_folder = temp_folder or f"{manga_folder}/temp"
+    previous_state = load_state(release.public_dir if release else manga_folder)
+    if release:
+        for entry in previous_state["pages"].values():
+            entry["path"] = release.staged_path(entry["path"])
+    state = {"v": previous_state["v"], "pages": {}}
+    skipped = 0
     
-    # Kiểm tra xem thư mục temp có tồn tại không
+    # Kiểm tra xem thư mục temp có tồn tại không (None: người gọi sẽ tạo dữ liệu mẫu)
     if not os.path.exists(temp_folder):
         print(f"Không tìm thấy thư mục {temp_folder}. Tạo dữ liệu mẫu.")
-        return create_sample_chapters(manga_id, 10)
+        return None
     
     # Lấy danh sách chương từ thư mục temp
     chapter_folders = [f for f in os.listdir(temp_folder) if os.path.isdir(os.path.join(temp_folder, f))]
@@ -118,17 +195,46 @@ def process_downloaded_chapters(manga_id, manga_folder):
         
         # Tạo thư mục cho chương trong cấu trúc mới
         new_chapter_folder = f"{manga_folder}/chapters/{chapter_number}"
-        os.makedirs(new_chapter_folder, exist_ok=True)
+        if not DEDUPE_PAGES:
+            os.makedirs(new_chapter_folder, exist_ok=True)
         
         # Di chuyển và đổi tên các file ảnh
         image_files = [f for f in os.listdir(chapter_path) if f.endswith(('.jpg', '.png', '.jpeg', '.webp'))]
         image_files.sort()
         
         image_paths = []
+        image_hashes = []
+        image_slots = []
         for img_idx, img_file in enumerate(image_files):
+            source_path = os.path.join(chapter_path, img_file)
+            crc, size = file_fingerprint(source_path)
+            slot = f"{chapter_number}/{img_idx+1:03d}"
+            image_slots.append(slot)
+            previous = previous_state["pages"].get(slot)
+            if previous and previous.get("dedupe") == DEDUPE_PAGES and is_unchanged(previous, crc, size):
+                # Ảnh không đổi so với lần trước: giữ file cũ, bỏ file vừa tải
+                os.remove(source_path)
+                image_paths.append(previous["image"])
+                if previous.get("hash"):
+                    image_hashes.append(previous["hash"])
+                state["pages"][slot] = previous
+                skipped += 1
+                continue
+            
+            if DEDUPE_PAGES:
+                # Ảnh đã có trong kho thì chỉ xóa file tạm, không ghi thêm byte nào
+                key, blob_path, _ = store_file(store_dir_for(OUTPUT_DIR), source_path, move=True)
+                image_paths.append(blob_frontend_path(key, os.path.splitext(img_file)[1]))
+                image_hashes.append(key)
+                state["pages"][slot] = {"crc": crc, "size": size, "path": blob_path,
+                                        "image": image_paths[-1], "dedupe": True, "hash": key}
+                continue
             new_img_name = f"{img_idx+1:03d}.jpg"
-            os.rename(os.path.join(chapter_path, img_file), os.path.join(new_chapter_folder, new_img_name))
+            new_img_path = os.path.join(new_chapter_folder, new_img_name)
+            os.replace(source_path, new_img_path)
             image_paths.append(f"/data/manga/{manga_id}/chapters/{chapter_number}/{new_img_name}")
+            state["pages"][slot] = {"crc": crc, "size": size, "path": new_img_path,
+                                    "image": image_paths[-1], "dedupe": False}
         
         # Tạo thông tin chương
         chapter_info = {
@@ -140,8 +246,25 @@ def process_downloaded_chapters(manga_id, manga_folder):
             "createdAt": (datetime.now() - timedelta(days=365-chapter_number*7)).isoformat(),
             "isLocked": chapter_number % 10 == 0  # Khóa một số chương VIP
         }
+        if image_hashes:
+            chapter_info["hashes"] = image_hashes
         
         chapters_info.append(chapter_info)
+        chapter_slots.append(image_slots)
+    
+    # Đọc kích thước (và placeholder) của các trang mới, song song; trang không đổi dùng lại giá trị cũ
+    annotate_pages([state["pages"][slot] for slots in chapter_slots for slot in slots], PAGE_PLACEHOLDERS)
+    for chapter_info, slots in zip(chapters_info, chapter_slots):
+        chapter_info.update(chapter_page_fields([state["pages"][slot] for slot in slots], PAGE_PLACEHOLDERS))
+    
+    # Giữ lại trạng thái của các chương không có trong lần tải này
+    for slot, previous in previous_state["pages"].items():
+        state["pages"].setdefault(slot, previous)
+    if release:
+        for entry in state["pages"].values():
+            entry["path"] = release.public_path(entry["path"])
+    save_state(manga_folder, state)
+    print(f"Bỏ qua {skipped} ảnh không thay đổi")
     
     # Xóa thư mục temp sau khi xử lý xong
     import shutil
@@ -149,48 +272,55 @@ def process_downloaded_chapters(manga_id, manga_folder):
     
     return chapters_info
 
-def create_sample_data(manga_id, manga_data):
-    """Tạo dữ liệu mẫu nếu không tải được từ MangaDex"""
-    print(f"Tạo dữ liệu mẫu cho truyện {manga_data['title']}")
+async def create_sample_data(manga_id, manga_data, fetcher):
+    """Tạo dữ liệu mẫu nếu không tải được từ MangaDex
     
-    manga_folder = f"{OUTPUT_DIR}/{manga_id}"
-    os.makedirs(manga_folder, exist_ok=True)
-    os.makedirs(f"{manga_folder}/chapters", exist_ok=True)
+    Dữ liệu mẫu cũng được dựng trong một bản phát hành staging rồi công bố atomic như download_manga.
+    """
+    print(f"Tạo dữ liệu mẫu cho truyện {manga_data['title']}")
     
-    # Tạo ảnh bìa mẫu
+    release = StagedRelease(OUTPUT_DIR, manga_id).begin()
     try:
+        os.makedirs(f"{release.dir}/chapters", exist_ok=True)
+        
+        # Tạo ảnh bìa mẫu
         cover_url = f"https://picsum.photos/800/1200?random={random.randint(1, 1000)}"
-        cover_data = requests.get(cover_url).content
-        with open(f"{manga_folder}/cover.jpg", 'wb') as f:
-            f.write(cover_data)
-    except:
-        print("Không thể tạo ảnh bìa mẫu")
-    
-    # Tạo thông tin truyện
-    manga_info = create_manga_info(manga_id, manga_data)
-    manga_info["chapters"] = 10
-    
-    # Lưu thông tin truyện
-    with open(f"{manga_folder}/info.json", 'w', encoding='utf-8') as f:
-        json.dump(manga_info, f, ensure_ascii=False, indent=2)
-    
-    # Tạo các chương mẫu
-    chapters_info = create_sample_chapters(manga_id, 10)
-    
-    # Lưu thông tin các chương
-    with open(f"{manga_folder}/chapters.json", 'w', encoding='utf-8') as f:
-        json.dump(chapters_info, f, ensure_ascii=False, indent=2)
+        if not await fetcher.download(cover_url, f"{release.dir}/cover.jpg"):
+            print("Không thể tạo ảnh bìa mẫu")
+        
+        # Tạo các chương mẫu
+        chapters_info = await create_sample_chapters(manga_id, 10, fetcher, release.dir)
+        
+        # Tạo thông tin truyện
+        manga_info = create_manga_info(manga_id, manga_data)
+        manga_info["chapters"] = len(chapters_info)
+        manga_info["version"] = release.version
+        manga_info["preload"] = PRELOAD_PAGES
+        
+        # Lưu thông tin truyện và các chương
+        atomic_write_json(f"{release.dir}/info.json", manga_info, ensure_ascii=False, indent=2)
+        write_chapters_json(release.dir, manga_id, chapters_info, CHAPTERS_FORMAT)
+        write_preload_manifests(release.dir, manga_id, chapters_info, OUTPUT_DIR)
+        
+        release.publish()
+    except Exception:
+        release.abort()
+        raise
     
     print(f"Đã tạo dữ liệu mẫu cho truyện {manga_data['title']}")
 
-def create_sample_chapters(manga_id, num_chapters):
-    """Tạo các chương mẫu với ảnh từ picsum.photos"""
-    import requests
+async def create_sample_chapters(manga_id, num_chapters, fetcher, manga_folder=None):
+    """Tạo các chương mẫu với ảnh từ picsum.photos
     
+    Ảnh của mọi chương được tải song song qua fetcher (giới hạn tốc độ bằng token bucket).
+    manga_folder: thư mục ghi ảnh (mặc định thư mục của truyện, hoặc thư mục staging khi dựng bản mới).
+    """
     chapters_info = []
+    downloads = []
+    manga_folder = manga_folder or f"{OUTPUT_DIR}/{manga_id}"
     
     for chapter_number in range(1, num_chapters + 1):
-        chapter_folder = f"{OUTPUT_DIR}/{manga_id}/chapters/{chapter_number}"
+        chapter_folder = f"{manga_folder}/chapters/{chapter_number}"
         os.makedirs(chapter_folder, exist_ok=True)
         
         # Tạo các ảnh mẫu
@@ -201,16 +331,9 @@ def create_sample_chapters(manga_id, num_chapters):
             img_path = f"{chapter_folder}/{img_idx:03d}.jpg"
             image_paths.append(f"/data/manga/{manga_id}/chapters/{chapter_number}/{img_idx:03d}.jpg")
             
-            # Kiểm tra xem ảnh đã tồn tại chưa
-            if not os.path.exists(img_path):
-                try:
-                    img_url = f"https://picsum.photos/800/1200?random={random.randint(1, 10000)}"
-                    img_data = requests.get(img_url).content
-                    with open(img_path, 'wb') as f:
-                        f.write(img_data)
-                    time.sleep(0.2)  # Tránh gửi quá nhiều request
-                except Exception as e:
-                    print(f"Lỗi khi tạo ảnh mẫu: {e}")
+            # Ảnh đã tồn tại sẽ được fetcher bỏ qua
+            img_url = f"https://picsum.photos/800/1200?random={random.randint(1, 10000)}"
+            downloads.append((img_url, img_path))
         
         # Tạo thông tin chương
         chapter_info = {
@@ -225,8 +348,26 @@ def create_sample_chapters(manga_id, num_chapters):
         
         chapters_info.append(chapter_info)
     
+    results = await fetcher.download_many(downloads)
+    if not all(results):
+        print(f"Lỗi khi tạo {results.count(False)} ảnh mẫu")
+    
     return chapters_info
 
+async def download_all(manga_items):
+    """Tải nhiều truyện song song, dùng chung một connection pool"""
+    from manga_fetcher import AsyncFetcher
+    
+    semaphore = asyncio.Semaphore(SERIES_CONCURRENCY)
+    
+    async with AsyncFetcher(concurrency=FETCH_CONCURRENCY, rate=FETCH_RATE, retries=FETCH_RETRIES) as fetcher:
+        async def run(manga_id, manga_data):
+            async with semaphore:
+                await download_manga(manga_id, manga_data, fetcher)
+        
+        await asyncio.gather(*(run(manga_id, manga_data) for manga_id, manga_data in manga_items))
+        print(f"Thống kê tải ảnh: {fetcher.stats}")
+
 def main():
     # Tạo thư mục output nếu chưa tồn tại
     os.makedirs(OUTPUT_DIR, exist_ok=True)
@@ -239,16 +380,22 @@ def main():
         print("Đang cài đặt mangadex-downloader...")
         subprocess.run(["pip", "install", "mangadex-downloader"], check=True)
     
-    # Tải từng truyện
-    for manga_id, manga_data in MANGA_INFO.items():
-        download_manga(manga_id, manga_data)
+    # Tải các truyện song song
+    asyncio.run(download_all(MANGA_INFO.items()))
+    
+    # Cập nhật catalog.json (chỉ đọc lại các truyện có thay đổi)
+    stats = update_catalog(OUTPUT_DIR)
+    print(f"Đã cập nhật catalog: {stats['series']} truyện ({stats['read']} truyện được đọc lại)")
+    # Cập nhật chỉ mục tìm kiếm search.json (cũng chỉ đọc lại các truyện có thay đổi)
+    stats = update_search_index(OUTPUT_DIR)
+    print(f"Đã cập nhật chỉ mục tìm kiếm: {stats['docs']} truyện, {stats['terms']} từ khóa")
+    # Ghép ảnh bìa thành sprite sheet cho các trang danh sách (chỉ cắt lại ảnh bìa đã thay đổi)
+    stats = update_sprites(OUTPUT_DIR)
+    print(f"Đã cập nhật sprite ảnh bìa: {stats['sheets']} sheet ({stats['written']} sheet được ghi lại)")
 
 if __name__ == "__main__":
-    # Thêm thư viện requests nếu chưa có
-    try:
-        import requests
-    except ImportError:
-        subprocess.run(["pip", "install", "requests"], check=True)
-        import requests
+    # Thêm thư viện aiohttp nếu chưa có (manga_fetcher chỉ được import trong main())
+    if importlib.util.find_spec("aiohttp") is None:
+        subprocess.run([sys.executable, "-m", "pip", "install", "aiohttp"], check=True)
     
     main()
\ No newline at end of file
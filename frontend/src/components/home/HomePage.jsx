@@ -3,6 +3,7 @@ import { Link } from 'react-router-dom';
 import axios from 'axios';
 import { FaEye, FaHeart, FaBookmark, FaStar, FaChevronRight } from 'react-icons/fa';
 import MangaSection from './MangaSection';
+import SpriteCover from '../manga/SpriteCover';
 import HotStoriesSection from './HotStoriesSection';
 import MangaService from '../../services/MangaService';
 
@@ -227,7 +228,9 @@ const HomePage = () => {
               {completedStories.slice(0, 5).map((story) => (
                 <div key={story._id} className="bg-white rounded-lg shadow-md overflow-hidden">
                   <div className="relative">
-                    <img
+                    <SpriteCover
+                      mangaId={story._id}
+                      listing="completed"
                       src={story.thumbnail}
                       alt={story.title}
                       className="w-full h-56 object-cover"
@@ -13,6 +13,17 @@ const HotStoriesSection = () => {
   useEffect(() => {
     const fetchHotStories = async () => {
       try {
+        // Ưu tiên điểm trending tính sẵn (backend/scripts/rankings.py)
+        const trending = await MangaService.getTrending(5);
+        if (trending && trending.length > 0) {
+          // Truyện có thư mục manga thì mở trang đọc, còn lại mở trang chi tiết truyện
+          setHotStories(trending.map(story => ({
+            ...story,
+            link: story.folder ? `/manga/${story.folder}` : `/story/${story._id}`
+          })));
+          return;
+        }
+
         // Lấy tất cả truyện từ MangaService
         const allMangas = await MangaService.getMangas();
         console.log('Fetched all mangas for hot stories:', allMangas.length);
@@ -89,7 +100,7 @@ const HotStoriesSection = () => {
         {hotStories.map((story, index) => (
           <Link
             key={story._id}
-            to={`/manga/${story._id}`}
+            to={story.link || `/manga/${story._id}`}
             className="flex items-center bg-white bg-opacity-10 hover:bg-opacity-20 p-3 rounded-lg transition-all"
           >
             <div className="flex-shrink-0 relative">
@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
 import MangaService from '../../services/MangaService';
+import SpriteCover from '../manga/SpriteCover';
 import { FaEye, FaHeart, FaStar, FaBookOpen } from 'react-icons/fa';
 
 /**
@@ -89,7 +90,8 @@ const MangaSection = ({ title, subtitle }) => {
         {mangas.map((manga) => (
           <div key={manga._id} className="bg-white border rounded-lg overflow-hidden hover:shadow-md transition-shadow">
             <Link to={`/manga/${manga._id}`} className="block relative">
-              <img
+              <SpriteCover
+                mangaId={manga._id}
                 src={manga.thumbnail || '/images/default-manga-cover.svg'}
                 alt={manga.title}
                 className="w-full h-56 object-cover"
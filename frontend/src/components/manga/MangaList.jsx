@@ -2,6 +2,8 @@ import React, { useState, useEffect, useCallback } from 'react';
 import { Link } from 'react-router-dom';
 import { FaEye, FaStar, FaBookOpen } from 'react-icons/fa';
 import MangaService from '../../services/MangaService';
+import SpriteCover from './SpriteCover';
+import { genreListing } from '../../services/coverSprites';
 
 /**
  * Component hiển thị danh sách manga với phân trang và tải theo yêu cầu
@@ -423,7 +425,9 @@ const MangaList = () => {
                     </div>
                   )}
                   
-                  <img
+                  <SpriteCover
+                    mangaId={manga._id}
+                    listing={selectedGenre ? genreListing(selectedGenre) : 'all'}
                     src={manga.thumbnail || '/images/default-manga-cover.svg'}
                     alt={manga.title}
                     className={`absolute inset-0 w-full h-full object-cover transition-opacity duration-300 ${loadedImages[manga._id] ? 'opacity-100' : 'opacity-0'}`}
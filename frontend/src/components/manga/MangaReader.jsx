@@ -2,6 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import { Document, Page, pdfjs } from 'react-pdf';
 import MangaService from '../../services/MangaService';
+import { prefetchNextChapter, resolvePreloaded } from '../../services/chapterPreload';
 import { FaArrowLeft, FaArrowRight, FaList, FaHome, FaDownload } from 'react-icons/fa';
 import { Link } from 'react-router-dom';
 import MangaSlideshow from '../reader/MangaSlideshow';
@@ -99,6 +100,13 @@ const MangaReader = () => {
     fetchData();
   }, [mangaId, chapterNumber]);
 
+  // Tải trước các ảnh đầu của chương kế tiếp khi chương hiện tại đã sẵn sàng
+  useEffect(() => {
+    if (manga && chapter?.images) {
+      prefetchNextChapter(manga, mangaId, chapter.number);
+    }
+  }, [manga, chapter, mangaId]);
+
   // Xử lý khi PDF được tải
   const onDocumentLoadSuccess = ({ numPages }) => {
     setNumPages(numPages);
@@ -289,7 +297,7 @@ const MangaReader = () => {
             </div>
           ) : isImages ? (
             <MangaSlideshow
-              images={chapter.images}
+              images={chapter.images.map(resolvePreloaded)}
               title={`${manga.title} - ${chapter.title || `Chương ${chapter.number}`}`}
               onClose={() => navigate(`/manga/${mangaId}`)}
               chapters={chapters}
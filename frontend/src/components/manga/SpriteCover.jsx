@@ -0,0 +1,51 @@
+import React, { useState, useEffect } from 'react';
+import { loadSpriteMap, spriteCover } from '../../services/coverSprites';
+
+/**
+ * SpriteCover - Ảnh bìa lấy từ sprite sheet của danh sách, nếu có
+ *
+ * viewBox của SVG cắt đúng ô ảnh bìa trong sheet, "slice" phủ kín khung giống object-cover.
+ * Truyện chưa có trong sprite (hoặc chưa có sprite) thì dùng thẻ <img> như cũ. Trong lúc chờ
+ * bản đồ sprite chỉ hiện khung trống, để không tải ảnh bìa gốc một cách thừa.
+ */
+const SpriteCover = ({ mangaId, listing = 'all', src, alt, className = '', onLoad, onError, ...imgProps }) => {
+  // undefined: đang tải bản đồ sprite, null: không có trong sprite
+  const [cover, setCover] = useState(undefined);
+
+  useEffect(() => {
+    let active = true;
+    loadSpriteMap(listing).then(map => {
+      if (active) setCover(spriteCover(map, mangaId));
+    });
+    return () => {
+      active = false;
+    };
+  }, [listing, mangaId]);
+
+  useEffect(() => {
+    // Ô sprite được hiển thị ngay khi có bản đồ: báo cho component cha như khi ảnh tải xong
+    if (cover && onLoad) onLoad();
+  }, [cover]); // eslint-disable-line react-hooks/exhaustive-deps
+
+  if (cover === undefined) {
+    return <div className={className} aria-label={alt} />;
+  }
+
+  if (!cover) {
+    return <img src={src} alt={alt} className={className} onLoad={onLoad} onError={onError} {...imgProps} />;
+  }
+
+  return (
+    <svg
+      role="img"
+      aria-label={alt}
+      className={className}
+      viewBox={`${cover.x} ${cover.y} ${cover.width} ${cover.height}`}
+      preserveAspectRatio="xMidYMid slice"
+    >
+      <image href={cover.src} width={cover.sheetWidth} height={cover.sheetHeight} />
+    </svg>
+  );
+};
+
+export default SpriteCover;
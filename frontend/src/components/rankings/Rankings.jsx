@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
 import axios from 'axios';
+import MangaService from '../../services/MangaService';
 import { FaEye, FaHeart, FaStar, FaChartLine, FaCalendarAlt, FaBookOpen } from 'react-icons/fa';
 
 /**
@@ -19,6 +20,13 @@ const Rankings = () => {
     const fetchStories = async () => {
       setLoading(true);
       try {
+        // Ưu tiên bảng xếp hạng tính sẵn (backend/scripts/rankings.py)
+        const ranked = await MangaService.getRankings(activeTab, timeRange);
+        if (ranked && ranked.length > 0) {
+          setStories(ranked);
+          return;
+        }
+
         const response = await axios.get(`${API_URL}stories/rankings`, {
           params: { type: activeTab, timeRange }
         });
@@ -271,7 +279,7 @@ const Rankings = () => {
                     </span>
                     <span className="flex items-center mr-3">
                       <FaHeart className="mr-1 text-red-500" />
-                      {formatNumber(story.likes)}
+                      {formatNumber(story.likes || 0)}
                     </span>
                     <span className="flex items-center mr-3">
                       <FaStar className="mr-1 text-yellow-500" />
@@ -284,14 +292,14 @@ const Rankings = () => {
                   </div>
                   <div className="flex items-center text-xs">
                     <span className="px-2 py-0.5 bg-blue-100 text-blue-800 rounded-full mr-2">
-                      {story.genre}
+                      {story.genre || story.genres?.[0]}
                     </span>
                     <span className={`px-2 py-0.5 rounded-full ${
-                      story.status === 'completed' 
+                      story.status === 'completed' || story.status === 'Hoàn thành'
                         ? 'bg-green-100 text-green-800' 
                         : 'bg-yellow-100 text-yellow-800'
                     }`}>
-                      {story.status === 'completed' ? 'Hoàn thành' : 'Đang tiến hành'}
+                      {story.status === 'completed' || story.status === 'Hoàn thành' ? 'Hoàn thành' : 'Đang tiến hành'}
                     </span>
                   </div>
                 </div>
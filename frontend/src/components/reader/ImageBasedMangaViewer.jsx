@@ -3,6 +3,7 @@ import { useNavigate } from 'react-router-dom';
 import { FaArrowLeft, FaArrowRight, FaHome, FaList, FaChevronUp, FaPlay, FaImages } from 'react-icons/fa';
 import { motion, AnimatePresence } from 'framer-motion';
 import MangaSlideshow from './MangaSlideshow';
+import { pageLayoutProps } from '../../services/pagePlaceholder';
 
 /**
  * ImageBasedMangaViewer - Component để hiển thị truyện tranh dạng hình ảnh
@@ -361,14 +362,16 @@ const ImageBasedMangaViewer = ({
             {/* Hiển thị các ảnh đã tải */}
             {visibleImages.map((image, index) => {
               const imageSrc = typeof image === 'string' ? image : image.url;
+              // Kích thước + placeholder của trang (nếu chapters.json có) để giữ chỗ đúng tỉ lệ
+              const layoutProps = pageLayoutProps(currentChapter, images.indexOf(image));
               return (
                 <div key={index} className="flex justify-center mb-4 relative">
                   {/* Placeholder trước khi hình ảnh tải xong */}
                   <div
                     className="absolute inset-0 bg-gray-200 animate-pulse rounded shadow-lg"
                     style={{
-                      minHeight: '300px',
-                      aspectRatio: '2/3',
+                      minHeight: layoutProps.width ? undefined : '300px',
+                      aspectRatio: layoutProps.width ? `${layoutProps.width}/${layoutProps.height}` : '2/3',
                       display: 'flex',
                       alignItems: 'center',
                       justifyContent: 'center'
@@ -385,6 +388,7 @@ const ImageBasedMangaViewer = ({
                     src={imageSrc}
                     alt={`Trang ${index + 1}`}
                     className="max-w-full rounded shadow-lg relative z-10"
+                    {...layoutProps}
                     loading="lazy" // Sử dụng lazy loading cho tất cả ảnh
                     decoding="async" // Giải mã hình ảnh không đồng bộ
                     fetchpriority={index < 3 ? "high" : "auto"} // Chỉ ưu tiên 3 ảnh đầu tiên
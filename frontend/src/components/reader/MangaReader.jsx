@@ -2,6 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { Link, useParams, useNavigate } from 'react-router-dom';
 import { FaHome, FaList, FaArrowLeft, FaArrowRight, FaBookmark, FaComments, FaCog, FaTrash, FaSync } from 'react-icons/fa';
 import MangaService from '../../services/MangaService';
+import { pageLayoutProps } from '../../services/pagePlaceholder';
 
 /**
  * MangaReader - Component để đọc truyện
@@ -455,6 +456,7 @@ const MangaReader = (props) => {
                 src={image}
                 alt={`Page ${index + 1}`}
                 className="mx-auto max-w-full"
+                {...pageLayoutProps(chapter, index)} // Kích thước + placeholder từ chapters.json, tránh nhảy bố cục
                 loading={index < 3 ? "eager" : "lazy"} // Tải ngay 3 trang đầu tiên
                 decoding="async" // Giải mã hình ảnh không đồng bộ
                 onError={(e) => {
@@ -3,12 +3,14 @@ import axios from 'axios';
 import { toast } from 'react-toastify';
 import { useSearchParams } from 'react-router-dom';
 import MangaService from '../../services/MangaService';
+import { loadSearchIndex } from '../../services/searchIndex';
 import StoryFilterContext from '../../patterns/StoryFilterContext';
 import {
   GenreFilterStrategy,
   StatusFilterStrategy,
   TypeFilterStrategy,
   SearchFilterStrategy,
+  IndexedSearchFilterStrategy,
   DateFilterStrategy,
   ViewsFilterStrategy
 } from '../../patterns/StoryFilterStrategy';
@@ -22,6 +24,8 @@ const AdvancedFilter = () => {
   const [filteredStories, setFilteredStories] = useState([]);
   const [loading, setLoading] = useState(false);
   const [genres, setGenres] = useState([]);
+  // Chỉ mục search.json, chỉ dùng khi nó chứa mọi truyện trong danh sách
+  const [searchIndex, setSearchIndex] = useState(null);
   const [searchParams] = useSearchParams();
   const [filterCriteria, setFilterCriteria] = useState({
     genre: '',
@@ -80,6 +84,10 @@ const AdvancedFilter = () => {
 
         setStories(processedData);
         setFilteredStories(processedData);
+
+        const index = await loadSearchIndex();
+        const indexedIds = new Set(index ? index.docs.map(doc => doc._id) : []);
+        setSearchIndex(index && processedData.every(manga => indexedIds.has(manga._id)) ? index : null);
       } else {
         console.error('AdvancedFilter: Data is not an array:', data);
         toast.error('Không thể lấy danh sách truyện');
@@ -193,20 +201,25 @@ const AdvancedFilter = () => {
     const filterContext = new StoryFilterContext();
 
     // Thêm các chiến lược lọc dựa trên tiêu chí đã chọn
-    if (filterCriteria.genre) {
-      filterContext.addStrategy(new GenreFilterStrategy());
-    }
+    if (searchIndex && (filterCriteria.search || filterCriteria.genre || filterCriteria.status || filterCriteria.type)) {
+      // Từ khóa, thể loại, trạng thái và loại truyện được tra trong chỉ mục một lần
+      filterContext.addStrategy(new IndexedSearchFilterStrategy(searchIndex));
+    } else {
+      if (filterCriteria.genre) {
+        filterContext.addStrategy(new GenreFilterStrategy());
+      }
 
-    if (filterCriteria.status) {
-      filterContext.addStrategy(new StatusFilterStrategy());
-    }
+      if (filterCriteria.status) {
+        filterContext.addStrategy(new StatusFilterStrategy());
+      }
 
-    if (filterCriteria.type) {
-      filterContext.addStrategy(new TypeFilterStrategy());
-    }
+      if (filterCriteria.type) {
+        filterContext.addStrategy(new TypeFilterStrategy());
+      }
 
-    if (filterCriteria.search) {
-      filterContext.addStrategy(new SearchFilterStrategy());
+      if (filterCriteria.search) {
+        filterContext.addStrategy(new SearchFilterStrategy());
+      }
     }
 
     if (filterCriteria.startDate || filterCriteria.endDate) {
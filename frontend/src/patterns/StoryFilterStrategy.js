@@ -1,3 +1,5 @@
+import { foldText, searchIndex } from '../services/searchIndex';
+
 /**
  * StoryFilterStrategy - Lớp cơ sở cho các chiến lược lọc truyện
  * Triển khai Strategy Pattern
@@ -89,16 +91,47 @@ export class SearchFilterStrategy extends StoryFilterStrategy {
       return stories;
     }
     
-    const searchLower = criteria.search.toLowerCase();
+    // So khớp không dấu: "hanh dong" khớp "Hành động"
+    const searchFolded = foldText(criteria.search);
     
     return stories.filter(story => 
-      (story.title && story.title.toLowerCase().includes(searchLower)) || 
-      (story.author && story.author.toLowerCase().includes(searchLower)) ||
-      (story.description && story.description.toLowerCase().includes(searchLower))
+      (story.title && foldText(story.title).includes(searchFolded)) || 
+      (story.author && foldText(story.author).includes(searchFolded)) ||
+      (story.description && foldText(story.description).includes(searchFolded))
     );
   }
 }
 
+/**
+ * IndexedSearchFilterStrategy - Chiến lược lọc theo từ khóa, thể loại, trạng thái và loại truyện
+ * bằng chỉ mục search.json (backend/scripts/search_index.py) thay vì duyệt toàn bộ danh sách
+ */
+export class IndexedSearchFilterStrategy extends StoryFilterStrategy {
+  /**
+   * @param {Object} index - Chỉ mục tìm kiếm từ loadSearchIndex()
+   */
+  constructor(index) {
+    super();
+    this.index = index;
+  }
+
+  /**
+   * Lọc truyện theo chỉ mục, sắp xếp theo mức độ phù hợp
+   * @param {Array} stories - Danh sách truyện cần lọc
+   * @param {Object} criteria - Tiêu chí lọc
+   * @returns {Array} Danh sách truyện đã lọc
+   */
+  filter(stories, criteria) {
+    const facets = { genres: criteria.genre, status: criteria.status, type: criteria.type };
+    const docs = searchIndex(this.index, criteria.search || '', facets, Infinity);
+    const rank = new Map(docs.map((doc, i) => [doc._id, i]));
+
+    return stories
+      .filter(story => rank.has(story._id))
+      .sort((a, b) => rank.get(a._id) - rank.get(b._id));
+  }
+}
+
 /**
  * DateFilterStrategy - Chiến lược lọc theo ngày tạo
  */
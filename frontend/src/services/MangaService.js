@@ -1,3 +1,5 @@
+import { expandChapters, loadChapterImages } from './chapterManifest';
+
 const API_URL = process.env.REACT_APP_API_URL || 'http://localhost:5001/api/';
 const isDev = process.env.NODE_ENV === 'development';
 const log = (...args) => isDev && console.log(...args);
@@ -67,6 +69,14 @@ const clearMangaCache = (mangaId) => {
   }
 };
 
+// catalog.json (backend/scripts/catalog_index.py): danh sách mọi truyện và chỉ mục thể loại/tag
+// trong một file, thay cho việc đọc info.json của từng truyện. Chỉ tải một lần mỗi phiên.
+let catalogPromise = null;
+
+// Bảng xếp hạng tính sẵn (backend/scripts/rankings.py): day/week/month/all.json,
+// trending.json và genres.json trong /data/rankings
+const rankingPromises = {};
+
 // Tự động xóa cache cho truyện Cưa Thủ khi trang được tải
 (function clearCuaThuCache() {
   try {
@@ -80,52 +90,77 @@ const clearMangaCache = (mangaId) => {
   }
 })();
 
+// Hậu tố mã bản phát hành của truyện (trường "version" trong info.json, lấy qua catalog.json).
+// Khóa cache gắn với mã này nên một lần import mới tự làm cũ cache, không cần xóa thủ công
+const releaseSuffix = async (id) => {
+  const catalog = await MangaService.getCatalog();
+  const entry = catalog?.series.find(manga => manga._id === id);
+  return entry?.version ? `@${entry.version}` : '';
+};
+
 export const MangaService = {
   // Xóa cache cho một manga cụ thể
   clearCache(mangaId) {
     clearMangaCache(mangaId);
   },
-  // Lấy danh sách truyện
-  async getMangas() {
-    try {
-      log('Fetching manga list...');
-      const directories = await this.scanMangaDirectories();
-      const mangaPromises = directories.map(async dir => {
-        try {
-          const info = await fetch(`/data/manga/${dir}/info.json`);
-          if (info.ok) {
-            const mangaInfo = await info.json();
-            return { ...mangaInfo, _id: mangaInfo._id || dir };
-          }
+  // Lấy catalog.json, trả về null nếu chưa có
+  async getCatalog() {
+    if (!catalogPromise) {
+      catalogPromise = fetch('/data/manga/catalog.json', { cache: 'no-cache' })
+        .then(response => (response.ok ? response.json() : null))
+        .then(catalog => (catalog && Array.isArray(catalog.series) ? catalog : null))
+        .catch(() => null);
+    }
+    const catalog = await catalogPromise;
+    if (!catalog) {
+      // Cho phép thử lại ở lần gọi sau
+      catalogPromise = null;
+    }
+    return catalog;
+  },
 
-          let thumbnail = null;
-          const coverFormats = ['png', 'jpg'];
-          for (const format of coverFormats) {
-            const coverResponse = await fetch(`/data/manga/${dir}/cover.${format}`, { method: 'HEAD' });
-            if (coverResponse.ok) {
-              thumbnail = `/data/manga/${dir}/cover.${format}`;
-              break;
-            }
-          }
+  // Lấy một file bảng xếp hạng tính sẵn (vd. 'week', 'trending'), trả về null nếu chưa có
+  async getRankingSnapshot(name) {
+    if (!rankingPromises[name]) {
+      rankingPromises[name] = fetch(`/data/rankings/${name}.json`, { cache: 'no-cache' })
+        .then(response => (response.ok ? response.json() : null))
+        .catch(() => null);
+    }
+    const snapshot = await rankingPromises[name];
+    if (!snapshot) {
+      delete rankingPromises[name];
+    }
+    return snapshot;
+  },
 
-          return {
-            _id: dir,
-            title: dir.charAt(0).toUpperCase() + dir.slice(1).replace(/_/g, ' '),
-            thumbnail: thumbnail || '/placeholder-image.jpg',
-            genre: 'Manga',
-            genres: ['Manga'],
-            status: 'Đang tiến hành',
-            description: `Truyện ${dir.replace(/_/g, ' ')}`,
-            chapters: 1
-          };
-        } catch (error) {
-          log(`Error loading manga from ${dir}:`, error);
-          return null;
-        }
-      });
+  // Bảng xếp hạng theo loại (views, likes, rating, ...) và khoảng thời gian (day, week, month, all)
+  async getRankings(type, timeRange = 'all') {
+    const snapshot = await this.getRankingSnapshot(timeRange);
+    return snapshot?.tables?.[type] || null;
+  },
+
+  // Truyện hot: điểm hoạt động giảm dần theo thời gian (đánh giá, bình luận, chương mới)
+  async getTrending(limit = 5) {
+    const snapshot = await this.getRankingSnapshot('trending');
+    return snapshot ? snapshot.series.slice(0, limit) : null;
+  },
 
-      const mangas = (await Promise.all(mangaPromises)).filter(manga => manga !== null);
+  // Lấy danh sách truyện theo thể loại (dùng chỉ mục trong catalog.json nếu có)
+  async getMangasByGenre(genre) {
+    const catalog = await this.getCatalog();
+    if (catalog) {
+      return (catalog.genres?.[genre] || []).map(index => catalog.series[index]);
+    }
+    const mangas = await this.getMangas();
+    return mangas.filter(manga => manga.genre === genre || manga.genres?.includes(genre));
+  },
 
+  // Lấy danh sách truyện
+  async getMangas() {
+    try {
+      log('Fetching manga list...');
+      const catalog = await this.getCatalog();
+      const mangas = catalog ? catalog.series : await this.loadMangasFromDirectories();
       const processedMangas = mangas.map(manga => ({
         ...manga,
         _id: manga._id || `manga-${Math.random().toString(36).substring(2, 11)}`,
@@ -147,6 +182,46 @@ export const MangaService = {
     }
   },
 
+  // Đọc info.json của từng thư mục truyện (khi chưa có catalog.json)
+  async loadMangasFromDirectories() {
+    const directories = await this.scanMangaDirectories();
+    const mangaPromises = directories.map(async dir => {
+      try {
+        const info = await fetch(`/data/manga/${dir}/info.json`);
+        if (info.ok) {
+          const mangaInfo = await info.json();
+          return { ...mangaInfo, _id: mangaInfo._id || dir };
+        }
+
+        let thumbnail = null;
+        const coverFormats = ['png', 'jpg'];
+        for (const format of coverFormats) {
+          const coverResponse = await fetch(`/data/manga/${dir}/cover.${format}`, { method: 'HEAD' });
+          if (coverResponse.ok) {
+            thumbnail = `/data/manga/${dir}/cover.${format}`;
+            break;
+          }
+        }
+
+        return {
+          _id: dir,
+          title: dir.charAt(0).toUpperCase() + dir.slice(1).replace(/_/g, ' '),
+          thumbnail: thumbnail || '/placeholder-image.jpg',
+          genre: 'Manga',
+          genres: ['Manga'],
+          status: 'Đang tiến hành',
+          description: `Truyện ${dir.replace(/_/g, ' ')}`,
+          chapters: 1
+        };
+      } catch (error) {
+        log(`Error loading manga from ${dir}:`, error);
+        return null;
+      }
+    });
+
+    return (await Promise.all(mangaPromises)).filter(manga => manga !== null);
+  },
+
   // Quét tất cả các thư mục trong /data/manga/
   async scanMangaDirectories() {
     // Kiểm tra cache
@@ -340,7 +415,8 @@ export const MangaService = {
   async getChapters(id) {
     try {
       // Kiểm tra cache
-      const cacheKey = `chapters_${id}`;
+      const release = await releaseSuffix(id);
+      const cacheKey = `chapters_${id}${release}`;
       const cachedChapters = getCache(cacheKey);
       if (cachedChapters) {
         log(`Using cached chapters for ${id}`);
@@ -445,7 +521,7 @@ export const MangaService = {
           }).catch(() => ({ ok: false }));
 
           if (chaptersJsonResponse.ok) {
-            const chaptersData = await (await fetch(`/data/manga/${id}/chapters.json`)).json();
+            const chaptersData = expandChapters(await (await fetch(`/data/manga/${id}/chapters.json`)).json());
             const processedChapters = chaptersData.map(chapter => ({
               ...chapter,
               id: chapter.id || `${id}-chapter-${chapter.number}`,
@@ -525,15 +601,16 @@ export const MangaService = {
         const controller = new AbortController();
         const timeoutId = setTimeout(() => controller.abort(), 2000);
 
-        const chapters = await fetch(`/data/manga/${id}/chapters.json`, {
+        // Có mã bản phát hành thì URL đã khác nhau giữa các bản, trình duyệt được phép cache
+        const chapters = await fetch(`/data/manga/${id}/chapters.json${release ? `?v=${release.slice(1)}` : ''}`, {
           signal: controller.signal,
-          cache: 'no-store'
+          cache: release ? 'default' : 'no-store'
         }).catch(() => ({ ok: false }));
 
         clearTimeout(timeoutId);
 
         if (chapters.ok) {
-          const chaptersData = await chapters.json();
+          const chaptersData = expandChapters(await chapters.json());
           const processedChapters = chaptersData.map(chapter => ({
             ...chapter,
             id: chapter.id || `${id}-chapter-${chapter.number}`,
@@ -803,7 +880,7 @@ export const MangaService = {
   async getChapter(mangaId, chapterNumber) {
     try {
       // Kiểm tra cache
-      const cacheKey = `chapter_content_${mangaId}_${chapterNumber}`;
+      const cacheKey = `chapter_content_${mangaId}_${chapterNumber}${await releaseSuffix(mangaId)}`;
       const cachedChapter = getCache(cacheKey);
       if (cachedChapter) {
         log(`Using cached chapter content for ${mangaId}/${chapterNumber}`);
@@ -1290,12 +1367,14 @@ export const MangaService = {
         clearTimeout(timeoutId);
 
         if (chapters.ok) {
-          const allChapters = await chapters.json();
-          const chapter = allChapters.find(ch =>
+          const allChapters = expandChapters(await chapters.json());
+          const entry = allChapters.find(ch =>
             ch.number === parseInt(chapterNumber) ||
             ch.id === chapterNumber ||
             ch.id === parseInt(chapterNumber)
           );
+          // chapters.json dạng "split": tải danh sách ảnh của riêng chương này
+          const chapter = entry && await loadChapterImages(entry, `/data/manga/${mangaId}/`);
 
           if (chapter) {
             // Xử lý đường dẫn ảnh và URL
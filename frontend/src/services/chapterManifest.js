@@ -0,0 +1,59 @@
+// Đọc chapters.json ở cả ba định dạng do backend/scripts/chapters_manifest.py ghi ra:
+// - "full": mảng chương với danh sách ảnh đầy đủ (định dạng cũ)
+// - "compact": object { v, format, id, base, chapters }, ảnh được mô tả bằng mẫu đường dẫn
+// - "split": như compact nhưng ảnh của mỗi chương nằm trong file riêng (chapter.src)
+
+// Dựng lại danh sách đường dẫn từ một mô tả { dir, pad, ext, start, count } hoặc { dir, files }
+export const expandPaths = (spec, base) => {
+  const dir = spec.dir.startsWith('/') ? spec.dir : `${base}${spec.dir}`;
+  if (spec.files) {
+    return spec.files.map(name => `${dir}${name}`);
+  }
+  return Array.from({ length: spec.count }, (_, i) =>
+    `${dir}${String(spec.start + i).padStart(spec.pad, '0')}${spec.ext}`
+  );
+};
+
+// Chuyển một chương dạng compact về dạng đầy đủ (images, variants, url)
+export const expandChapter = (entry, base) => {
+  const { img, variants, ...chapter } = entry;
+  if (!chapter.url) {
+    chapter.url = `${base}chapters/${entry.number}`;
+  }
+  if (img) {
+    chapter.images = expandPaths(img, base);
+  }
+  if (variants) {
+    chapter.variants = Object.fromEntries(
+      Object.entries(variants).map(([width, spec]) => [width, expandPaths(spec, base)])
+    );
+  }
+  if (chapter.src && !chapter.src.startsWith('/')) {
+    chapter.src = `${base}${chapter.src}`;
+  }
+  return chapter;
+};
+
+// Trả về mảng chương từ nội dung chapters.json (mọi định dạng).
+// Với định dạng "split", các chương chưa có images mà chỉ có src (xem loadChapterImages)
+export const expandChapters = (data) => {
+  if (Array.isArray(data)) {
+    return data;
+  }
+  if (!data || !Array.isArray(data.chapters)) {
+    return [];
+  }
+  return data.chapters.map(entry => expandChapter(entry, data.base));
+};
+
+// Tải file của một chương ở định dạng "split" nếu chương chưa có danh sách ảnh
+export const loadChapterImages = async (chapter, base) => {
+  if (chapter.images || !chapter.src) {
+    return chapter;
+  }
+  const response = await fetch(chapter.src);
+  if (!response.ok) {
+    return chapter;
+  }
+  return { ...chapter, ...expandChapter(await response.json(), base) };
+};
@@ -0,0 +1,87 @@
+// Tải trước chương kế tiếp trong lúc người đọc còn ở chương hiện tại.
+// Mỗi chương có chapters/<n>/preload.json (do backend/scripts/chapter_preload.py ghi ra) liệt kê
+// vài ảnh đầu của chương sau, ảnh nhỏ trước. Nếu có bundle, các ảnh đó được lấy bằng một request
+// Range duy nhất rồi cắt thành từng ảnh theo [offset, length, type].
+
+// Ảnh đã tải trước qua bundle: đường dẫn gốc -> object URL
+const preloaded = new Map();
+// Chương (mangaId/số chương) đã tải trước, để không tải lại
+const prefetched = new Set();
+// Số chương giữ lại object URL; các chương cũ hơn được giải phóng
+const MAX_PREFETCHED_CHAPTERS = 2;
+const chapterUrls = [];
+
+const fetchManifest = async (mangaId, chapterNumber) => {
+  try {
+    const response = await fetch(`/data/manga/${mangaId}/chapters/${chapterNumber}/preload.json`);
+    return response.ok ? await response.json() : null;
+  } catch {
+    return null;
+  }
+};
+
+// Giải phóng object URL của các chương đã tải trước từ lâu
+const releaseOldChapters = () => {
+  while (chapterUrls.length > MAX_PREFETCHED_CHAPTERS) {
+    const { key, urls } = chapterUrls.shift();
+    prefetched.delete(key);
+    urls.forEach(src => {
+      URL.revokeObjectURL(preloaded.get(src));
+      preloaded.delete(src);
+    });
+  }
+};
+
+// Một request Range cho các ảnh đầu của chương sau, cắt ra thành Blob
+const prefetchBundle = async (key, manifest) => {
+  const [start, end] = manifest.bundle.range;
+  const response = await fetch(manifest.bundle.src, { headers: { Range: `bytes=${start}-${end}` } });
+  if (!response.ok) throw new Error(`HTTP ${response.status}`);
+  const data = await response.blob();
+  // Máy chủ không hỗ trợ Range thì trả cả file (200): offset vẫn đúng vì range bắt đầu từ 0
+  const urls = manifest.bundle.pages.map(([offset, length, type], i) => {
+    const src = manifest.pages.find(page => page.page === i + 1)?.src;
+    if (src && !preloaded.has(src)) {
+      preloaded.set(src, URL.createObjectURL(data.slice(offset, offset + length, type)));
+    }
+    return src;
+  }).filter(Boolean);
+  chapterUrls.push({ key, urls });
+  releaseOldChapters();
+};
+
+// Không có bundle: để trình duyệt tải từng ảnh vào cache HTTP
+const prefetchImages = (manifest) => {
+  manifest.pages.forEach(page => {
+    const image = new Image();
+    image.decoding = 'async';
+    image.src = page.src;
+  });
+};
+
+/**
+ * Tải trước các ảnh đầu của chương kế tiếp
+ * @param {Object} manga - Thông tin truyện (info.json); bỏ qua nếu truyện không có preload
+ * @param {string} mangaId - ID (thư mục) của truyện
+ * @param {number} chapterNumber - Số chương đang đọc
+ */
+export const prefetchNextChapter = async (manga, mangaId, chapterNumber) => {
+  const key = `${mangaId}/${chapterNumber}`;
+  if (!manga?.preload || prefetched.has(key)) return;
+  prefetched.add(key);
+
+  const manifest = await fetchManifest(mangaId, chapterNumber);
+  if (!manifest || !Array.isArray(manifest.pages)) return;
+  if (manifest.bundle) {
+    try {
+      await prefetchBundle(key, manifest);
+      return;
+    } catch (error) {
+      console.warn('Không tải được bundle, tải từng ảnh:', error);
+    }
+  }
+  prefetchImages(manifest);
+};
+
+// Đường dẫn dùng để hiển thị một ảnh: object URL nếu đã tải trước qua bundle
+export const resolvePreloaded = (src) => preloaded.get(src) || src;
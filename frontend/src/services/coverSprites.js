@@ -0,0 +1,38 @@
+// Sprite sheet ảnh bìa cho các trang danh sách (do backend/scripts/cover_sprites.py tạo trong
+// /data/manga/_sprites). Mỗi danh sách ("all", "completed", "genre-<tên bỏ dấu>") có một file
+// JSON ghi vị trí [sheet, x, y] của ảnh bìa từng truyện, nên cả trang chỉ tải một ảnh sheet.
+import { tokenize } from './searchIndex';
+
+const mapPromises = {};
+
+// Tên danh sách của một thể loại, bỏ dấu giống phía Python ("Hành động" -> "genre-hanh-dong")
+export const genreListing = (genre) => `genre-${tokenize(genre).join('-')}`;
+
+// Tải bản đồ sprite của một danh sách một lần mỗi phiên, trả về null nếu chưa có
+export const loadSpriteMap = async (listing = 'all') => {
+  if (!mapPromises[listing]) {
+    mapPromises[listing] = fetch(`/data/manga/_sprites/${listing}.json`, { cache: 'no-cache' })
+      .then(response => (response.ok ? response.json() : null))
+      .then(map => (map && map.series ? map : null))
+      .catch(() => null);
+  }
+  const map = await mapPromises[listing];
+  if (!map) {
+    delete mapPromises[listing];
+  }
+  return map;
+};
+
+/**
+ * Vị trí ảnh bìa của một truyện trong sprite sheet
+ * @param {Object} map - Bản đồ từ loadSpriteMap()
+ * @param {string} mangaId - ID (thư mục) của truyện
+ * @returns {Object|null} { src, sheetWidth, sheetHeight, x, y, width, height } hoặc null
+ */
+export const spriteCover = (map, mangaId) => {
+  const position = map?.series?.[mangaId];
+  if (!position) return null;
+  const [sheet, x, y] = position;
+  const { src, size } = map.sheets[sheet];
+  return { src, sheetWidth: size[0], sheetHeight: size[1], x, y, width: map.tile[0], height: map.tile[1] };
+};
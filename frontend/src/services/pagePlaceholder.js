@@ -0,0 +1,114 @@
+// Giải mã placeholder BlurHash của trang (do backend/scripts/page_metadata.py ghi vào chapters.json)
+// thành ảnh data URL nhỏ, dùng làm nền mờ trong lúc ảnh thật đang tải.
+
+const BASE83 = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~';
+const DECODE_SIZE = 32;
+const cache = new Map();
+
+const decode83 = (str) => {
+  let value = 0;
+  for (const char of str) {
+    value = value * 83 + BASE83.indexOf(char);
+  }
+  return value;
+};
+
+const srgbToLinear = (value) => {
+  const v = value / 255;
+  return v <= 0.04045 ? v / 12.92 : Math.pow((v + 0.055) / 1.055, 2.4);
+};
+
+const linearToSrgb = (value) => {
+  const v = Math.max(0, Math.min(1, value));
+  return v <= 0.0031308
+    ? Math.round(v * 12.92 * 255)
+    : Math.round((1.055 * Math.pow(v, 1 / 2.4) - 0.055) * 255);
+};
+
+const signPow = (value, exp) => Math.sign(value) * Math.pow(Math.abs(value), exp);
+
+// Giải mã BlurHash thành mảng RGBA kích thước width x height
+export const decodeBlurhash = (hash, width, height) => {
+  const sizeFlag = decode83(hash[0]);
+  const numX = (sizeFlag % 9) + 1;
+  const numY = Math.floor(sizeFlag / 9) + 1;
+  const maxValue = (decode83(hash[1]) + 1) / 166;
+
+  const colors = [];
+  const dc = decode83(hash.substring(2, 6));
+  colors.push([srgbToLinear(dc >> 16), srgbToLinear((dc >> 8) & 255), srgbToLinear(dc & 255)]);
+  for (let i = 1; i < numX * numY; i++) {
+    const value = decode83(hash.substring(4 + i * 2, 6 + i * 2));
+    colors.push([
+      signPow((Math.floor(value / (19 * 19)) - 9) / 9, 2) * maxValue,
+      signPow(((Math.floor(value / 19) % 19) - 9) / 9, 2) * maxValue,
+      signPow(((value % 19) - 9) / 9, 2) * maxValue
+    ]);
+  }
+
+  const pixels = new Uint8ClampedArray(width * height * 4);
+  for (let y = 0; y < height; y++) {
+    for (let x = 0; x < width; x++) {
+      let r = 0;
+      let g = 0;
+      let b = 0;
+      for (let j = 0; j < numY; j++) {
+        for (let i = 0; i < numX; i++) {
+          const basis = Math.cos((Math.PI * x * i) / width) * Math.cos((Math.PI * y * j) / height);
+          const color = colors[i + j * numX];
+          r += color[0] * basis;
+          g += color[1] * basis;
+          b += color[2] * basis;
+        }
+      }
+      const offset = 4 * (x + y * width);
+      pixels[offset] = linearToSrgb(r);
+      pixels[offset + 1] = linearToSrgb(g);
+      pixels[offset + 2] = linearToSrgb(b);
+      pixels[offset + 3] = 255;
+    }
+  }
+  return pixels;
+};
+
+// Trả về data URL của placeholder (có cache), hoặc null nếu không có/không giải mã được
+export const placeholderUrl = (hash) => {
+  if (!hash || hash.length < 6) {
+    return null;
+  }
+  if (cache.has(hash)) {
+    return cache.get(hash);
+  }
+  let url = null;
+  try {
+    const canvas = document.createElement('canvas');
+    canvas.width = DECODE_SIZE;
+    canvas.height = DECODE_SIZE;
+    const context = canvas.getContext('2d');
+    const imageData = context.createImageData(DECODE_SIZE, DECODE_SIZE);
+    imageData.data.set(decodeBlurhash(hash, DECODE_SIZE, DECODE_SIZE));
+    context.putImageData(imageData, 0, 0);
+    url = canvas.toDataURL();
+  } catch (error) {
+    url = null;
+  }
+  cache.set(hash, url);
+  return url;
+};
+
+// Thuộc tính giữ chỗ cho trang thứ index của chương: width/height để trình duyệt
+// dành sẵn khung ảnh (không nhảy bố cục khi lazy load) và style nền mờ nếu có placeholder
+export const pageLayoutProps = (chapter, index) => {
+  const size = chapter?.dimensions?.[index];
+  const placeholder = placeholderUrl(chapter?.placeholders?.[index]);
+  const props = {};
+  if (size) {
+    props.width = size[0];
+    props.height = size[1];
+    props.style = { height: 'auto' };
+  }
+  if (placeholder) {
+    props.style = { ...props.style, backgroundImage: `url(${placeholder})`, backgroundSize: '100% 100%' };
+  }
+  return props;
+};
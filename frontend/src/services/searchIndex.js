@@ -0,0 +1,144 @@
+// Tìm kiếm trên chỉ mục search.json (do backend/scripts/search_index.py tạo, nằm cạnh catalog.json).
+// Từ khóa được bỏ dấu giống hệt phía Python ("Hành động" -> "hanh dong"), nên gõ có dấu hay
+// không dấu đều ra cùng kết quả. Từ cuối của câu tìm được hiểu là tiền tố (gõ tới đâu gợi ý tới đó).
+
+const MIN_GRAM_TOKEN = 3;
+const GRAM_SIZE = 3;
+// Số từ khóa tối đa khi mở rộng một tiền tố (tiền tố quá ngắn khớp rất nhiều từ)
+const MAX_PREFIX_TERMS = 64;
+
+let indexPromise = null;
+
+// Bỏ dấu tiếng Việt và chuyển về chữ thường
+export const foldText = (text) =>
+  String(text || '')
+    .normalize('NFD')
+    .replace(/[\u0300-\u036f]/g, '')
+    .replace(/đ/g, 'd')
+    .replace(/Đ/g, 'D')
+    .toLowerCase();
+
+export const tokenize = (text) => foldText(text).match(/[a-z0-9]+/g) || [];
+
+// Tải search.json một lần mỗi phiên, trả về null nếu chưa có
+export const loadSearchIndex = async () => {
+  if (!indexPromise) {
+    indexPromise = fetch('/data/manga/search.json', { cache: 'no-cache' })
+      .then(response => (response.ok ? response.json() : null))
+      // bitmaps: bộ nhớ đệm các bitmap facet đã giải mã
+      .then(index => (index && Array.isArray(index.terms) ? { ...index, bitmaps: {} } : null))
+      .catch(() => null);
+  }
+  const index = await indexPromise;
+  if (!index) {
+    indexPromise = null;
+  }
+  return index;
+};
+
+// Vị trí đầu tiên trong mảng terms (đã sắp xếp) không nhỏ hơn value
+const lowerBound = (terms, value) => {
+  let low = 0;
+  let high = terms.length;
+  while (low < high) {
+    const mid = (low + high) >> 1;
+    if (terms[mid] < value) low = mid + 1;
+    else high = mid;
+  }
+  return low;
+};
+
+// Các từ khóa bắt đầu bằng prefix
+const prefixTerms = (index, prefix) => {
+  const positions = [];
+  for (let i = lowerBound(index.terms, prefix); i < index.terms.length && positions.length < MAX_PREFIX_TERMS; i++) {
+    if (!index.terms[i].startsWith(prefix)) break;
+    positions.push(i);
+  }
+  return positions;
+};
+
+// Các từ khóa chứa token ở giữa từ (giao các danh sách trigram rồi kiểm tra lại)
+const infixTerms = (index, token) => {
+  if (token.length < MIN_GRAM_TOKEN || !index.grams) return [];
+  let candidates = null;
+  for (let i = 0; i + GRAM_SIZE <= token.length; i++) {
+    const list = index.grams[token.slice(i, i + GRAM_SIZE)];
+    if (!list) return [];
+    candidates = candidates ? candidates.filter(position => list.includes(position)) : list;
+  }
+  return candidates.filter(position => index.terms[position].includes(token)).slice(0, MAX_PREFIX_TERMS);
+};
+
+// Điểm theo tài liệu của một từ khóa: giải mã postings [chênh lệch số tài liệu, điểm, ...]
+const addPostings = (index, position, scores) => {
+  const flat = index.postings[position];
+  let doc = 0;
+  for (let i = 0; i < flat.length; i += 2) {
+    doc += flat[i];
+    scores.set(doc, Math.max(scores.get(doc) || 0, flat[i + 1]));
+  }
+};
+
+// Bitmap của một giá trị facet (genres/status/type), giải mã base64 một lần
+const facetBitmap = (index, field, value) => {
+  const key = `${field}\u0000${value}`;
+  if (!(key in index.bitmaps)) {
+    const encoded = index.facets?.[field]?.[value];
+    index.bitmaps[key] = encoded ? Uint8Array.from(atob(encoded), char => char.charCodeAt(0)) : null;
+  }
+  return index.bitmaps[key];
+};
+
+const hasBit = (bitmap, doc) => (bitmap[doc >> 3] & (1 << (doc & 7))) !== 0;
+
+/**
+ * Tìm truyện trong chỉ mục
+ * @param {Object} index - Chỉ mục từ loadSearchIndex()
+ * @param {string} query - Câu tìm kiếm (có dấu hoặc không dấu)
+ * @param {Object} facets - Lọc theo { genres, status, type } (bỏ trống để không lọc)
+ * @param {number} limit - Số kết quả tối đa
+ * @returns {Array} Các tài liệu (docs) phù hợp, điểm cao nhất trước
+ */
+export const searchIndex = (index, query, facets = {}, limit = 50) => {
+  const tokens = tokenize(query);
+  const filters = Object.entries(facets)
+    .filter(([, value]) => value && value !== 'all')
+    .map(([field, value]) => facetBitmap(index, field, value));
+  if (filters.some(bitmap => !bitmap)) return [];
+
+  let scores = null;
+  tokens.forEach((token, i) => {
+    const isLast = i === tokens.length - 1;
+    const exact = lowerBound(index.terms, token);
+    let positions = index.terms[exact] === token ? [exact] : [];
+    if (isLast) positions = prefixTerms(index, token);
+    if (positions.length === 0) positions = infixTerms(index, token);
+
+    const tokenScores = new Map();
+    positions.forEach(position => addPostings(index, position, tokenScores));
+    if (scores === null) {
+      scores = tokenScores;
+    } else {
+      // Mọi từ trong câu tìm đều phải khớp
+      const merged = new Map();
+      scores.forEach((score, doc) => {
+        if (tokenScores.has(doc)) merged.set(doc, score + tokenScores.get(doc));
+      });
+      scores = merged;
+    }
+  });
+
+  if (scores === null) {
+    // Không có từ khóa: chỉ lọc theo facet
+    scores = new Map(index.docs.map((_, doc) => [doc, 0]));
+  }
+  return [...scores.entries()]
+    .filter(([doc]) => filters.every(bitmap => hasBit(bitmap, doc)))
+    .sort((a, b) => b[1] - a[1])
+    .slice(0, limit)
+    .map(([doc]) => index.docs[doc]);
+};
+
+// Gợi ý khi đang gõ: các truyện khớp với câu tìm hiện tại
+export const suggest = (index, query, limit = 8) => searchIndex(index, query, {}, limit);
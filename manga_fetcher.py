@@ -0,0 +1,192 @@
+"""
+Bộ tải ảnh bất đồng bộ (asyncio + aiohttp) dùng cho download_manga.py.
+
+- Một ClientSession dùng chung (connection pool, keep-alive) cho mọi request
+- Giới hạn số request đồng thời và tốc độ request bằng token bucket
+- Tự thử lại với backoff khi lỗi mạng, 429 hoặc 5xx
+- Ghi file qua file tạm rồi rename, bỏ qua file đã tồn tại
+
+Chạy benchmark với server giả lập cục bộ (không cần mạng):
+    python manga_fetcher.py --pages 500 --concurrency 16 --rate 0
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+import aiohttp
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+class TokenBucket:
+    """Token bucket: cho phép trung bình `rate` request/giây, tối đa `burst` request liền nhau."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        if not self.rate:
+            return
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class AsyncFetcher:
+    """Tải nhiều URL song song qua một connection pool dùng chung.
+
+    Dùng như async context manager:
+        async with AsyncFetcher(concurrency=8, rate=5) as fetcher:
+            await fetcher.download_many([(url, path), ...])
+    """
+
+    def __init__(self, concurrency=8, rate=5.0, burst=None, retries=3, backoff=0.5, timeout=30):
+        self.concurrency = concurrency
+        self.bucket = TokenBucket(rate, burst)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.session = None
+        self.stats = {"requests": 0, "bytes": 0, "retries": 0, "failures": 0, "skipped": 0}
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.concurrency)
+        self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.session.close()
+
+    async def fetch(self, url):
+        """Tải nội dung một URL (có thử lại), trả về bytes."""
+        for attempt in range(self.retries + 1):
+            await self.bucket.acquire()
+            try:
+                async with self.semaphore:
+                    self.stats["requests"] += 1
+                    async with self.session.get(url) as response:
+                        if response.status in RETRY_STATUSES and attempt < self.retries:
+                            retry_after = response.headers.get("Retry-After", "")
+                            delay = float(retry_after) if retry_after.isdigit() else None
+                            raise _RetryableStatus(response.status, delay)
+                        response.raise_for_status()
+                        data = await response.read()
+                        self.stats["bytes"] += len(data)
+                        return data
+            except (aiohttp.ClientError, asyncio.TimeoutError, _RetryableStatus) as e:
+                if attempt >= self.retries:
+                    raise
+                self.stats["retries"] += 1
+                delay = getattr(e, "delay", None) or self.backoff * (2 ** attempt)
+                await asyncio.sleep(delay * random.uniform(0.8, 1.2))
+
+    async def download(self, url, path):
+        """Tải URL vào file; bỏ qua nếu file đã tồn tại. Trả về True nếu thành công."""
+        if os.path.exists(path):
+            self.stats["skipped"] += 1
+            return True
+        try:
+            data = await self.fetch(url)
+        except Exception as e:
+            self.stats["failures"] += 1
+            print(f"Lỗi khi tải {url}: {e}")
+            return False
+
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        # mkstemp tạo file chỉ chủ sở hữu đọc được; trả lại quyền như file thường
+        os.chmod(temp_path, 0o666 & ~_UMASK)
+        os.replace(temp_path, path)
+        return True
+
+    async def download_many(self, jobs):
+        """Tải danh sách (url, path) song song, trả về danh sách kết quả True/False theo thứ tự."""
+        return await asyncio.gather(*(self.download(url, path) for url, path in jobs))
+
+class _RetryableStatus(Exception):
+    def __init__(self, status, delay=None):
+        super().__init__(f"HTTP {status}")
+        self.delay = delay
+
+async def _start_standin_server(page_size, latency, fail_rate):
+    """Server giả lập cục bộ trả về ảnh ngẫu nhiên, có độ trễ và lỗi 503 ngẫu nhiên."""
+    from aiohttp import web
+
+    payload = os.urandom(page_size)
+
+    async def handle(request):
+        if latency:
+            await asyncio.sleep(latency)
+        if fail_rate and random.random() < fail_rate:
+            return web.Response(status=503)
+        return web.Response(body=payload, content_type="image/jpeg")
+
+    app = web.Application()
+    app.router.add_get("/{name:.*}", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+async def run_benchmark(args):
+    runner, base_url = await _start_standin_server(args.page_size, args.latency, args.fail_rate)
+    output_dir = tempfile.mkdtemp(prefix="fetch-bench-")
+    jobs = [(f"{base_url}/page/{i}.jpg", os.path.join(output_dir, f"{i:05d}.jpg")) for i in range(args.pages)]
+    try:
+        start = time.perf_counter()
+        async with AsyncFetcher(concurrency=args.concurrency, rate=args.rate, retries=args.retries,
+                                backoff=0.05) as fetcher:
+            results = await fetcher.download_many(jobs)
+        elapsed = time.perf_counter() - start
+    finally:
+        await runner.cleanup()
+        for name in os.listdir(output_dir):
+            os.remove(os.path.join(output_dir, name))
+        os.rmdir(output_dir)
+
+    return {
+        "pages": args.pages,
+        "ok": sum(results),
+        "concurrency": args.concurrency,
+        "rate": args.rate,
+        "seconds": round(elapsed, 3),
+        "pages_per_sec": round(args.pages / elapsed, 1),
+        "mb_per_sec": round(fetcher.stats["bytes"] / elapsed / 1e6, 2),
+        "stats": fetcher.stats,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark AsyncFetcher với server giả lập cục bộ")
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--page-size", type=int, default=200 * 1024)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=0, help="Số request/giây tối đa (0 = không giới hạn)")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.02, help="Độ trễ giả lập mỗi request (giây)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Tỉ lệ trả về 503 giả lập")
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run_benchmark(args))))
+
+if __name__ == "__main__":
+    main()